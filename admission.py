@@ -0,0 +1,125 @@
+import asyncio
+import re
+from collections import deque
+from fastapi.responses import JSONResponse
+import config
+
+# Контроль допуска. Обработчики выполняют работу с базой в ограниченном пуле потоков (или пуле
+# соединений в режиме DB_ASYNC), и при перегрузке запросы незаметно копятся в его очереди, пока
+# клиенты не отвалятся по таймауту. Здесь число одновременно выполняемых запросов ограничено
+# по классам: чтение, запись и долгие передачи (выгрузка, вложения, импорт). Запрос сверх
+# предела ждёт в очереди своего класса, а при полной очереди или слишком долгом ожидании сразу
+# получает 503 с заголовком Retry-After.
+#
+# Чтение объекта по номеру дешевле чтения списка, поэтому они делят один предел, но освободившееся
+# место первым получает объект, а списки не могут занять больше ADMISSION_LIST_LIMIT мест.
+
+# Долгие потоки (подписка на изменения), метрики и документация не ограничиваются
+EXEMPT_PATHS = ("/changes/stream", "/metrics", "/docs", "/docs/oauth2-redirect", "/redoc", "/openapi.json")
+ITEM_PATH = re.compile(r"^/[^/]+/\d+/?$")
+# Долгие передачи: выгрузка и скачивание вложения, загрузка вложения и файла импорта
+DOWNLOAD_PATH = re.compile(r"/(export|attachments/\d+)/?$")
+UPLOAD_PATH = re.compile(r"/(import|attachments)/?$")
+
+# Приоритеты внутри класса чтения
+ITEM, LIST = 0, 1
+
+class Limiter:
+    # Не больше limit запросов одновременно, для каждого приоритета — не больше caps[priority].
+    # Остальные ждут в очереди (всего не больше queue_size и не дольше timeout секунд);
+    # освободившееся место получает первый ожидающий с наивысшим приоритетом, а при полной
+    # очереди запрос вытесняет последнего ожидающего с более низким приоритетом.
+    # Ожидающий получает True (место выделено) или False (вытеснен)
+    def __init__(self, limit: int, caps: tuple, queue_size: int, timeout: float):
+        self.limit = limit
+        self.caps = caps
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = [0] * len(caps)
+        self.waiters = [deque() for _ in caps]
+        self.rejected = 0
+
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self.waiters)
+
+    def _can_run(self, priority: int) -> bool:
+        return sum(self.active) < self.limit and self.active[priority] < self.caps[priority]
+
+    async def acquire(self, priority: int = 0) -> bool:
+        if self._can_run(priority) and not any(self.waiters[:priority + 1]):
+            self.active[priority] += 1
+            return True
+        if self.queued() >= self.queue_size:
+            lower = next((queue for queue in reversed(self.waiters[priority + 1:]) if queue), None)
+            self.rejected += 1
+            if lower is None:
+                return False
+            lower.pop().set_result(False)
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[priority].append(future)
+        try:
+            admitted = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            # Место могло освободиться одновременно с истечением ожидания
+            if future.done():
+                return future.result()
+            self.waiters[priority].remove(future)
+            self.rejected += 1
+            return False
+        except asyncio.CancelledError:
+            if not future.done():
+                self.waiters[priority].remove(future)
+            elif future.result():
+                self.release(priority)
+            raise
+        return admitted
+
+    def release(self, priority: int = 0):
+        self.active[priority] -= 1
+        for waiting, queue in enumerate(self.waiters):
+            while queue and self._can_run(waiting):
+                self.active[waiting] += 1
+                queue.popleft().set_result(True)
+
+def _limiter(limit: int, caps: tuple = None) -> Limiter:
+    return Limiter(limit, caps or (limit,), config.ADMISSION_QUEUE_SIZE, config.ADMISSION_QUEUE_TIMEOUT_MS / 1000)
+
+limiters = {
+    "read": _limiter(config.ADMISSION_READ_LIMIT, (config.ADMISSION_READ_LIMIT, config.ADMISSION_LIST_LIMIT)),
+    "write": _limiter(config.ADMISSION_WRITE_LIMIT),
+    "transfer": _limiter(config.ADMISSION_TRANSFER_LIMIT),
+}
+
+def classify(method: str, path: str):
+    # (класс, приоритет) или None — запрос не ограничивается
+    if path in EXEMPT_PATHS:
+        return None
+    if method in ("GET", "HEAD"):
+        if DOWNLOAD_PATH.search(path):
+            return "transfer", 0
+        return "read", ITEM if ITEM_PATH.match(path) else LIST
+    if method == "POST" and UPLOAD_PATH.search(path):
+        return "transfer", 0
+    return "write", 0
+
+def overloaded_response() -> JSONResponse:
+    return JSONResponse({"detail": "Сервер перегружен, повторите запрос позже"}, status_code=503,
+                        headers={"Retry-After": str(config.ADMISSION_RETRY_AFTER)})
+
+class AdmissionMiddleware:
+    # ASGI-middleware: место занимается до начала обработки и освобождается после отправки
+    # всего ответа, включая потоковые
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        kind = classify(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if kind is None:
+            return await self.app(scope, receive, send)
+        limiter = limiters[kind[0]]
+        if not await limiter.acquire(kind[1]):
+            return await overloaded_response()(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(kind[1])
@@ -0,0 +1,278 @@
+import argparse
+import logging
+import sqlite3
+import time
+from contextlib import closing, contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from fastapi import HTTPException
+from sqlalchemy import MetaData, create_engine, select, text, union_all
+from sqlalchemy.orm import aliased
+from sqlalchemy.schema import CreateTable
+import config, database, models
+
+# Хранение по уровням: документы старше ARCHIVE_AFTER_DAYS переносятся из основной базы в
+# архивные файлы по годам создания (ARCHIVE_DIR/2023.db) с теми же таблицами. Основная база
+# остаётся небольшой, а списки и выгрузка с периодом created_from/created_to, задевающим
+# архивный период, читают и архивы: нужные файлы подключаются к соединению запроса через
+# ATTACH только для чтения. Запросы без периода и с недавним периодом архивы не трогают.
+#
+# Перенос идёт пачками по ARCHIVE_BATCH_SIZE строк. Сначала пачка копируется в архив (основная
+# база при этом только читается), затем короткой транзакцией удаляется из основной — удаляются
+# лишь строки, не изменившиеся после копирования. Сбой между шагами или параллельная правка
+# приводят только к повторному переносу строки. Удаление при переносе не уменьшает статистику и
+# не попадает в ленту изменений: триггеры пропускают его, пока в archive_moving есть строка.
+# Из полнотекстового индекса (search.py) документ при переносе удаляется: поиск по архиву не ведётся.
+# Номера перенесённых строк новым документам не достаются: основные таблицы созданы с
+# AUTOINCREMENT, таблицы из старых баз перестраивает migrate. Сотрудника, на которого ссылаются
+# приказы в архиве, удалить нельзя (crud.delete_row), а номера удалённых сотрудников тоже не
+# используются повторно.
+#
+#   python archive.py                  — перенести один раз
+#   python archive.py --interval 3600  — работать в фоне, перенос раз в час
+
+logger = logging.getLogger(__name__)
+
+MODELS = (models.IncomingDocument, models.OutgoingDocument, models.Order)
+# Таблицы с AUTOINCREMENT: документы архива и сотрудники, на которых ссылаются приказы в архиве
+AUTOINCREMENT_MODELS = MODELS + (models.Employee,)
+MOVING_TABLE = "archive_moving"
+# Условие WHEN для триггеров удаления, которые не должны срабатывать при переносе в архив
+NOT_MOVING = f"NOT EXISTS (SELECT 1 FROM {MOVING_TABLE})"
+# Предел SQLite на число подключённых баз (SQLITE_MAX_ATTACHED)
+MAX_ATTACHED = 10
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+def install(engine):
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {MOVING_TABLE} (active INTEGER)"))
+        # Граница архива по каждой таблице: документы, созданные раньше неё, могут быть в архиве
+        conn.execute(text("CREATE TABLE IF NOT EXISTS archive_state ("
+                          "table_name VARCHAR(50) PRIMARY KEY, archived_before VARCHAR(30) NOT NULL)"))
+
+def archive_path(year: int) -> Path:
+    return Path(config.ARCHIVE_DIR) / f"{year}.db"
+
+def schema_name(year: int) -> str:
+    return f"archive_{year}"
+
+def archive_years() -> list:
+    directory = Path(config.ARCHIVE_DIR)
+    if not directory.is_dir():
+        return []
+    return sorted(int(path.stem) for path in directory.glob("*.db") if path.stem.isdigit())
+
+def _local(moment: datetime) -> datetime:
+    # created_at хранится в локальном времени без пояса
+    return moment.astimezone().replace(tzinfo=None) if moment.tzinfo is not None else moment
+
+def years_for(db, model, filters: dict) -> list:
+    # Годы архивов, которые задевает период; пустой список — хватает основной базы
+    created_from, created_to = filters.get("created_from"), filters.get("created_to")
+    if model not in MODELS or (created_from is None and created_to is None):
+        return []
+    years = archive_years()
+    if not years:
+        return []
+    boundary = db.execute(text("SELECT archived_before FROM archive_state WHERE table_name = :table"),
+                          {"table": model.__tablename__}).scalar()
+    if boundary is None:
+        return []
+    upper = datetime.fromisoformat(boundary)
+    if created_from is not None and _local(created_from) >= upper:
+        return []
+    if created_to is not None:
+        upper = min(upper, _local(created_to))
+    lower = _local(created_from).year if created_from is not None else years[0]
+    years = [year for year in years if lower <= year <= upper.year]
+    if len(years) >= MAX_ATTACHED:
+        raise HTTPException(status_code=400, detail=f"Период захватывает больше {MAX_ATTACHED - 1} архивных лет, сузьте его")
+    return years
+
+@contextmanager
+def attached(conn, years, readonly: bool = True):
+    # Подключение архивов к соединению; DETACH — вне транзакции, поэтому после выборки
+    done = []
+    try:
+        for year in years:
+            path = archive_path(year).resolve()
+            conn.exec_driver_sql(f"ATTACH DATABASE ? AS {schema_name(year)}",
+                                 (path.as_uri() + "?mode=ro" if readonly else str(path),))
+            done.append(year)
+        yield
+    finally:
+        for year in done:
+            conn.exec_driver_sql(f"DETACH DATABASE {schema_name(year)}")
+
+archive_tables = {}
+
+def _archive_table(table, year: int):
+    key = (table.name, year)
+    if key not in archive_tables:
+        archive_tables[key] = table.to_metadata(MetaData(), schema=schema_name(year))
+    return archive_tables[key]
+
+def union(table, years):
+    # Основная таблица и её архивные копии одним подзапросом с именем таблицы
+    selects = [select(table)] + [select(_archive_table(table, year)) for year in years]
+    return union_all(*selects).subquery(table.name)
+
+def source(model, years):
+    # Псевдоним модели поверх объединения: фильтры, сортировка и связи работают как с самой моделью
+    return aliased(model, union(model.__table__, years))
+
+def create_archive(year: int):
+    path = archive_path(year)
+    if path.exists():
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    engine = create_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(bind=engine, tables=[model.__table__ for model in MODELS])
+    engine.dispose()
+
+def _open_archive(year: int):
+    # Отдельное соединение только для чтения: ATTACH внутри транзакции запроса невозможен
+    return closing(sqlite3.connect(archive_path(year).resolve().as_uri() + "?mode=ro", uri=True))
+
+def archived_references(model) -> list:
+    # Колонки архивируемых таблиц, ссылающиеся на model: [(таблица, колонка)]
+    return [(source.__tablename__, key.parent.name) for source in MODELS
+            for key in source.__table__.foreign_keys if key.column.table is model.__table__]
+
+def referenced(model, item_id: int) -> bool:
+    # Есть ли в архивах документы, ссылающиеся на строку model
+    references = archived_references(model)
+    for year in archive_years() if references else []:
+        with _open_archive(year) as conn:
+            for table, column in references:
+                if conn.execute(f"SELECT 1 FROM {table} WHERE {column} = ? LIMIT 1", (item_id,)).fetchone():
+                    return True
+    return False
+
+def _archived_max_id(model) -> int:
+    # Наибольший номер строки model, встречающийся в архиве: сами строки или ссылки на них
+    columns = ([(model.__tablename__, "id")] if model in MODELS else []) + archived_references(model)
+    top = 0
+    for year in archive_years():
+        with _open_archive(year) as conn:
+            for table, column in columns:
+                top = max(top, conn.execute(f"SELECT coalesce(max({column}), 0) FROM {table}").fetchone()[0])
+    return top
+
+def migrate(engine):
+    # Пересоздание основных таблиц без AUTOINCREMENT (базы, созданные до него). Счётчик номеров
+    # начинается выше номеров, уже лежащих в архиве. Индексы и триггеры удаляются вместе со
+    # старой таблицей и создаются заново при запуске (main.py) после migrate
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for model in AUTOINCREMENT_MODELS:
+            table = model.__table__
+            ddl = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                               {"name": table.name}).scalar()
+            if ddl is None or "AUTOINCREMENT" in ddl.upper():
+                continue
+            top = _archived_max_id(model)
+            metadata = MetaData()
+            for key in table.foreign_keys:
+                # Внешним ключам нужна таблица, на которую они ссылаются
+                key.column.table.to_metadata(metadata)
+            rebuilt = table.to_metadata(metadata, name=f"{table.name}_autoincrement")
+            columns = ", ".join(column.name for column in table.columns)
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                # Проверка повторяется под блокировкой: таблицу мог перестроить другой процесс
+                ddl = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                                   {"name": table.name}).scalar()
+                if "AUTOINCREMENT" not in ddl.upper():
+                    conn.execute(CreateTable(rebuilt))
+                    conn.exec_driver_sql(f"INSERT INTO {rebuilt.name} ({columns}) SELECT {columns} FROM {table.name}")
+                    conn.exec_driver_sql(f"DROP TABLE {table.name}")
+                    conn.exec_driver_sql(f"ALTER TABLE {rebuilt.name} RENAME TO {table.name}")
+                    conn.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = ?", (table.name,))
+                    conn.exec_driver_sql(f"INSERT INTO sqlite_sequence (name, seq) "
+                                         f"SELECT ?, max(coalesce(max(id), 0), ?) FROM {table.name}", (table.name, top))
+                    logger.info("Таблица %s пересоздана с AUTOINCREMENT", table.name)
+                conn.exec_driver_sql("COMMIT")
+            except Exception:
+                conn.exec_driver_sql("ROLLBACK")
+                raise
+
+def move_batch(conn, model, cutoff: str, batch_size: int):
+    # Возвращает (выбрано строк, перенесено строк)
+    table = model.__tablename__
+    rows = conn.exec_driver_sql(f"SELECT id, substr(created_at, 1, 4) FROM {table} WHERE created_at < ? "
+                                f"ORDER BY created_at LIMIT ?", (cutoff, batch_size)).all()
+    by_year = {}
+    for item_id, year in rows:
+        by_year.setdefault(int(year), []).append(item_id)
+    columns = ", ".join(column.name for column in model.__table__.columns)
+    moved = 0
+    for year, ids in sorted(by_year.items()):
+        create_archive(year)
+        schema = schema_name(year)
+        placeholders = ", ".join("?" * len(ids))
+        with attached(conn, [year], readonly=False):
+            conn.exec_driver_sql(f"INSERT OR REPLACE INTO {schema}.{table} ({columns}) "
+                                 f"SELECT {columns} FROM main.{table} WHERE id IN ({placeholders})", tuple(ids))
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                conn.exec_driver_sql(f"INSERT INTO {MOVING_TABLE} (active) VALUES (1)")
+                moved += conn.exec_driver_sql(
+                    f"DELETE FROM main.{table} WHERE id IN ({placeholders}) AND EXISTS ("
+                    f"SELECT 1 FROM {schema}.{table} AS copy WHERE copy.id = main.{table}.id "
+                    f"AND copy.updated_at IS main.{table}.updated_at)", tuple(ids)).rowcount
+                conn.exec_driver_sql(f"DELETE FROM {MOVING_TABLE}")
+                conn.exec_driver_sql("COMMIT")
+            except Exception:
+                conn.exec_driver_sql("ROLLBACK")
+                raise
+    return len(rows), moved
+
+def archive_table(conn, model, cutoff: str, batch_size: int, pause: float) -> int:
+    # Граница записывается до переноса, чтобы читатели сразу искали старые документы и в архиве
+    conn.exec_driver_sql("INSERT INTO archive_state (table_name, archived_before) VALUES (?, ?) "
+                         "ON CONFLICT (table_name) DO UPDATE SET archived_before = max(archived_before, excluded.archived_before)",
+                         (model.__tablename__, cutoff))
+    total = 0
+    while True:
+        selected, moved = move_batch(conn, model, cutoff, batch_size)
+        total += moved
+        if selected < batch_size or moved == 0:
+            return total
+        # Пауза между пачками пропускает вперёд ожидающих писателей
+        time.sleep(pause)
+
+def archive(engine, days: int = None, batch_size: int = None, pause_ms: float = None) -> dict:
+    days = config.ARCHIVE_AFTER_DAYS if days is None else days
+    batch_size = batch_size or config.ARCHIVE_BATCH_SIZE
+    pause = (config.ARCHIVE_PAUSE_MS if pause_ms is None else pause_ms) / 1000
+    cutoff = (datetime.now() - timedelta(days=days)).strftime(TIME_FORMAT)
+    # Транзакциями управляет move_batch (BEGIN IMMEDIATE только на время удаления)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        return {model.__tablename__: archive_table(conn, model, cutoff, batch_size, pause) for model in MODELS}
+
+if __name__ == "__main__":
+    import changefeed, stats
+
+    parser = argparse.ArgumentParser(description="Перенос старых документов в архивные файлы по годам")
+    parser.add_argument("--days", type=int, default=config.ARCHIVE_AFTER_DAYS, help="Возраст документа для переноса, дней")
+    parser.add_argument("--batch-size", type=int, default=config.ARCHIVE_BATCH_SIZE, help="Строк в одной пачке")
+    parser.add_argument("--pause-ms", type=float, default=config.ARCHIVE_PAUSE_MS, help="Пауза между пачками, мс")
+    parser.add_argument("--interval", type=float, default=0, help="Повторять перенос раз в столько секунд")
+    parser.add_argument("--vacuum", action="store_true", help="Сжать основную базу после переноса (блокирует запись)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    # Триггеры с условием на archive_moving должны быть установлены до первого переноса
+    install(database.engine)
+    stats.install(database.engine)
+    changefeed.install(database.engine)
+    while True:
+        started = time.perf_counter()
+        moved = archive(database.engine, args.days, args.batch_size, args.pause_ms)
+        logger.info("Перенесено в архив за %.1f с: %s", time.perf_counter() - started,
+                    ", ".join(f"{table} — {count}" for table, count in moved.items()))
+        if args.vacuum and any(moved.values()):
+            with database.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.exec_driver_sql("VACUUM")
+        if not args.interval:
+            break
+        time.sleep(args.interval)
@@ -0,0 +1,197 @@
+import argparse
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+import archive, config, crud, database, models
+
+# Вложения документов (сканы писем, подписанные приказы). Файлы лежат на диске под именем,
+# равным SHA-256 содержимого (ATTACHMENTS_DIR/ab/cd/abcd...), поэтому одинаковый файл,
+# приложенный к нескольким документам, хранится один раз. В базе — только строки attachments
+# с именем файла, типом, размером и хэшем, привязанные к документу по (doc_type, doc_id).
+#
+# Тело запроса загрузки — сам файл, без multipart: оно читается потоком и пишется во временный
+# файл блоками по ATTACHMENT_CHUNK_SIZE, хэш считается по ходу записи, так что расход памяти не
+# зависит от размера файла. Соединение с базой занимается только после того, как файл сохранён.
+# Выдача — FileResponse: поддерживает Range, а сервер с расширением http.response.pathsend
+# отдаёт файл сам, без чтения в процессе.
+#
+# Файлы, на которые не осталось ссылок (удалено вложение или документ), удаляет сборка мусора:
+#   python attachments.py
+
+logger = logging.getLogger(__name__)
+
+DOC_TYPES = {
+    "incoming": models.IncomingDocument,
+    "outgoing": models.OutgoingDocument,
+    "memos": models.Memo,
+    "reports": models.Report,
+    "orders": models.Order,
+}
+DOC_TYPE_PATTERN = f"^({'|'.join(DOC_TYPES)})$"
+TEMP_DIR = "tmp"
+
+def install(engine):
+    with engine.begin() as conn:
+        for doc_type, model in DOC_TYPES.items():
+            table = model.__tablename__
+            # Вложения удаляются вместе с документом, но не при его переносе в архив
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS attachments_{table}_delete AFTER DELETE ON {table} "
+                f"WHEN {archive.NOT_MOVING} BEGIN "
+                f"DELETE FROM attachments WHERE doc_type = '{doc_type}' AND doc_id = old.id; END"))
+
+def blob_path(digest: str) -> Path:
+    return Path(config.ATTACHMENTS_DIR) / digest[:2] / digest[2:4] / digest
+
+def _write_block(handle, hasher, block: bytes):
+    handle.write(block)
+    hasher.update(block)
+
+def _close(handle):
+    handle.flush()
+    os.fsync(handle.fileno())
+    handle.close()
+
+def _discard(handle):
+    handle.close()
+    try:
+        os.unlink(handle.name)
+    except FileNotFoundError:
+        pass
+
+async def receive(request: Request, directory: Path, max_size: int):
+    # Тело запроса потоком во временный файл в directory; возвращает (путь, хэш, размер).
+    # Используется и импортом CSV (importer.py)
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > max_size:
+        raise HTTPException(status_code=413, detail=f"Файл больше {max_size} байт")
+    directory.mkdir(parents=True, exist_ok=True)
+    handle = tempfile.NamedTemporaryFile(dir=directory, delete=False)
+    hasher = hashlib.sha256()
+    size = 0
+    buffer = bytearray()
+    try:
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > max_size:
+                raise HTTPException(status_code=413, detail=f"Файл больше {max_size} байт")
+            buffer += chunk
+            if len(buffer) >= config.ATTACHMENT_CHUNK_SIZE:
+                # Запись на диск и хэш — в пуле потоков, чтобы не останавливать цикл событий
+                block, buffer = buffer, bytearray()
+                await run_in_threadpool(_write_block, handle, hasher, block)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Пустой файл")
+        if buffer:
+            await run_in_threadpool(_write_block, handle, hasher, buffer)
+        await run_in_threadpool(_close, handle)
+    except BaseException:
+        await run_in_threadpool(_discard, handle)
+        raise
+    return Path(handle.name), hasher.hexdigest(), size
+
+def _place(temp: Path, digest: str):
+    # Файл с тем же хэшем уже есть — временный не нужен, у существующего обновляется время
+    # изменения, чтобы сборка мусора не удалила его до появления строки в базе
+    path = blob_path(digest)
+    if path.exists():
+        try:
+            os.utime(path)
+            temp.unlink()
+            return
+        except FileNotFoundError:
+            pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(temp, path)
+
+async def store(request: Request):
+    # Сохраняет тело запроса в хранилище; возвращает (хэш, размер)
+    temp, digest, size = await receive(request, Path(config.ATTACHMENTS_DIR) / TEMP_DIR, config.ATTACHMENT_MAX_SIZE)
+    try:
+        await run_in_threadpool(_place, temp, digest)
+    except BaseException:
+        temp.unlink(missing_ok=True)
+        raise
+    return digest, size
+
+def check_document(db, doc_type: str, doc_id: int):
+    crud.get_or_404(db, DOC_TYPES[doc_type], doc_id)
+
+def create_attachment(db, model, doc_type: str, doc_id: int, filename: str, content_type: str, digest: str, size: int):
+    # Документ проверяется ещё раз в транзакции записи: его могли удалить, пока шла загрузка
+    check_document(db, doc_type, doc_id)
+    return crud.create_item(db, model, {
+        "doc_type": doc_type, "doc_id": doc_id, "filename": filename,
+        "content_type": content_type, "size": size, "sha256": digest,
+    })
+
+def list_attachments(db, doc_type: str, doc_id: int):
+    return db.query(models.Attachment).filter(models.Attachment.doc_type == doc_type, models.Attachment.doc_id == doc_id) \
+        .order_by(models.Attachment.id).all()
+
+def get_attachment(db, doc_type: str, doc_id: int, attachment_id: int):
+    item = db.query(models.Attachment).filter(models.Attachment.id == attachment_id, models.Attachment.doc_type == doc_type,
+                                              models.Attachment.doc_id == doc_id).first()
+    if item is None:
+        raise HTTPException(status_code=404, detail=f"Вложение с id={attachment_id} не найдено")
+    return item
+
+def delete_attachment(db, model, doc_type: str, doc_id: int, attachment_id: int):
+    # Удаляется только строка; файл удалит сборка мусора, если на него больше нет ссылок
+    db.delete(get_attachment(db, doc_type, doc_id, attachment_id))
+    db.commit()
+
+def file_response(item) -> FileResponse:
+    path = blob_path(item.sha256)
+    if not path.is_file():
+        logger.error("Нет файла вложения %s (%s)", item.id, item.sha256)
+        raise HTTPException(status_code=404, detail=f"Файл вложения с id={item.id} не найден в хранилище")
+    # Содержимое файла с этим хэшем не меняется, поэтому хэш — готовый ETag
+    response = FileResponse(path, media_type=item.content_type, filename=item.filename,
+                            headers={"ETag": f'"{item.sha256}"', "Cache-Control": "private, max-age=86400, immutable"})
+    response.chunk_size = config.ATTACHMENT_CHUNK_SIZE
+    return response
+
+def collect_garbage(engine, grace: float = None) -> int:
+    # Удаляет файлы без ссылок из attachments. Свежие файлы (моложе grace секунд) не трогаются:
+    # строка для только что загруженного файла появляется в базе чуть позже самого файла
+    grace = config.ATTACHMENT_GC_GRACE if grace is None else grace
+    directory = Path(config.ATTACHMENTS_DIR)
+    if not directory.is_dir():
+        return 0
+    with engine.connect() as conn:
+        referenced = set(conn.execute(text("SELECT DISTINCT sha256 FROM attachments")).scalars())
+    deadline = time.time() - grace
+    removed = 0
+    for path in directory.glob("*/*/*"):
+        if len(path.name) != 64 or path.name in referenced:
+            continue
+        try:
+            if path.stat().st_mtime < deadline:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            pass
+    # Временные файлы загрузок, прерванных падением процесса
+    for path in (directory / TEMP_DIR).glob("*"):
+        try:
+            if path.stat().st_mtime < deadline:
+                path.unlink()
+        except FileNotFoundError:
+            pass
+    return removed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Удаление файлов вложений, на которые нет ссылок")
+    parser.add_argument("--grace", type=float, default=config.ATTACHMENT_GC_GRACE,
+                        help="Не удалять файлы моложе стольких секунд")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    logger.info("Удалено файлов: %d", collect_garbage(database.engine, args.grace))
@@ -0,0 +1,92 @@
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError
+import crud, models, schemas
+
+# Пакет операций: создание, замена (update), частичное изменение (patch) и удаление объектов
+# любых видов одним запросом. Операции выполняются по порядку в одной сессии и одной транзакции,
+# то есть весь пакет — один COMMIT вместо своего на каждый запрос. Каждая операция идёт в своей
+# точке сохранения, и её ошибка откатывает только её. В режиме atomic (по умолчанию) первая
+# ошибка отменяет весь пакет; без него остальные операции выполняются и фиксируются.
+
+# Вид объекта: (модель, схема создания, схема изменения, схема ответа)
+ENTITY_TYPES = {
+    "employees": (models.Employee, schemas.EmployeeCreate, schemas.EmployeeUpdate, schemas.Employee),
+    "incoming": (models.IncomingDocument, schemas.IncomingDocumentCreate, schemas.IncomingDocumentUpdate, schemas.IncomingDocument),
+    "outgoing": (models.OutgoingDocument, schemas.OutgoingDocumentCreate, schemas.OutgoingDocumentUpdate, schemas.OutgoingDocument),
+    "memos": (models.Memo, schemas.MemoCreate, schemas.MemoUpdate, schemas.Memo),
+    "reports": (models.Report, schemas.ReportCreate, schemas.ReportUpdate, schemas.Report),
+    "orders": (models.Order, schemas.OrderCreate, schemas.OrderUpdate, schemas.Order),
+}
+OPERATIONS = ("create", "update", "patch", "delete")
+
+def tables(operations) -> set:
+    # Таблицы, кэш ответов по которым сбрасывается после пакета
+    return {ENTITY_TYPES[operation.type][0].__tablename__ for operation in operations if operation.type in ENTITY_TYPES}
+
+def validate(model, schema, data, partial: bool) -> dict:
+    # Как тело запроса маршрута: схема, затем та же подготовка данных, что в main.py
+    try:
+        item = schema.model_validate(data or {})
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=jsonable_encoder(e.errors(include_url=False)))
+    return crud.prepare(model, item.model_dump(exclude_unset=partial), partial)
+
+def check_references(db, model, values: dict):
+    # Ответ содержит вложенного сотрудника, поэтому ссылка на несуществующего — ошибка операции
+    for relationship in inspect(model).relationships:
+        if relationship.uselist:
+            continue
+        for column in relationship.local_columns:
+            if values.get(column.key) is not None:
+                crud.get_or_404(db, relationship.mapper.class_, values[column.key])
+
+def execute(db, operation) -> dict:
+    if operation.type not in ENTITY_TYPES:
+        raise HTTPException(status_code=400, detail=f"Неизвестный вид объекта: {operation.type}")
+    if operation.op not in OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"Неизвестная операция: {operation.op}")
+    if operation.op != "create" and operation.id is None:
+        raise HTTPException(status_code=400, detail="Не указан id объекта")
+    model, create_schema, update_schema, schema = ENTITY_TYPES[operation.type]
+    if operation.op == "delete":
+        crud.delete_row(db, model, operation.id)
+        return {"status": 200, "id": operation.id}
+    if operation.op == "create":
+        values = validate(model, create_schema, operation.data, False)
+        check_references(db, model, values)
+        item = crud.create_row(db, model, values)
+    else:
+        values = validate(model, update_schema, operation.data, operation.op == "patch")
+        check_references(db, model, values)
+        item = crud.update_row(db, model, operation.id, values)
+    return {"status": 200, "id": item.id, "item": schema.model_validate(item, from_attributes=True).model_dump(mode="json")}
+
+def run_batch(db, operations, atomic: bool = True) -> dict:
+    crud.begin(db)
+    results = []
+    failed = None
+    for index, operation in enumerate(operations):
+        if failed is not None and atomic:
+            results.append({"status": 424, "detail": f"Не выполнена: пакет отменён из-за ошибки в операции {failed}"})
+            continue
+        try:
+            with db.begin_nested():
+                results.append(execute(db, operation))
+        except HTTPException as e:
+            results.append({"status": e.status_code, "detail": e.detail})
+        except IntegrityError as e:
+            results.append({"status": 409, "detail": f"Операция не выполнена: {e.orig}"})
+        else:
+            continue
+        if failed is None:
+            failed = index
+    if failed is not None and atomic:
+        db.rollback()
+        for index in range(failed):
+            results[index] = {"status": 424, "detail": f"Отменена: пакет отменён из-за ошибки в операции {failed}"}
+        return {"committed": False, "results": results}
+    db.commit()
+    return {"committed": True, "results": results}
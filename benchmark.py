@@ -0,0 +1,289 @@
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import get_args, get_origin
+import httpx
+import seed
+
+# Нагрузочное тестирование всех маршрутов приложения. Запросы строятся по таблице маршрутов
+# FastAPI (параметры пути, обязательные параметры запроса, схема тела), поэтому новые маршруты
+# попадают в прогон без правок этого файла. Цель — приложение в том же процессе (ASGI, с подсчётом
+# SQL-запросов на каждый запрос), локальный uvicorn или уже запущенный сервер по адресу.
+#
+#   python benchmark.py --database bench.db --seed-rows 100000 --concurrency 16 --write-ratio 0.2
+#   python benchmark.py --target uvicorn --requests 20000 --compare benchmark-old.json
+
+REQUIRED_QUERY = {"q": "договор"}
+# Бесконечные потоки (лента изменений) в прогон не входят
+STREAMING_PATHS = ("/changes/stream",)
+# Вложения и импорт принимают файл в теле запроса, а не JSON, — тоже не входят
+UPLOAD_PATHS = ("/{doc_type}/", "/imports/")
+# Служебные маршруты (профили запросов) — тоже
+ADMIN_PATHS = ("/admin/",)
+
+# Счётчик SQL-запросов текущего HTTP-запроса (только для цели inprocess)
+sql_counter = contextvars.ContextVar("sql_counter", default=None)
+unattributed_sql = [0]
+
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+    counter = sql_counter.get()
+    if counter is None:
+        # Общие для пачки BEGIN и COMMIT группового писателя
+        unattributed_sql[0] += 1
+    else:
+        counter[0] += 1
+
+def table_sizes(path: str) -> dict:
+    import sqlite3
+    with sqlite3.connect(path) as conn:
+        return {table: conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+                for table in seed.SHARES}
+
+class RequestFactory:
+    # Строит случайный запрос к маршруту: номера объектов берутся из диапазона существующих строк
+    def __init__(self, sizes: dict, rng: random.Random, query: dict = None):
+        self.sizes = sizes
+        self.rng = rng
+        self.query = query or {}
+        self.serial = 0
+
+    def object_id(self, table: str) -> int:
+        return self.rng.randint(1, max(self.sizes.get(table, 1), 1))
+
+    def value(self, name: str, annotation):
+        if name == "email":
+            self.serial += 1
+            return f"bench{os.getpid()}-{self.serial}-{self.rng.randrange(10 ** 9)}@example.com"
+        if name in ("author_id", "signer_id"):
+            return self.object_id("employees")
+        if name == "delivery_method":
+            return self.rng.choice(("email", "mail"))
+        if int in (annotation, *get_args(annotation)):
+            return self.rng.randint(1, 500)
+        return seed.sentence(self.rng, 3)
+
+    def body(self, annotation, partial: bool):
+        if get_origin(annotation) in (list, tuple):
+            return [self.body(get_args(annotation)[0], False) for _ in range(10)]
+        fields = annotation.model_fields
+        names = [self.rng.choice(list(fields))] if partial else list(fields)
+        return {name: self.value(name, fields[name].annotation) for name in names}
+
+    def batch_operation(self) -> dict:
+        # Операция пакета (/batch): настоящие операция и вид объекта, номер существующей строки,
+        # данные по схеме создания или изменения этого вида. Сотрудников пакет не удаляет: на них
+        # ссылаются документы, и удаление почти всегда отменяло бы весь пакет
+        import batch
+        entity = self.rng.choice(list(batch.ENTITY_TYPES))
+        op = self.rng.choice([op for op in batch.OPERATIONS if op != "delete" or entity != "employees"])
+        model, create_schema, update_schema, _ = batch.ENTITY_TYPES[entity]
+        operation = {"op": op, "type": entity}
+        if op != "create":
+            operation["id"] = self.object_id(model.__tablename__)
+        if op != "delete":
+            operation["data"] = self.body(create_schema if op == "create" else update_schema, op == "patch")
+        return operation
+
+    def build(self, route):
+        import httpcache
+        path = route.path
+        for param in route.dependant.path_params:
+            table = httpcache.LIST_TABLES[path[:path.index("/", 1) + 1]][0]
+            path = path.replace("{" + param.name + "}", str(self.object_id(table)))
+        params = {param.name: REQUIRED_QUERY[param.name] for param in route.dependant.query_params if param.required}
+        # Общие параметры (--query) — только тем маршрутам, у которых такой параметр есть
+        params.update({param.alias: self.query[param.alias] for param in route.dependant.query_params if param.alias in self.query})
+        if path.endswith("/export"):
+            # Выгрузка ограничивается последними сутками, иначе она вытесняет остальные запросы
+            params["created_from"] = (datetime.now() - timedelta(days=1)).isoformat()
+        body = None
+        if path == "/batch":
+            # Тело пакета — список операций; строки op и type по схеме — любые, поэтому строятся отдельно
+            body = [self.batch_operation() for _ in range(10)]
+        elif route.dependant.body_params:
+            method = next(iter(route.methods))
+            body = self.body(route.dependant.body_params[0].field_info.annotation, method == "PATCH")
+        return path, params, body
+
+def percentile(values: list, q: float) -> float:
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+def summarize(samples: list, elapsed: float) -> dict:
+    latencies = sorted(sample["latency"] * 1000 for sample in samples)
+    statuses = {}
+    for sample in samples:
+        statuses[str(sample["status"])] = statuses.get(str(sample["status"]), 0) + 1
+    result = {
+        "requests": len(samples),
+        "errors": sum(1 for sample in samples if sample["status"] >= 500 or sample["status"] == 0),
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 3),
+            "p50": round(percentile(latencies, 0.50), 3),
+            "p95": round(percentile(latencies, 0.95), 3),
+            "p99": round(percentile(latencies, 0.99), 3),
+            "max": round(latencies[-1], 3),
+        },
+        "statuses": statuses,
+    }
+    sql = [sample["sql"] for sample in samples if sample["sql"] is not None]
+    if sql:
+        result["sql_per_request"] = {"mean": round(sum(sql) / len(sql), 2), "max": max(sql)}
+    return result
+
+async def run_load(client, routes, factory, args) -> list:
+    reads = [route for route in routes if "GET" in route.methods]
+    writes = [route for route in routes if "GET" not in route.methods]
+    samples = []
+    total = args.warmup + args.requests
+    issued = [0]
+    deadline = [None]
+
+    async def worker():
+        while issued[0] < total and (deadline[0] is None or time.perf_counter() < deadline[0]):
+            number = issued[0]
+            issued[0] += 1
+            pool = writes if writes and (not reads or factory.rng.random() < args.write_ratio) else reads
+            route = factory.rng.choice(pool)
+            method = next(iter(route.methods))
+            path, params, body = factory.build(route)
+            counter = [0]
+            token = sql_counter.set(counter)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, params=params, json=body)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = 0
+            finally:
+                sql_counter.reset(token)
+            latency = time.perf_counter() - started
+            if number >= args.warmup:
+                if deadline[0] is None and args.duration:
+                    deadline[0] = time.perf_counter() + args.duration
+                samples.append({"route": f"{method} {route.path}", "status": status, "latency": latency,
+                                "sql": counter[0] if args.target == "inprocess" else None, "started": started})
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    return samples
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def start_uvicorn(args, port: int):
+    env = dict(os.environ, DATABASE_PATH=os.path.abspath(args.database))
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+                               cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/openapi.json", timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("uvicorn не запустился")
+
+def compare(current: dict, previous: dict):
+    print(f"Сравнение с {previous.get('commit')} ({previous.get('started_at')}):")
+    rows = [("всего", current["overall"], previous["overall"])]
+    rows += [(route, data, previous["routes"][route]) for route, data in current["routes"].items() if route in previous["routes"]]
+    for name, new, old in rows:
+        print(f"  {name}: p95 {old['latency_ms']['p95']} -> {new['latency_ms']['p95']} мс, "
+              f"rps {old['throughput_rps']} -> {new['throughput_rps']}")
+
+async def benchmark(args) -> dict:
+    if not os.path.exists(args.database):
+        seed.seed(args.database, args.seed_rows)
+    os.environ["DATABASE_PATH"] = args.database
+    from fastapi.routing import APIRoute
+    import main
+    routes = [route for route in main.app.routes if isinstance(route, APIRoute) and route.path not in STREAMING_PATHS
+              and not route.path.startswith(UPLOAD_PATHS + ADMIN_PATHS) and re.search(args.routes, route.path)]
+    query = dict(item.split("=", 1) for item in args.query)
+    factory = RequestFactory(table_sizes(args.database), random.Random(args.random_seed), query)
+    process = None
+    if args.target == "inprocess":
+        from sqlalchemy import event
+        import database, writer
+        engines = [database.engine, database.read_engine, writer.writer_engine]
+        if database.async_engine is not None:
+            engines += [database.async_engine.sync_engine, database.async_read_engine.sync_engine]
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", count_statement)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app, raise_app_exceptions=False), base_url="http://benchmark")
+    else:
+        base_url = args.target
+        if args.target == "uvicorn":
+            process = start_uvicorn(args, args.port)
+            base_url = f"http://127.0.0.1:{args.port}"
+        client = httpx.AsyncClient(base_url=base_url, timeout=60,
+                                   limits=httpx.Limits(max_connections=args.concurrency))
+    started_at = datetime.now().isoformat(timespec="seconds")
+    try:
+        async with client:
+            samples = await run_load(client, routes, factory, args)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    if not samples:
+        raise SystemExit("Нет измеренных запросов")
+    elapsed = max(s["started"] + s["latency"] for s in samples) - min(s["started"] for s in samples)
+    by_route = {}
+    for sample in samples:
+        by_route.setdefault(sample["route"], []).append(sample)
+    return {
+        "commit": git_commit(),
+        "started_at": started_at,
+        "config": {name: value for name, value in vars(args).items() if name not in ("output", "compare")},
+        "settings": {name: os.getenv(name) for name in ("DB_ASYNC", "GROUP_COMMIT", "SQLITE_SYNCHRONOUS", "FAST_SERIALIZATION",
+                                                        "RESPONSE_CACHE_SIZE", "METRICS_ENABLED", "PROFILING_ENABLED") if os.getenv(name)},
+        "table_sizes": factory.sizes,
+        "overall": summarize(samples, elapsed),
+        "unattributed_sql": unattributed_sql[0] if args.target == "inprocess" else None,
+        "routes": {route: summarize(items, elapsed) for route, items in sorted(by_route.items())},
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нагрузочное тестирование маршрутов приложения")
+    parser.add_argument("--database", default="bench.db", help="Файл базы; создаётся seed.py, если его нет")
+    parser.add_argument("--seed-rows", type=int, default=10000, help="Число строк при создании базы")
+    parser.add_argument("--target", default="inprocess", help="inprocess, uvicorn или адрес сервера (http://...)")
+    parser.add_argument("--port", type=int, default=8765, help="Порт для --target uvicorn")
+    parser.add_argument("--requests", type=int, default=2000, help="Число измеряемых запросов")
+    parser.add_argument("--duration", type=float, default=0, help="Ограничение по времени в секундах (0 — без ограничения)")
+    parser.add_argument("--warmup", type=int, default=50, help="Запросов прогрева без учёта в результатах")
+    parser.add_argument("--concurrency", type=int, default=8, help="Одновременных запросов")
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="Доля изменяющих запросов (POST/PUT/PATCH/DELETE)")
+    parser.add_argument("--routes", default="", help="Регулярное выражение для отбора маршрутов по пути")
+    parser.add_argument("--query", action="append", default=[], metavar="ИМЯ=ЗНАЧЕНИЕ",
+                        help="Параметр запроса для маршрутов, которые его принимают (например, limit=1000)")
+    parser.add_argument("--random-seed", type=int, default=1)
+    parser.add_argument("--output", help="Файл результатов (по умолчанию benchmark-<коммит>-<время>.json)")
+    parser.add_argument("--compare", help="Файл результатов предыдущего прогона для сравнения")
+    args = parser.parse_args()
+    result = asyncio.run(benchmark(args))
+    output = args.output or f"benchmark-{result['commit'] or 'local'}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(result, file, ensure_ascii=False, indent=2)
+    overall = result["overall"]
+    print(f"{overall['requests']} запросов, {overall['throughput_rps']} запросов/с, "
+          f"p50 {overall['latency_ms']['p50']} мс, p95 {overall['latency_ms']['p95']} мс, p99 {overall['latency_ms']['p99']} мс")
+    if "sql_per_request" in overall:
+        print(f"SQL-запросов на запрос: {overall['sql_per_request']['mean']} (макс. {overall['sql_per_request']['max']})")
+    print(f"Результаты сохранены в {output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            compare(result, json.load(file))
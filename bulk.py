@@ -0,0 +1,54 @@
+from fastapi import HTTPException
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+import models
+
+def item_error(index: int, field: str, msg: str):
+    # Формат совпадает с ошибками валидации FastAPI
+    return {"loc": ["body", index, field], "msg": msg, "type": "value_error"}
+
+# Проверки получают строки пачки и, при импорте CSV, номера их строк в файле (lines)
+
+def check_unique_emails(db, rows, lines=None):
+    errors = []
+    seen = {}
+    for index, row in enumerate(rows):
+        if row["email"] in seen:
+            where = f"элементе {seen[row['email']]}" if lines is None else f"строке {lines[seen[row['email']]]}"
+            errors.append(item_error(index, "email", f"email повторяется в {where}"))
+        else:
+            seen[row["email"]] = index
+    taken = set(db.scalars(select(models.Employee.email).where(models.Employee.email.in_(seen))))
+    for email in taken:
+        errors.append(item_error(seen[email], "email", f"Сотрудник с email={email} уже существует"))
+    return errors
+
+def check_delivery_method(db, rows, lines=None):
+    return [item_error(index, "delivery_method", "delivery_method: 'email' или 'mail'")
+            for index, row in enumerate(rows) if row["delivery_method"] not in ["email", "mail"]]
+
+def check_employee_refs(field: str):
+    def check(db, rows, lines=None):
+        ids = {row[field] for row in rows}
+        found = set(db.scalars(select(models.Employee.id).where(models.Employee.id.in_(ids))))
+        return [item_error(index, field, f"Employee с id={row[field]} не найден")
+                for index, row in enumerate(rows) if row[field] not in found]
+    return check
+
+def bulk_create(db, model, items, *checks):
+    # Вся пачка проверяется целиком и вставляется одним executemany в одной транзакции
+    rows = [item.model_dump() for item in items]
+    errors = [error for check in checks for error in check(db, rows)]
+    if errors:
+        raise HTTPException(status_code=422, detail=sorted(errors, key=lambda e: e["loc"][1]))
+    if not rows:
+        return {"ids": []}
+    try:
+        # SQLite выдаёт новые rowid по возрастанию в порядке VALUES, поэтому сортировка
+        # восстанавливает порядок элементов без построчного режима insertmanyvalues
+        ids = sorted(db.scalars(insert(model).returning(model.id), rows))
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=f"Пакет не сохранён: {e.orig}")
+    return {"ids": ids}
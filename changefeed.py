@@ -0,0 +1,202 @@
+import asyncio
+import json
+import logging
+from fastapi import HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text
+import archive, config, database, models
+
+# Лента изменений. Каждое создание, изменение и удаление строки записывается триггером в таблицу
+# change_log с возрастающим номером seq — в той же транзакции, что и само изменение, при любом
+# способе записи. Клиенты подписываются через WebSocket или Server-Sent Events и после
+# переподключения продолжают с последнего полученного seq.
+#
+# В процессе один читатель (Broadcaster) выбирает новые записи журнала и раздаёт их очередям
+# подписчиков. Его будит write() в main.py, а изменения из других процессов он замечает,
+# опрашивая журнал раз в CHANGE_FEED_POLL_INTERVAL секунд.
+
+logger = logging.getLogger(__name__)
+
+FEED_TYPES = {
+    "employees": models.Employee,
+    "incoming": models.IncomingDocument,
+    "outgoing": models.OutgoingDocument,
+    "memos": models.Memo,
+    "reports": models.Report,
+    "orders": models.Order,
+}
+OPERATIONS = {"INSERT": "create", "UPDATE": "update", "DELETE": "delete"}
+BATCH_SIZE = 500
+
+def install(engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS change_log ("
+                          "seq INTEGER PRIMARY KEY AUTOINCREMENT, doc_type VARCHAR(20) NOT NULL, op VARCHAR(10) NOT NULL, "
+                          "item_id INTEGER NOT NULL, changed_at VARCHAR(30) NOT NULL)"))
+        # Для синхронизации: изменения одного вида по seq и удаления по времени
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_change_log_doc_type_seq ON change_log (doc_type, seq)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_change_log_doc_type_op_changed_at ON change_log (doc_type, op, changed_at)"))
+        for doc_type, model in FEED_TYPES.items():
+            table = model.__tablename__
+            for event, op in OPERATIONS.items():
+                row = "old" if event == "DELETE" else "new"
+                when = ""
+                if event == "DELETE":
+                    # Перенос в архив — не удаление. Триггер пересоздаётся, чтобы условие
+                    # появилось и в базах, созданных раньше архива
+                    when = f"WHEN {archive.NOT_MOVING} "
+                    conn.execute(text(f"DROP TRIGGER IF EXISTS changes_{table}_{op}"))
+                conn.execute(text(
+                    f"CREATE TRIGGER IF NOT EXISTS changes_{table}_{op} AFTER {event} ON {table} {when}BEGIN "
+                    f"INSERT INTO change_log (doc_type, op, item_id, changed_at) "
+                    f"VALUES ('{doc_type}', '{op}', {row}.id, strftime('%Y-%m-%dT%H:%M:%fZ', 'now')); END"))
+
+def check_types(types):
+    if types:
+        unknown = set(types) - set(FEED_TYPES)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Неизвестные виды документов: {', '.join(sorted(unknown))}")
+
+def read_changes(db, after: int, types=None, limit: int = BATCH_SIZE, upto: int = None):
+    check_types(types)
+    params = {"after": after, "limit": limit}
+    where = "seq > :after"
+    if upto is not None:
+        params["upto"] = upto
+        where += " AND seq <= :upto"
+    if types:
+        where += f" AND doc_type IN ({', '.join(repr(doc_type) for doc_type in types)})"
+    rows = db.execute(text(f"SELECT seq, doc_type, op, item_id, changed_at FROM change_log WHERE {where} "
+                           f"ORDER BY seq LIMIT :limit"), params).all()
+    return [{"seq": row.seq, "type": row.doc_type, "id": row.item_id, "op": row.op, "changed_at": row.changed_at}
+            for row in rows]
+
+def last_seq(db) -> int:
+    return db.execute(text("SELECT COALESCE(MAX(seq), 0) FROM change_log")).scalar()
+
+class Subscriber:
+    def __init__(self, types):
+        self.types = set(types) if types else None
+        self.queue = asyncio.Queue(maxsize=config.CHANGE_FEED_QUEUE_SIZE)
+        self.overflowed = False
+
+    def offer(self, change: dict):
+        if self.overflowed or (self.types is not None and change["type"] not in self.types):
+            return
+        try:
+            self.queue.put_nowait(change)
+        except asyncio.QueueFull:
+            # Отстающий подписчик отключается после разбора очереди и продолжает с последнего seq
+            self.overflowed = True
+
+class Broadcaster:
+    def __init__(self):
+        self.subscribers = set()
+        self.last_seq = 0
+        self.task = None
+        self.ready = None
+        self.wakeup = None
+
+    def notify(self):
+        if self.wakeup is not None and self.task is not None and not self.task.done():
+            self.wakeup.set()
+
+    async def subscribe(self, subscriber: Subscriber) -> int:
+        # Возвращает seq, после которого записи приходят в очередь подписчика;
+        # более ранние подписчик дочитывает из журнала сам
+        if self.task is None or self.task.done():
+            self.ready = asyncio.Event()
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.create_task(self.run())
+        await self.ready.wait()
+        self.subscribers.add(subscriber)
+        return self.last_seq
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    async def run(self):
+        self.last_seq = await database.run_session(last_seq)
+        self.ready.set()
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=config.CHANGE_FEED_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            try:
+                while True:
+                    changes = await database.run_session(read_changes, self.last_seq)
+                    for change in changes:
+                        for subscriber in list(self.subscribers):
+                            subscriber.offer(change)
+                    if changes:
+                        self.last_seq = changes[-1]["seq"]
+                    if len(changes) < BATCH_SIZE:
+                        break
+            except Exception:
+                logger.exception("Ошибка чтения журнала изменений")
+            if not self.subscribers:
+                break
+
+broadcaster = Broadcaster()
+
+def notify():
+    broadcaster.notify()
+
+async def changes(after, types):
+    # Изменения по порядку seq; None — сигнал отправить heartbeat
+    subscriber = Subscriber(types)
+    start = await broadcaster.subscribe(subscriber)
+    try:
+        if after is not None:
+            while after < start:
+                backlog = await database.run_session(read_changes, after, types, BATCH_SIZE, start)
+                for change in backlog:
+                    yield change
+                if len(backlog) < BATCH_SIZE:
+                    break
+                after = backlog[-1]["seq"]
+        while not (subscriber.overflowed and subscriber.queue.empty()):
+            try:
+                yield await asyncio.wait_for(subscriber.queue.get(), timeout=config.CHANGE_FEED_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield None
+    finally:
+        broadcaster.unsubscribe(subscriber)
+
+def sse_response(request: Request, after, types) -> StreamingResponse:
+    check_types(types)
+    # При переподключении браузер сам присылает Last-Event-ID — он важнее параметра after
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id is not None:
+        try:
+            after = int(last_event_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Некорректный Last-Event-ID")
+
+    async def events():
+        async for change in changes(after, types):
+            if change is None:
+                yield ": ping\n\n"
+            else:
+                yield f"id: {change['seq']}\nevent: change\ndata: {json.dumps(change, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+async def websocket_feed(websocket: WebSocket, after, types):
+    if types and set(types) - set(FEED_TYPES):
+        await websocket.close(code=1008, reason="Неизвестные виды документов")
+        return
+    await websocket.accept()
+    try:
+        async for change in changes(after, types):
+            if change is None:
+                await websocket.send_json({"op": "ping"})
+            else:
+                await websocket.send_json(change)
+        # Очередь переполнилась: клиент переподключается с последним полученным seq
+        await websocket.close(code=1013)
+    except WebSocketDisconnect:
+        pass
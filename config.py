@@ -0,0 +1,106 @@
+import os
+from dotenv import load_dotenv
+
+# Настройки читаются из переменных окружения (или файла .env)
+load_dotenv()
+
+def _flag(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+# Файл базы данных SQLite
+DATABASE_PATH = os.getenv("DATABASE_PATH", "./test.db")
+
+# Асинхронный режим: async-движок (aiosqlite) вместо пула потоков для запросов к базе
+DB_ASYNC = _flag("DB_ASYNC")
+
+# Пулы соединений: чтение (GET-запросы, только для чтения) и запись (изменяющие запросы).
+# Соединения сверх размера пула открываются на каждый запрос заново, поэтому пул чтения с запасом
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", str(max(16, 4 * (os.cpu_count() or 1)))))
+DB_READ_MAX_OVERFLOW = int(os.getenv("DB_READ_MAX_OVERFLOW", "10"))
+DB_WRITE_POOL_SIZE = int(os.getenv("DB_WRITE_POOL_SIZE", "1"))
+DB_WRITE_MAX_OVERFLOW = int(os.getenv("DB_WRITE_MAX_OVERFLOW", "0"))
+
+# Максимальное количество записей в одном пакетном запросе
+BULK_MAX_BATCH_SIZE = int(os.getenv("BULK_MAX_BATCH_SIZE", "1000"))
+
+# Размер пачки строк, читаемых за один раз при потоковой выгрузке
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Параметры соединений SQLite
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Групповая фиксация изменений одним потоком-писателем
+GROUP_COMMIT = _flag("GROUP_COMMIT")
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "2"))
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "100"))
+
+# Быстрая выдача списков: выборка только нужных колонок и кодирование orjson без повторной проверки Pydantic
+FAST_SERIALIZATION = _flag("FAST_SERIALIZATION", "true")
+
+# Кэш ответов списков в памяти процесса: число записей и максимальный размер одного ответа в байтах
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+RESPONSE_CACHE_MAX_BODY = int(os.getenv("RESPONSE_CACHE_MAX_BODY", str(1024 * 1024)))
+
+
+# Контроль допуска: одновременно выполняемые запросы чтения (из них списков — не больше ADMISSION_LIST_LIMIT,
+# остальные места остаются чтению объектов по номеру), записи и долгих передач (выгрузка, вложения, импорт).
+# Сумма пределов не должна превышать размер пула потоков (40). Запросы сверх предела ждут в очереди класса
+# (не больше ADMISSION_QUEUE_SIZE запросов и не дольше ADMISSION_QUEUE_TIMEOUT_MS), иначе получают 503
+# с Retry-After в ADMISSION_RETRY_AFTER секунд
+ADMISSION_CONTROL = _flag("ADMISSION_CONTROL", "true")
+ADMISSION_READ_LIMIT = int(os.getenv("ADMISSION_READ_LIMIT", "24"))
+ADMISSION_LIST_LIMIT = int(os.getenv("ADMISSION_LIST_LIMIT", "16"))
+ADMISSION_WRITE_LIMIT = int(os.getenv("ADMISSION_WRITE_LIMIT", "8"))
+ADMISSION_TRANSFER_LIMIT = int(os.getenv("ADMISSION_TRANSFER_LIMIT", "4"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "100"))
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "2000"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+
+# Кэш объектов по id (чтение объекта и вложенный сотрудник в ответах): число записей и время жизни записи
+# в секундах — за это время становятся видны изменения из других процессов. 0 записей — кэш выключен
+ENTITY_CACHE_SIZE = int(os.getenv("ENTITY_CACHE_SIZE", "10000"))
+ENTITY_CACHE_TTL = float(os.getenv("ENTITY_CACHE_TTL", "30"))
+
+# Метрики Prometheus на /metrics и порог (в миллисекундах), начиная с которого SQL-запрос пишется в журнал как медленный
+METRICS_ENABLED = _flag("METRICS_ENABLED", "true")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+# Лента изменений: период опроса журнала (изменения из других процессов), интервал heartbeat в секундах
+# и размер очереди подписчика, после переполнения которой он отключается
+CHANGE_FEED_POLL_INTERVAL = float(os.getenv("CHANGE_FEED_POLL_INTERVAL", "1"))
+CHANGE_FEED_HEARTBEAT = float(os.getenv("CHANGE_FEED_HEARTBEAT", "15"))
+CHANGE_FEED_QUEUE_SIZE = int(os.getenv("CHANGE_FEED_QUEUE_SIZE", "1000"))
+
+# Архив: документы старше ARCHIVE_AFTER_DAYS дней переносятся в файлы ARCHIVE_DIR/<год>.db
+# пачками по ARCHIVE_BATCH_SIZE строк с паузой ARCHIVE_PAUSE_MS между пачками
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "730"))
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "./archive")
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+ARCHIVE_PAUSE_MS = float(os.getenv("ARCHIVE_PAUSE_MS", "50"))
+
+# Вложения: каталог хранилища, максимальный размер файла и размер блока записи и выдачи в байтах,
+# а также возраст файла без ссылок (в секундах), после которого его удаляет сборка мусора
+ATTACHMENTS_DIR = os.getenv("ATTACHMENTS_DIR", "./attachments")
+ATTACHMENT_MAX_SIZE = int(os.getenv("ATTACHMENT_MAX_SIZE", str(1024 * 1024 * 1024)))
+ATTACHMENT_CHUNK_SIZE = int(os.getenv("ATTACHMENT_CHUNK_SIZE", str(1024 * 1024)))
+ATTACHMENT_GC_GRACE = float(os.getenv("ATTACHMENT_GC_GRACE", "3600"))
+
+# Импорт CSV: число потоков, обрабатывающих задания, строк в одной транзакции (пока она идёт, остальные
+# запросы записи ждут, поэтому пачка небольшая), максимальный размер файла
+# в байтах, число хранимых причин отклонения строк на задание и каталог для принятых файлов
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "2"))
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))
+IMPORT_MAX_SIZE = int(os.getenv("IMPORT_MAX_SIZE", str(1024 * 1024 * 1024)))
+IMPORT_MAX_REJECTS = int(os.getenv("IMPORT_MAX_REJECTS", "10000"))
+IMPORT_DIR = os.getenv("IMPORT_DIR", "./imports")
+
+# Профилирование запросов: запрос с заголовком X-Profile (значение — PROFILING_TOKEN; им же защищены
+# /admin/profiles, и без него оба недоступны) или случайная доля PROFILING_SAMPLE_RATE (от 0 до 1) запросов. Профили и списки
+# SQL-запросов (не больше PROFILING_MAX_SQL на запрос) хранятся в PROFILING_DIR, последние PROFILING_MAX_FILES
+PROFILING_ENABLED = _flag("PROFILING_ENABLED")
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILING_DIR = os.getenv("PROFILING_DIR", "./profiles")
+PROFILING_MAX_FILES = int(os.getenv("PROFILING_MAX_FILES", "100"))
+PROFILING_MAX_SQL = int(os.getenv("PROFILING_MAX_SQL", "1000"))
\ No newline at end of file
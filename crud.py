@@ -0,0 +1,148 @@
+from fastapi import HTTPException
+from sqlalchemy import delete, exists, inspect, update
+from sqlalchemy.orm import noload
+import archive, config, entitycache, models, pagination, serialization
+
+# Синхронные операции над сессией. Обработчики в main.py вызывают их через database.run,
+# поэтому одна и та же реализация работает и с обычной, и с асинхронной сессией.
+
+def get_or_404(db, model, item_id: int):
+    # В сессии чтения — через кэш объектов; запись всегда читает базу в своей транзакции
+    if entitycache.enabled(db):
+        item = entitycache.get(db, model, item_id)
+    else:
+        item = db.query(model).filter(model.id == item_id).first()
+    if not item:
+        raise HTTPException(status_code=404, detail=f"{model.__name__} с id={item_id} не найден")
+    return item
+
+def create_item(db, model, data: dict):
+    item = model(**data)
+    db.add(item)
+    db.commit()
+    db.refresh(item)
+    return item
+
+# Фильтры по периоду: параметр -> (колонка, нижняя граница); интервал полуоткрытый [from, to)
+PERIOD_FILTERS = {
+    "created_from": ("created_at", True),
+    "created_to": ("created_at", False),
+    "updated_from": ("updated_at", True),
+    "updated_to": ("updated_at", False),
+}
+
+def apply_filters(query, model, filters: dict):
+    # Остальные ключи — фильтры на равенство по одноимённой колонке
+    for key, value in filters.items():
+        if value is None:
+            continue
+        if key in PERIOD_FILTERS:
+            column, lower = PERIOD_FILTERS[key]
+            column = getattr(model, column)
+            query = query.filter(column >= value if lower else column < value)
+        else:
+            query = query.filter(getattr(model, key) == value)
+    return query
+
+def list_items(db, model, response, skip: int, limit: int, after: str = None, schema=None,
+               filters: dict = None, order_by: str = "id", fields=None):
+    # schema — схема элемента ответа. Если в ней нет вложенного сотрудника, связи не загружаются.
+    # fields — выбранные поля (serialization.select_fields); ответ с ними всегда собирается из колонок
+    years = archive.years_for(db, model, filters or {})
+    if years:
+        # Период задевает архив: та же выборка по объединению таблицы с архивными файлами
+        with archive.attached(db.connection(), years):
+            return _list_items(db, archive.source(model, years), response, skip, limit, after, schema, filters, order_by, fields)
+    return _list_items(db, model, response, skip, limit, after, schema, filters, order_by, fields)
+
+def _list_items(db, model, response, skip, limit, after, schema, filters, order_by, fields):
+    if config.FAST_SERIALIZATION or fields is not None:
+        layout = serialization.row_layout(model, schema, fields)
+        query = apply_filters(layout.query(db), model, filters or {})
+        rows = pagination.paginate(query, model, response, skip, limit, after, order_by)
+        return serialization.json_response(layout.encode(rows, layout.related(db, rows)), response)
+    references = [relationship.key for relationship in inspect(model).mapper.relationships if not relationship.uselist]
+    short = any(key not in schema.model_fields for key in references)
+    query = apply_filters(db.query(model), model, filters or {})
+    if short:
+        query = query.options(noload("*"))
+    items = pagination.paginate(query, model, response, skip, limit, after, order_by)
+    if not short:
+        return items
+    return [schema.model_validate(item, from_attributes=True) for item in items]
+
+def get_fields(db, model, schema, item_id: int, fields, response):
+    # Объект с выбранными полями: читаются только их колонки, ответ собирается без ORM-объекта
+    layout = serialization.row_layout(model, schema, fields)
+    row = layout.query(db).filter(model.id == item_id).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"{model.__name__} с id={item_id} не найден")
+    return serialization.json_response(serialization.dumps(layout.dicts([row], layout.related(db, [row]))[0]), response)
+
+def load_references(item):
+    # Связанный сотрудник (автор, подписант) подгружается сразу, пока сессия открыта
+    for relationship in inspect(type(item)).relationships:
+        if not relationship.uselist:
+            getattr(item, relationship.key)
+    return item
+
+def begin(db):
+    # Для записи с точками сохранения (пакет операций, импорт). pysqlite не открывает транзакцию
+    # перед SAVEPOINT, и освобождение первой точки сохранения зафиксировало бы её отдельно, поэтому
+    # транзакция открывается явно, сразу с блокировкой записи; при GROUP_COMMIT она уже открыта
+    connection = db.connection()
+    if not connection.connection.driver_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+def prepare(model, data: dict, partial: bool = False) -> dict:
+    # Проверка и подготовка данных создания или изменения (partial — PATCH). Общая для маршрутов
+    # main.py и пакета операций (batch.py): операция пакета ведёт себя так же, как её маршрут
+    if model is models.Employee and partial:
+        # null в PATCH сотрудника означает «не менять»
+        data = {key: value for key, value in data.items() if value is not None}
+    if model is models.OutgoingDocument:
+        method = data.get("delivery_method")
+        if (method is not None or partial and "delivery_method" in data) and method not in ["email", "mail"]:
+            raise HTTPException(status_code=400, detail="delivery_method: 'email' или 'mail'")
+    return data
+
+# Функции *_row не фиксируют транзакцию: их вызывают и операции ниже, и пакет операций (batch.py)
+
+def create_row(db, model, data: dict):
+    item = model(**data)
+    db.add(item)
+    db.flush()
+    return load_references(item)
+
+def update_row(db, model, item_id: int, data: dict):
+    # Один запрос UPDATE ... RETURNING вместо SELECT + UPDATE + SELECT
+    if not data:
+        return get_or_404(db, model, item_id)
+    item = db.scalars(update(model).where(model.id == item_id).values(**data).returning(model)).first()
+    if item is None:
+        raise HTTPException(status_code=404, detail=f"{model.__name__} с id={item_id} не найден")
+    return load_references(item)
+
+def delete_row(db, model, item_id: int):
+    # Один запрос DELETE; строка, на которую ссылаются документы, не удаляется. Ссылки из архива
+    # проверяются после DELETE: блокировка записи уже взята, и перенос строки в архив не
+    # проскочит между проверками. Исключение откатывает удаление вместе с транзакцией
+    conditions = [model.id == item_id]
+    for relationship in inspect(model).relationships:
+        if relationship.uselist:
+            for column in relationship.remote_side:
+                conditions.append(~exists().where(column == item_id))
+    if db.execute(delete(model).where(*conditions)).rowcount == 0:
+        get_or_404(db, model, item_id)
+        raise HTTPException(status_code=409, detail=f"{model.__name__} с id={item_id} используется в документах")
+    if archive.referenced(model, item_id):
+        raise HTTPException(status_code=409, detail=f"{model.__name__} с id={item_id} используется в документах архива")
+
+def update_item(db, model, item_id: int, data: dict):
+    item = update_row(db, model, item_id, data)
+    db.commit()
+    return item
+
+def delete_item(db, model, item_id: int):
+    delete_row(db, model, item_id)
+    db.commit()
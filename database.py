@@ -1,10 +1,75 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+import config, profiling
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{config.DATABASE_PATH}"
+ASYNC_SQLALCHEMY_DATABASE_URL = f"sqlite+aiosqlite:///{config.DATABASE_PATH}"
+# Тот же файл, открытый только для чтения: в режиме WAL такие соединения читают параллельно с записью
+READ_DATABASE_URL = f"sqlite:///file:{config.DATABASE_PATH}?mode=ro&uri=true"
+ASYNC_READ_DATABASE_URL = f"sqlite+aiosqlite:///file:{config.DATABASE_PATH}?mode=ro&uri=true"
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Движок записи — для изменяющих запросов. SQLite допускает одного писателя, поэтому по умолчанию
+# в пуле одно соединение: запросы записи ждут своей очереди в пуле, а не на блокировке базы.
+# uri: архивные файлы подключаются через ATTACH по адресу file:...?mode=ro (только чтение)
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False, "uri": True},
+                       pool_size=config.DB_WRITE_POOL_SIZE, max_overflow=config.DB_WRITE_MAX_OVERFLOW)
+# Объекты не сбрасываются при commit: ответ собирается из уже прочитанных значений без лишнего SELECT
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+# Движок чтения — для GET-запросов. read_only: в таких сессиях объекты можно брать из кэша (entitycache.py)
+read_engine = create_engine(READ_DATABASE_URL, connect_args={"check_same_thread": False},
+                            pool_size=config.DB_READ_POOL_SIZE, max_overflow=config.DB_READ_MAX_OVERFLOW)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=read_engine,
+                                info={"read_only": True})
 
-Base = declarative_base()
\ No newline at end of file
+# Асинхронные движки создаются только в режиме DB_ASYNC (нужен драйвер aiosqlite)
+async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, connect_args={"uri": True},
+                                   pool_size=config.DB_WRITE_POOL_SIZE, max_overflow=config.DB_WRITE_MAX_OVERFLOW) if config.DB_ASYNC else None
+AsyncSessionLocal = async_sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=async_engine)
+async_read_engine = create_async_engine(ASYNC_READ_DATABASE_URL, pool_size=config.DB_READ_POOL_SIZE,
+                                        max_overflow=config.DB_READ_MAX_OVERFLOW) if config.DB_ASYNC else None
+AsyncReadSessionLocal = async_sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=async_read_engine,
+                                          info={"read_only": True})
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL: читатели не блокируют писателя и наоборот; при synchronous=NORMAL фиксация
+    # не делает fsync, данные сбрасываются на диск при контрольной точке
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+def set_read_pragmas(dbapi_connection, connection_record):
+    # Режим журнала задаёт движок записи; соединению только для чтения нужно лишь ожидание блокировки
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+event.listen(engine, "connect", set_sqlite_pragmas)
+event.listen(read_engine, "connect", set_read_pragmas)
+if async_engine is not None:
+    event.listen(async_engine.sync_engine, "connect", set_sqlite_pragmas)
+    event.listen(async_read_engine.sync_engine, "connect", set_read_pragmas)
+
+Base = declarative_base()
+
+async def run(db, fn, *args):
+    # fn работает с обычной синхронной сессией. Для AsyncSession она выполняется через
+    # run_sync без занятия потока, для Session — в пуле потоков, как обычный def-обработчик
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args)
+    return await run_in_threadpool(profiling.wrap(fn), db, *args)
+
+async def run_session(fn, *args):
+    # То же, что run, но со своей короткой сессией чтения — для кода вне обработчиков (middleware и т.п.)
+    if config.DB_ASYNC:
+        async with AsyncReadSessionLocal() as db:
+            return await db.run_sync(fn, *args)
+
+    def call():
+        with ReadSessionLocal() as db:
+            return fn(db, *args)
+    return await run_in_threadpool(profiling.wrap(call))
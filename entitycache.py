@@ -0,0 +1,147 @@
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import inspect
+from sqlalchemy.orm.attributes import set_committed_value
+import config, httpcache
+
+# Кэш объектов по id в памяти процесса: значения колонок строки, без ORM-объектов и связей.
+# Используется только в сессиях чтения (ReadSessionLocal, info["read_only"]): чтение объекта
+# по номеру (crud.get_or_404) и вложенный сотрудник в быстрой выдаче списков и объектов
+# (serialization.py), которому больше не нужен JOIN. Служебная записка хранится отдельно
+# от своего автора, поэтому изменение сотрудника не требует сбрасывать документы.
+#
+# Любое изменение через main.write сбрасывает записи своей таблицы после фиксации. Сброс
+# увеличивает номер поколения таблицы, и прочитанное из базы до сброса в кэш уже не попадёт.
+# Списки сверяют записи с версией таблицы в table_versions (её увеличивают триггеры при любом
+# изменении, в том числе из других процессов), прочитанной в той же транзакции, что и страница:
+# ответ списка согласован с версиями, под которыми его сохраняет кэш ответов (httpcache.py).
+# Чтение объекта по номеру версию не читает, и изменения из других процессов (архив, второй
+# экземпляр приложения) видны в нём не позже чем через ENTITY_CACHE_TTL секунд. Запись в базу
+# (update, пакет операций) всегда читает саму базу в своей транзакции.
+
+class EntityCache:
+    # LRU по числу записей; запись годна до истечения срока и пока не сброшена её таблица
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # (таблица, id) -> (поколение, срок годности, версия таблицы или None, значения колонок)
+        self.entries = OrderedDict()
+        self.generations = {}
+        # таблица -> [попадания, промахи]
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def _count(self, table: str, hit: bool):
+        self.stats.setdefault(table, [0, 0])[0 if hit else 1] += 1
+
+    def generation(self, table: str) -> int:
+        with self.lock:
+            return self.generations.get(table, 0)
+
+    def get(self, table: str, item_id: int, version: int = None):
+        # version — текущая версия таблицы: запись, прочитанная при другой версии, не годится
+        key = (table, item_id)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and (entry[0] != self.generations.get(table, 0) or entry[1] < time.monotonic()):
+                del self.entries[key]
+                entry = None
+            if entry is not None and version is not None and entry[2] != version:
+                entry = None
+            self._count(table, entry is not None)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+            return entry[3]
+
+    def put(self, table: str, item_id: int, values: dict, generation: int, version: int = None):
+        # generation — поколение таблицы до чтения из базы: если с тех пор её сбросили, значения устарели
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            if self.generations.get(table, 0) != generation:
+                return
+            self.entries[(table, item_id)] = (generation, time.monotonic() + self.ttl, version, values)
+            self.entries.move_to_end((table, item_id))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, table: str):
+        # Записи старого поколения удаляются при обращении к ним или вытесняются
+        with self.lock:
+            self.generations[table] = self.generations.get(table, 0) + 1
+
+entity_cache = EntityCache(config.ENTITY_CACHE_SIZE, config.ENTITY_CACHE_TTL)
+
+def invalidate(table: str):
+    entity_cache.invalidate(table)
+
+def enabled(db) -> bool:
+    return entity_cache.max_entries > 0 and db.info.get("read_only", False)
+
+def _column_keys(model) -> list:
+    return [column.key for column in inspect(model).column_attrs]
+
+def _references(model) -> list:
+    # Связи «многие к одному» (автор, подписант): (имя связи, колонка ссылки, модель)
+    return [(relationship.key, next(iter(relationship.local_columns)).key, relationship.mapper.class_)
+            for relationship in inspect(model).relationships if not relationship.uselist]
+
+def snapshot(item) -> dict:
+    return {key: getattr(item, key) for key in _column_keys(type(item))}
+
+def get(db, model, item_id: int):
+    # Объект со связанными сотрудниками; на попадании — новый объект вне сессии, собранный из значений
+    table = model.__tablename__
+    values = entity_cache.get(table, item_id)
+    if values is not None:
+        item = model(**values)
+        for name, column, target in _references(model):
+            related = get(db, target, values[column]) if values[column] is not None else None
+            set_committed_value(item, name, related)
+        return item
+    generations = {target: entity_cache.generation(target.__tablename__) for _, _, target in _references(model)}
+    generation = entity_cache.generation(table)
+    item = db.query(model).filter(model.id == item_id).first()
+    if item is None:
+        return None
+    entity_cache.put(table, item_id, snapshot(item), generation)
+    for name, _, target in _references(model):
+        related = getattr(item, name)
+        if related is not None:
+            entity_cache.put(target.__tablename__, related.id, snapshot(related), generations[target])
+    return item
+
+def _version(db, table: str) -> int:
+    versions = httpcache.read_versions(db, (table,))
+    return versions[0][1] if versions else None
+
+def get_many(db, model, ids) -> dict:
+    # Значения колонок объектов по номерам: id -> значения; ненайденных в ответе нет.
+    # Годны только записи, прочитанные при текущей версии таблицы
+    table = model.__tablename__
+    use_cache = enabled(db) and bool(ids)
+    version = _version(db, table) if use_cache else None
+    found = {}
+    missing = []
+    for item_id in set(ids):
+        values = entity_cache.get(table, item_id, version) if use_cache else None
+        if values is None:
+            missing.append(item_id)
+        else:
+            found[item_id] = values
+    if missing:
+        generation = entity_cache.generation(table)
+        keys = _column_keys(model)
+        for row in db.query(*(getattr(model, key) for key in keys)).filter(model.id.in_(missing)):
+            values = dict(zip(keys, row))
+            found[values["id"]] = values
+            if use_cache:
+                entity_cache.put(table, values["id"], values, generation, version)
+    return found
+
+def stats() -> dict:
+    # Для метрик: таблица -> (попадания, промахи), и число записей
+    with entity_cache.lock:
+        return {table: tuple(counts) for table, counts in entity_cache.stats.items()}, len(entity_cache.entries)
@@ -0,0 +1,60 @@
+import csv
+import io
+import json
+from contextlib import closing
+from datetime import datetime
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+import archive, config, database
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} не сериализуется в JSON")
+
+def iter_batches(model, created_from: datetime = None, created_to: datetime = None):
+    # Строки читаются курсором пачками по EXPORT_BATCH_SIZE, ORM-объекты не создаются
+    with database.read_engine.connect() as conn:
+        # Старый период выгружается вместе с архивами
+        years = archive.years_for(conn, model, {"created_from": created_from, "created_to": created_to})
+        table = archive.union(model.__table__, years) if years else model.__table__
+        stmt = select(table).order_by(table.c.id)
+        if created_from is not None:
+            stmt = stmt.where(table.c.created_at >= created_from)
+        if created_to is not None:
+            stmt = stmt.where(table.c.created_at < created_to)
+        # Курсор закрывается до DETACH, в том числе при обрыве выгрузки
+        with archive.attached(conn, years), closing(conn.execution_options(yield_per=config.EXPORT_BATCH_SIZE).execute(stmt)) as result:
+            yield list(result.keys())
+            for batch in result.partitions():
+                yield batch
+
+def ndjson_lines(batches):
+    with closing(batches):
+        next(batches)
+        for batch in batches:
+            yield "".join(json.dumps(row._asdict(), default=_json_default, ensure_ascii=False) + "\n" for row in batch)
+
+def _drain(buffer):
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+def csv_lines(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    with closing(batches):
+        writer.writerow(next(batches))
+        yield _drain(buffer)
+        for batch in batches:
+            writer.writerows([value.isoformat() if isinstance(value, datetime) else value for value in row] for row in batch)
+            yield _drain(buffer)
+
+def export_response(model, name: str, fmt: str, created_from: datetime = None, created_to: datetime = None):
+    batches = iter_batches(model, created_from, created_to)
+    lines = csv_lines(batches) if fmt == "csv" else ndjson_lines(batches)
+    return StreamingResponse(lines, media_type=MEDIA_TYPES[fmt],
+                             headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'})
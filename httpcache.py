@@ -0,0 +1,140 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response
+from sqlalchemy import bindparam, text
+import config, database, models
+
+# Условные GET-запросы и кэш ответов. Версия каждой таблицы хранится в table_versions и
+# увеличивается триггерами при любом изменении строк, поэтому ETag списка вычисляется одним
+# чтением по первичному ключу и остаётся верным при записи из других процессов.
+
+# Таблицы, от которых зависит ответ списка (вложенный сотрудник — от employees)
+LIST_TABLES = {
+    "/employees/": ("employees",),
+    "/incoming/": ("incoming_documents",),
+    "/outgoing/": ("outgoing_documents",),
+    "/memos/": ("memos", "employees"),
+    "/reports/": ("reports", "employees"),
+    "/orders/": ("orders", "employees"),
+}
+
+def install(engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS table_versions ("
+                          "name VARCHAR(100) PRIMARY KEY, version INTEGER NOT NULL, changed_at VARCHAR(30) NOT NULL)"))
+        for table in models.Base.metadata.sorted_tables:
+            name = table.name
+            conn.execute(text("INSERT OR IGNORE INTO table_versions (name, version, changed_at) "
+                              "VALUES (:name, 0, strftime('%Y-%m-%d %H:%M:%f', 'now'))"), {"name": name})
+            for event in ("INSERT", "UPDATE", "DELETE"):
+                conn.execute(text(
+                    f"CREATE TRIGGER IF NOT EXISTS version_{name}_{event.lower()} AFTER {event} ON {name} BEGIN "
+                    f"UPDATE table_versions SET version = version + 1, changed_at = strftime('%Y-%m-%d %H:%M:%f', 'now') "
+                    f"WHERE name = '{name}'; END"))
+
+def read_versions(db, tables):
+    rows = db.execute(text("SELECT name, version, changed_at FROM table_versions WHERE name IN :names")
+                      .bindparams(bindparam("names", expanding=True)), {"names": list(tables)}).all()
+    return tuple(sorted((row.name, row.version, row.changed_at) for row in rows))
+
+def http_date(moment: datetime) -> str:
+    return format_datetime(moment.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    # If-None-Match важнее If-Modified-Since (RFC 9110)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or etag.removeprefix("W/") in [tag.removeprefix("W/") for tag in tags]
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return last_modified.astimezone(timezone.utc).replace(microsecond=0) <= since
+    return False
+
+def not_modified_response(etag: str, last_modified: datetime) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Last-Modified": http_date(last_modified)})
+
+class ResponseCache:
+    # LRU-кэш готовых тел ответов; запись годна, пока не изменились версии её таблиц
+    def __init__(self, max_entries: int, max_body_size: int):
+        self.max_entries = max_entries
+        self.max_body_size = max_body_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, versions):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != versions:
+                return None
+            self.entries.move_to_end(key)
+            return entry[1], entry[2]
+
+    def put(self, key, versions, body: bytes, headers: dict):
+        if self.max_entries <= 0 or len(body) > self.max_body_size:
+            return
+        with self.lock:
+            self.entries[key] = (versions, body, headers)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, table: str):
+        with self.lock:
+            for key in [key for key in self.entries if table in LIST_TABLES[key[0]]]:
+                del self.entries[key]
+
+response_cache = ResponseCache(config.RESPONSE_CACHE_SIZE, config.RESPONSE_CACHE_MAX_BODY)
+
+def invalidate(table: str):
+    response_cache.invalidate(table)
+
+async def conditional_get(request: Request, call_next):
+    # Middleware для GET-запросов списков: 304 по ETag/Last-Modified, затем кэш ответов
+    tables = LIST_TABLES.get(request.url.path)
+    if request.method != "GET" or tables is None:
+        return await call_next(request)
+    versions = await database.run_session(read_versions, tables)
+    query = "&".join(sorted(request.url.query.split("&"))) if request.url.query else ""
+    key = (request.url.path, query)
+    etag = 'W/"' + hashlib.sha1(repr((key, versions)).encode()).hexdigest() + '"'
+    last_modified = max(datetime.fromisoformat(changed_at).replace(tzinfo=timezone.utc) for _, _, changed_at in versions)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    cached = response_cache.get(key, versions)
+    if cached is not None:
+        body, headers = cached
+        return Response(content=body, headers=headers)
+    response = await call_next(request)
+    if response.status_code != 200:
+        return response
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    headers = {name: value for name, value in response.headers.items() if name != "content-length"}
+    headers.update({"ETag": etag, "Last-Modified": http_date(last_modified)})
+    response_cache.put(key, versions, body, headers)
+    return Response(content=body, headers=headers)
+
+def item_validators(item):
+    # ETag и Last-Modified объекта — по updated_at его и вложенного сотрудника
+    moments = [item.updated_at]
+    for relation in ("author", "signer"):
+        related = getattr(item, relation, None)
+        if related is not None:
+            moments.append(related.updated_at)
+    etag = f'W/"{item.id}-' + "-".join(f"{moment.timestamp():.6f}" for moment in moments) + '"'
+    return etag, max(moments)
+
+def conditional_item(request: Request, response: Response, item):
+    etag, last_modified = item_validators(item)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = http_date(last_modified)
+    return item
@@ -0,0 +1,173 @@
+import csv
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+from sqlalchemy import insert, text
+from sqlalchemy.exc import IntegrityError
+import attachments, bulk, config, crud, database, httpcache, models, schemas, writer
+
+# Импорт CSV фоновыми заданиями. Файл принимается потоком во временный файл (как вложения),
+# запрос сразу возвращает номер задания, а разбор идёт в пуле потоков IMPORT_WORKERS: строки
+# читаются csv.DictReader по одной, проверяются схемой создания (schemas.*Create) и теми же
+# проверками, что и пакетное создание (bulk.py), и вставляются пачками по IMPORT_CHUNK_SIZE —
+# каждая пачка в своей короткой транзакции, чтобы не задерживать остальных писателей.
+# Ход задания и отклонённые строки с причинами хранятся в import_jobs и import_rejects.
+#
+# Первая строка файла — заголовок с именами полей, как в выгрузке (/<раздел>/export?format=csv);
+# лишние колонки (id, created_at, updated_at) пропускаются, пустые значения считаются пустыми полями.
+
+logger = logging.getLogger(__name__)
+
+# Вид объекта: (модель, схема создания, проверки пачки)
+IMPORT_TYPES = {
+    "employees": (models.Employee, schemas.EmployeeCreate, (bulk.check_unique_emails,)),
+    "incoming": (models.IncomingDocument, schemas.IncomingDocumentCreate, ()),
+    "outgoing": (models.OutgoingDocument, schemas.OutgoingDocumentCreate, (bulk.check_delivery_method,)),
+    "memos": (models.Memo, schemas.MemoCreate, (bulk.check_employee_refs("author_id"),)),
+    "reports": (models.Report, schemas.ReportCreate, (bulk.check_employee_refs("author_id"),)),
+    "orders": (models.Order, schemas.OrderCreate, (bulk.check_employee_refs("signer_id"),)),
+}
+IMPORT_TYPE_PATTERN = f"^({'|'.join(IMPORT_TYPES)})$"
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+executor = ThreadPoolExecutor(max_workers=config.IMPORT_WORKERS, thread_name_prefix="import")
+
+def install(engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS import_jobs ("
+                          "id INTEGER PRIMARY KEY AUTOINCREMENT, type VARCHAR(20) NOT NULL, status VARCHAR(20) NOT NULL, "
+                          "rows_processed INTEGER NOT NULL DEFAULT 0, rows_imported INTEGER NOT NULL DEFAULT 0, "
+                          "rows_rejected INTEGER NOT NULL DEFAULT 0, error TEXT, created_at VARCHAR(30) NOT NULL, "
+                          "started_at VARCHAR(30), finished_at VARCHAR(30))"))
+        conn.execute(text("CREATE TABLE IF NOT EXISTS import_rejects ("
+                          "job_id INTEGER NOT NULL, line INTEGER NOT NULL, reason TEXT NOT NULL, PRIMARY KEY (job_id, line))"))
+        # Задания выполняются в процессе, принявшем файл; после перезапуска их уже некому продолжить
+        conn.execute(text("UPDATE import_jobs SET status = 'failed', error = 'Прервано перезапуском приложения', "
+                          "finished_at = :now WHERE status IN ('queued', 'running')"), {"now": _now()})
+
+def _now() -> str:
+    return datetime.now().strftime(TIME_FORMAT)
+
+def _write(fn, *args):
+    # Запись из потока задания: через общего писателя при GROUP_COMMIT, иначе в своей сессии
+    if config.GROUP_COMMIT:
+        return writer.group_writer.submit(fn, *args).result()
+    with database.SessionLocal() as db:
+        return fn(db, *args)
+
+def create_job(db, doc_type: str) -> int:
+    job_id = db.execute(text("INSERT INTO import_jobs (type, status, created_at) VALUES (:type, 'queued', :now) RETURNING id"),
+                        {"type": doc_type, "now": _now()}).scalar()
+    db.commit()
+    return job_id
+
+def _set_status(db, job_id: int, status: str, error: str = None):
+    column = "started_at" if status == "running" else "finished_at"
+    db.execute(text(f"UPDATE import_jobs SET status = :status, error = :error, {column} = :now WHERE id = :id"),
+               {"status": status, "error": error, "now": _now(), "id": job_id})
+    db.commit()
+
+def _reason(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors())
+
+def _insert(db, model, rows, lines, rejects):
+    # Пачка одним executemany; при нарушении ограничения (строку вставили параллельно) — построчно
+    try:
+        with db.begin_nested():
+            db.execute(insert(model), rows)
+        return len(rows)
+    except IntegrityError:
+        pass
+    imported = 0
+    for row, line in zip(rows, lines):
+        try:
+            with db.begin_nested():
+                db.execute(insert(model), [row])
+            imported += 1
+        except IntegrityError as e:
+            rejects.append((line, str(e.orig)))
+    return imported
+
+def write_chunk(db, job_id: int, model, checks, rows: list, lines: list, rejects: list, processed: int):
+    # Пачка, отклонённые строки и счётчики задания — в одной транзакции
+    crud.begin(db)
+    errors = {}
+    for check in checks:
+        for error in check(db, rows, lines):
+            errors.setdefault(error["loc"][1], error["msg"])
+    rejects = rejects + [(lines[index], msg) for index, msg in sorted(errors.items())]
+    valid = [index for index in range(len(rows)) if index not in errors]
+    imported = _insert(db, model, [rows[index] for index in valid], [lines[index] for index in valid], rejects) if valid else 0
+    stored = db.execute(text("SELECT rows_rejected FROM import_jobs WHERE id = :id"), {"id": job_id}).scalar()
+    room = max(0, config.IMPORT_MAX_REJECTS - stored)
+    if rejects[:room]:
+        db.execute(text("INSERT OR REPLACE INTO import_rejects (job_id, line, reason) VALUES (:job_id, :line, :reason)"),
+                   [{"job_id": job_id, "line": line, "reason": reason} for line, reason in rejects[:room]])
+    db.execute(text("UPDATE import_jobs SET status = 'running', error = NULL, rows_processed = rows_processed + :processed, "
+                    "rows_imported = rows_imported + :imported, rows_rejected = rows_rejected + :rejected WHERE id = :id"),
+               {"processed": processed, "imported": imported, "rejected": len(rejects), "id": job_id})
+    db.commit()
+
+def run_job(job_id: int, doc_type: str, path: Path):
+    model, schema, checks = IMPORT_TYPES[doc_type]
+    try:
+        _write(_set_status, job_id, "running")
+        with open(path, newline="", encoding="utf-8-sig") as file:
+            reader = csv.DictReader(file)
+            missing = [name for name, field in schema.model_fields.items()
+                       if field.is_required() and name not in (reader.fieldnames or [])]
+            if missing:
+                raise ValueError(f"В заголовке нет колонок: {', '.join(missing)}")
+            rows, lines, rejects, processed = [], [], [], 0
+            for record in reader:
+                processed += 1
+                data = {name: value if value != "" else None for name, value in record.items() if name in schema.model_fields}
+                try:
+                    rows.append(schema.model_validate(data).model_dump())
+                    lines.append(reader.line_num)
+                except ValidationError as e:
+                    rejects.append((reader.line_num, _reason(e)))
+                if processed == config.IMPORT_CHUNK_SIZE:
+                    _write(write_chunk, job_id, model, checks, rows, lines, rejects, processed)
+                    httpcache.invalidate(model.__tablename__)
+                    rows, lines, rejects, processed = [], [], [], 0
+            if processed:
+                _write(write_chunk, job_id, model, checks, rows, lines, rejects, processed)
+                httpcache.invalidate(model.__tablename__)
+        _write(_set_status, job_id, "done")
+    except Exception as e:
+        logger.exception("Ошибка импорта, задание %s", job_id)
+        _write(_set_status, job_id, "failed", str(e))
+    finally:
+        path.unlink(missing_ok=True)
+
+async def start(request: Request, db, doc_type: str) -> dict:
+    path, _, _ = await attachments.receive(request, Path(config.IMPORT_DIR), config.IMPORT_MAX_SIZE)
+    try:
+        job_id = await writer.write(db, create_job, doc_type)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    executor.submit(run_job, job_id, doc_type, path)
+    return await database.run_session(get_job, job_id)
+
+def get_job(db, job_id: int) -> dict:
+    row = db.execute(text("SELECT * FROM import_jobs WHERE id = :id"), {"id": job_id}).mappings().first()
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"Задание импорта с id={job_id} не найдено")
+    job = dict(row)
+    job["rows_per_second"] = None
+    if job["started_at"] is not None:
+        finished = datetime.fromisoformat(job["finished_at"]) if job["finished_at"] else datetime.now()
+        elapsed = (finished - datetime.fromisoformat(job["started_at"])).total_seconds()
+        job["rows_per_second"] = round(job["rows_processed"] / elapsed, 1) if elapsed > 0 else None
+    return job
+
+def get_rejects(db, job_id: int, after: int, limit: int) -> list:
+    get_job(db, job_id)
+    rows = db.execute(text("SELECT line, reason FROM import_rejects WHERE job_id = :id AND line > :after ORDER BY line LIMIT :limit"),
+                      {"id": job_id, "after": after, "limit": limit}).mappings().all()
+    return [dict(row) for row in rows]
@@ -1,9 +1,22 @@
-from fastapi import FastAPI, Depends, HTTPException, Query, Path
-from sqlalchemy.orm import Session
-from typing import List
-import models, schemas, database, metadata
+from fastapi import FastAPI, Depends, HTTPException, Query, Path, Request, Response, Body, WebSocket, Header
+from typing import List, Optional, Union
+from datetime import date, datetime
+from starlette.concurrency import run_in_threadpool
+import models, schemas, database, metadata, pagination, bulk, config, export, crud, writer, search, httpcache, stats, metrics, changefeed, sync, archive, serialization, attachments, batch, importer, admission, profiling, entitycache
 
 models.Base.metadata.create_all(bind=database.engine)
+archive.migrate(database.engine)
+# create_all не добавляет новые индексы в уже существующие таблицы
+for table in models.Base.metadata.sorted_tables:
+    for index in table.indexes:
+        index.create(bind=database.engine, checkfirst=True)
+search.install(database.engine)
+httpcache.install(database.engine)
+archive.install(database.engine)
+attachments.install(database.engine)
+importer.install(database.engine)
+stats.install(database.engine)
+changefeed.install(database.engine)
 
 app = FastAPI(
     title="Система Электронного Документооборота",
@@ -11,316 +24,683 @@ app = FastAPI(
     openapi_tags=metadata.tags_metadata,
     version="1.0"
 )
-
-def get_db():
+app.middleware("http")(httpcache.conditional_get)
+engines = {"default": database.engine, "read": database.read_engine, "writer": writer.writer_engine}
+if database.async_engine is not None:
+    engines["async"] = database.async_engine.sync_engine
+    engines["async_read"] = database.async_read_engine.sync_engine
+# Профилирование — внутри контроля допуска: профилируются только допущенные запросы
+if config.PROFILING_ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+    profiling.warn_without_token()
+    for name, engine in engines.items():
+        profiling.instrument_engine(engine, name)
+# Контроль допуска — снаружи кэша ответов, но внутри метрик, чтобы отказы 503 попадали в метрики
+if config.ADMISSION_CONTROL:
+    app.add_middleware(admission.AdmissionMiddleware)
+# Метрики подключаются последними (внешний слой), чтобы учитывать и ответы из кэша
+if config.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+    for name, engine in engines.items():
+        metrics.instrument_engine(engine, name)
+
+def get_sync_db():
     db = database.SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
-def get_or_404(db, model, item_id: int):
-    item = db.query(model).filter(model.id == item_id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail=f"{model.__name__} с id={item_id} не найден")
-    return item
+async def get_async_db():
+    async with database.AsyncSessionLocal() as db:
+        yield db
+
+def get_sync_read_db():
+    db = database.ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db():
+    async with database.AsyncReadSessionLocal() as db:
+        yield db
+
+# Режим работы с базой выбирается настройкой DB_ASYNC. GET-запросы получают сессию
+# из пула соединений только для чтения, изменяющие — из пула записи
+get_db = get_async_db if config.DB_ASYNC else get_sync_db
+get_read_db = get_async_read_db if config.DB_ASYNC else get_sync_read_db
+
+async def write(db, model, fn, *args):
+    # Все изменения проходят здесь: слой записи, затем сброс кэшей ответов и объектов по таблице
+    # и сигнал ленте изменений (сама запись в журнал сделана триггером)
+    result = await writer.write(db, fn, model, *args)
+    httpcache.invalidate(model.__tablename__)
+    entitycache.invalidate(model.__tablename__)
+    changefeed.notify()
+    return result
+
+def period_filters(
+        created_from: Optional[datetime] = Query(None, description=metadata.query_description7),
+        created_to: Optional[datetime] = Query(None, description=metadata.query_description8),
+        updated_from: Optional[datetime] = Query(None, description=metadata.query_description13),
+        updated_to: Optional[datetime] = Query(None, description=metadata.query_description14)):
+    return {"created_from": created_from, "created_to": created_to, "updated_from": updated_from, "updated_to": updated_to}
 
 # Запросы для сотрудников
 @app.post("/employees/", response_model=schemas.Employee, tags=["Сотрудники"], summary = metadata.summary_emp1, description=metadata.summary_emp1, response_description=metadata.response_description1)
-def create_employee(employee: schemas.EmployeeCreate, db: Session = Depends(get_db)):
-    db_emp = models.Employee(**employee.model_dump())
-    db.add(db_emp)
-    db.commit()
-    db.refresh(db_emp)
-    return db_emp
+async def create_employee(employee: schemas.EmployeeCreate, db = Depends(get_db)):
+    return await write(db, models.Employee, crud.create_item, employee.model_dump())
+
+@app.post("/employees/bulk", response_model=schemas.BulkCreateResult, tags=["Сотрудники"], summary = metadata.summary_emp6, description=metadata.summary_emp6, response_description=metadata.response_description7)
+async def create_employees_bulk(
+        employees: List[schemas.EmployeeCreate] = Body(..., max_length=config.BULK_MAX_BATCH_SIZE, description=metadata.body_description1),
+        db = Depends(get_db)):
+    return await write(db, models.Employee, bulk.bulk_create, employees, bulk.check_unique_emails)
 
 @app.get("/employees/",response_model=List[schemas.Employee], tags=["Сотрудники"], summary = metadata.summary_emp2, description=metadata.summary_emp2, response_description=metadata.response_description1)
-def read_employees(
+async def read_employees(
+        response: Response,
         skip: int = Query(0, description=metadata.query_description1),
         limit: int = Query(100, description=metadata.query_description2),
-        db: Session = Depends(get_db)):
-    return db.query(models.Employee).offset(skip).limit(limit).all()
+        after: Optional[str] = Query(None, description=metadata.query_description4),
+        order_by: str = Query("id", pattern=pagination.SORT_PATTERN, description=metadata.query_description12),
+        fields: Optional[str] = Query(None, description=metadata.query_description31),
+        view: str = Query("full", pattern="^(full|summary)$", description=metadata.query_description32),
+        filters: dict = Depends(period_filters),
+        db = Depends(get_read_db)):
+    selection = serialization.select_fields(models.Employee, schemas.Employee, fields, view)
+    return await database.run(db, crud.list_items, models.Employee, response, skip, limit, after, schemas.Employee, filters, order_by, selection)
+
+@app.get("/employees/export", tags=["Сотрудники"], summary = metadata.summary_emp7, description=metadata.summary_emp7)
+def export_employees(
+        fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$", description=metadata.query_description6),
+        created_from: Optional[datetime] = Query(None, description=metadata.query_description7),
+        created_to: Optional[datetime] = Query(None, description=metadata.query_description8)):
+    return export.export_response(models.Employee, "employees", fmt, created_from, created_to)
+
+@app.get("/employees/sync", response_model=schemas.SyncResult[schemas.Employee], tags=["Сотрудники"], summary = metadata.summary_emp9, description=metadata.summary_emp9, response_description=metadata.response_description12)
+async def sync_employees(
+        response: Response,
+        updated_since: Optional[str] = Query(None, description=metadata.query_description29),
+        limit: int = Query(500, ge=1, le=5000, description=metadata.query_description30),
+        db = Depends(get_read_db)):
+    return await database.run(db, sync.sync_items, models.Employee, schemas.Employee, response, updated_since, limit)
+
+@app.get("/employees/{emp_id}", response_model=schemas.Employee, tags=["Сотрудники"], summary = metadata.summary_emp8, description=metadata.summary_emp8, response_description=metadata.response_description1)
+async def read_employee(
+        request: Request,
+        response: Response,
+        emp_id: int = Path(..., description=metadata.query_description3),
+        fields: Optional[str] = Query(None, description=metadata.query_description31),
+        db = Depends(get_read_db)):
+    if fields is not None:
+        selection = serialization.select_fields(models.Employee, schemas.Employee, fields)
+        return await database.run(db, crud.get_fields, models.Employee, schemas.Employee, emp_id, selection, response)
+    item = await database.run(db, crud.get_or_404, models.Employee, emp_id)
+    return httpcache.conditional_item(request, response, item)
 
 @app.put("/employees/{emp_id}", response_model=schemas.Employee, tags=["Сотрудники"], summary = metadata.summary_emp3, description=metadata.summary_emp3, response_description=metadata.response_description1)
-def update_employee(
+async def update_employee(
         data: schemas.EmployeeUpdate,
         emp_id: int = Path(..., description=metadata.query_description3),
-        db: Session = Depends(get_db)):
-    emp = get_or_404(db, models.Employee, emp_id)
-    for key, value in data.model_dump().items():
-        setattr(emp, key, value)
-    db.commit()
-    db.refresh(emp)
-    return emp
+        db = Depends(get_db)):
+    return await write(db, models.Employee, crud.update_item, emp_id, data.model_dump())
 
 @app.patch("/employees/{emp_id}", response_model=schemas.Employee, tags=["Сотрудники"], summary = metadata.summary_emp4, description=metadata.summary_emp4, response_description=metadata.response_description1)
-def partial_update_employee(
+async def partial_update_employee(
         data: schemas.EmployeeUpdate,
         emp_id: int = Path(..., description=metadata.query_description3),
-        db: Session = Depends(get_db)):
-    emp = get_or_404(db, models.Employee, emp_id)
-    for key, value in data.model_dump(exclude_unset=True).items():
-        if value is not None:
-            setattr(emp, key, value)
-    db.commit()
-    db.refresh(emp)
-    return emp
+        db = Depends(get_db)):
+    update_data = crud.prepare(models.Employee, data.model_dump(exclude_unset=True), partial=True)
+    return await write(db, models.Employee, crud.update_item, emp_id, update_data)
 
 @app.delete("/employees/{emp_id}", tags=["Сотрудники"], summary = metadata.summary_emp5, description=metadata.summary_emp5)
-def delete_employee(
+async def delete_employee(
         emp_id: int = Path(..., description=metadata.query_description3),
-        db: Session = Depends(get_db)):
-    emp = get_or_404(db, models.Employee, emp_id)
-    db.delete(emp)
-    db.commit()
+        db = Depends(get_db)):
+    await write(db, models.Employee, crud.delete_item, emp_id)
     return {"detail": f"Сотрудник с id={emp_id} успешно удалён"}
 
 # Запросы для входящих документов
 @app.post("/incoming/", response_model=schemas.IncomingDocument, tags=["Входящие документы"], summary = metadata.summary_inc1, description=metadata.summary_inc1, response_description=metadata.response_description2)
-def create_incoming(doc: schemas.IncomingDocumentCreate, db: Session = Depends(get_db)):
-    db_doc = models.IncomingDocument(**doc.model_dump())
-    db.add(db_doc)
-    db.commit()
-    db.refresh(db_doc)
-    return db_doc
+async def create_incoming(doc: schemas.IncomingDocumentCreate, db = Depends(get_db)):
+    return await write(db, models.IncomingDocument, crud.create_item, doc.model_dump())
+
+@app.post("/incoming/bulk", response_model=schemas.BulkCreateResult, tags=["Входящие документы"], summary = metadata.summary_inc6, description=metadata.summary_inc6, response_description=metadata.response_description7)
+async def create_incoming_bulk(
+        docs: List[schemas.IncomingDocumentCreate] = Body(..., max_length=config.BULK_MAX_BATCH_SIZE, description=metadata.body_description1),
+        db = Depends(get_db)):
+    return await write(db, models.IncomingDocument, bulk.bulk_create, docs)
 
 @app.get("/incoming/", response_model=List[schemas.IncomingDocument], tags=["Входящие документы"], summary = metadata.summary_inc2, description=metadata.summary_inc2, response_description=metadata.response_description2)
-def read_incoming(
+async def read_incoming(
+        response: Response,
         skip: int = Query(0, description=metadata.query_description1),
         limit: int = Query(100, description=metadata.query_description2),
-        db: Session = Depends(get_db)):
-    return db.query(models.IncomingDocument).offset(skip).limit(limit).all()
+        after: Optional[str] = Query(None, description=metadata.query_description4),
+        order_by: str = Query("id", pattern=pagination.SORT_PATTERN, description=metadata.query_description12),
+        sender_id: Optional[str] = Query(None, description=metadata.query_description15),
+        fields: Optional[str] = Query(None, description=metadata.query_description31),
+        view: str = Query("full", pattern="^(full|summary)$", description=metadata.query_description32),
+        filters: dict = Depends(period_filters),
+        db = Depends(get_read_db)):
+    filters = dict(filters, sender_id=sender_id)
+    selection = serialization.select_fields(models.IncomingDocument, schemas.IncomingDocument, fields, view)
+    return await database.run(db, crud.list_items, models.IncomingDocument, response, skip, limit, after, schemas.IncomingDocument, filters, order_by, selection)
+
+@app.get("/incoming/export", tags=["Входящие документы"], summary = metadata.summary_inc7, description=metadata.summary_inc7)
+def export_incoming(
+        fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$", description=metadata.query_description6),
+        created_from: Optional[datetime] = Query(None, description=metadata.query_description7),
+        created_to: Optional[datetime] = Query(None, description=metadata.query_description8)):
+    return export.export_response(models.IncomingDocument, "incoming", fmt, created_from, created_to)
+
+@app.get("/incoming/sync", response_model=schemas.SyncResult[schemas.IncomingDocument], tags=["Входящие документы"], summary = metadata.summary_inc9, description=metadata.summary_inc9, response_description=metadata.response_description12)
+async def sync_incoming(
+        response: Response,
+        updated_since: Optional[str] = Query(None, description=metadata.query_description29),
+        limit: int = Query(500, ge=1, le=5000, description=metadata.query_description30),
+        db = Depends(get_read_db)):
+    return await database.run(db, sync.sync_items, models.IncomingDocument, schemas.IncomingDocument, response, updated_since, limit)
+
+@app.get("/incoming/{doc_id}", response_model=schemas.IncomingDocument, tags=["Входящие документы"], summary = metadata.summary_inc8, description=metadata.summary_inc8, response_description=metadata.response_description2)
+async def read_incoming_document(
+        request: Request,
+        response: Response,
+        doc_id: int = Path(..., description=metadata.query_description3),
+        fields: Optional[str] = Query(None, description=metadata.query_description31),
+        db = Depends(get_read_db)):
+    if fields is not None:
+        selection = serialization.select_fields(models.IncomingDocument, schemas.IncomingDocument, fields)
+        return await database.run(db, crud.get_fields, models.IncomingDocument, schemas.IncomingDocument, doc_id, selection, response)
+    item = await database.run(db, crud.get_or_404, models.IncomingDocument, doc_id)
+    return httpcache.conditional_item(request, response, item)
 
 @app.put("/incoming/{doc_id}", response_model=schemas.IncomingDocument, tags=["Входящие документы"], summary = metadata.summary_inc3, description=metadata.summary_inc3, response_description=metadata.response_description2)
-def update_incoming(
+async def update_incoming(
         data: schemas.IncomingDocumentUpdate,
         doc_id: int = Path(..., description=metadata.query_description3),
-        db: Session = Depends(get_db)):
-    doc = get_or_404(db, models.IncomingDocument, doc_id)
-    for key, value in data.model_dump().items():
-        setattr(doc, key, value)
-    db.commit()
-    db.refresh(doc)
-    return doc
+        db = Depends(get_db)):
+    return await write(db, models.IncomingDocument, crud.update_item, doc_id, data.model_dump())
 
 @app.patch("/incoming/{doc_id}", response_model=schemas.IncomingDocument, tags=["Входящие документы"], summary = metadata.summary_inc4, description=metadata.summary_inc4, response_description=metadata.response_description2)
-def partial_update_incoming(
+async def partial_update_incoming(
         data: schemas.IncomingDocumentUpdate,
         doc_id: int = Path(..., description=metadata.query_description3),
-        db: Session = Depends(get_db)):
-    doc = get_or_404(db, models.IncomingDocument, doc_id)
-    for key, value in data.model_dump(exclude_unset=True).items():
-        setattr(doc, key, value)
-    db.commit()
-    db.refresh(doc)
-    return doc
+        db = Depends(get_db)):
+    return await write(db, models.IncomingDocument, crud.update_item, doc_id, data.model_dump(exclude_unset=True))
 
 @app.delete("/incoming/{doc_id}", tags=["Входящие документы"], summary = metadata.summary_inc5, description=metadata.summary_inc5)
-def delete_incoming(
+async def delete_incoming(
         doc_id: int = Path(..., description=metadata.query_description3),
-        db: Session = Depends(get_db)):
-    doc = get_or_404(db, models.IncomingDocument, doc_id)
-    db.delete(doc)
-    db.commit()
+        db = Depends(get_db)):
+    await write(db, models.IncomingDocument, crud.delete_item, doc_id)
     return {"detail": f"Входящий документ с id={doc_id} удалён"}
 
 # Запросы для исходящих документов
 @app.post("/outgoing/", response_model=schemas.OutgoingDocument, tags=["Исходящие документы"], summary = metadata.summary_out1, description=metadata.summary_out1, response_description=metadata.response_description3)
-def create_outgoing(doc: schemas.OutgoingDocumentCreate, db: Session = Depends(get_db)):
-    db_doc = models.OutgoingDocument(**doc.model_dump())
-    db.add(db_doc)
-    db.commit()
-    db.refresh(db_doc)
-    return db_doc
+async def create_outgoing(doc: schemas.OutgoingDocumentCreate, db = Depends(get_db)):
+    return await write(db, models.OutgoingDocument, crud.create_item, crud.prepare(models.OutgoingDocument, doc.model_dump()))
+
+@app.post("/outgoing/bulk", response_model=schemas.BulkCreateResult, tags=["Исходящие документы"], summary = metadata.summary_out6, description=metadata.summary_out6, response_description=metadata.response_description7)
+async def create_outgoing_bulk(
+        docs: List[schemas.OutgoingDocumentCreate] = Body(..., max_length=config.BULK_MAX_BATCH_SIZE, description=metadata.body_description1),
+        db = Depends(get_db)):
+    return await write(db, models.OutgoingDocument, bulk.bulk_create, docs, bulk.check_delivery_method)
 
 @app.get("/outgoing/", response_model=List[schemas.OutgoingDocument], tags=["Исходящие документы"], summary = metadata.summary_out2, description=metadata.summary_out2, response_description=metadata.response_description3)
-def read_outgoing(
+async def read_outgoing(
+        response: Response,
         skip: int = Query(0, description=metadata.query_description1),
         limit: int = Query(100, description=metadata.query_description2),
-        db: Session = Depends(get_db)):
-    return db.query(models.OutgoingDocument).offset(skip).limit(limit).all()
+        after: Optional[str] = Query(None, description=metadata.query_description4),
+        order_by: str = Query("id", pattern=pagination.SORT_PATTERN, description=metadata.query_description12),
+        recipient_id: Optional[str] = Query(None, description=metadata.query_description16),
+        delivery_method: Optional[str] = Query(None, pattern="^(email|mail)$", description=metadata.query_description17),
+        fields: Optional[str] = Query(None, description=metadata.query_description31),
+        view: str = Query("full", pattern="^(full|summary)$", description=metadata.query_description32),
+        filters: dict = Depends(period_filters),
+        db = Depends(get_read_db)):
+    filters = dict(filters, recipient_id=recipient_id, delivery_method=delivery_method)
+    selection = serialization.select_fields(models.OutgoingDocument, schemas.OutgoingDocument, fields, view)
+    return await database.run(db, crud.list_items, models.OutgoingDocument, response, skip, limit, after, schemas.OutgoingDocument, filters, order_by, selection)
+
+@app.get("/outgoing/export", tags=["Исходящие документы"], summary = metadata.summary_out7, description=metadata.summary_out7)
+def export_outgoing(
+        fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$", description=metadata.query_description6),
+        created_from: Optional[datetime] = Query(None, description=metadata.query_description7),
+        created_to: Optional[datetime] = Query(None, description=metadata.query_description8)):
+    return export.export_response(models.OutgoingDocument, "outgoing", fmt, created_from, created_to)
+
+@app.get("/outgoing/sync", response_model=schemas.SyncResult[schemas.OutgoingDocument], tags=["Исходящие документы"], summary = metadata.summary_out9, description=metadata.summary_out9, response_description=metadata.response_description12)
+async def sync_outgoing(
+        response: Response,
+        updated_since: Optional[str] = Query(None, description=metadata.query_description29),
+        limit: int = Query(500, ge=1, le=5000, description=metadata.query_description30),
+        db = Depends(get_read_db)):
+    return await database.run(db, sync.sync_items, models.OutgoingDocument, schemas.OutgoingDocument, response, updated_since, limit)
+
+@app.get("/outgoing/{doc_id}", response_model=schemas.OutgoingDocument, tags=["Исходящие документы"], summary = metadata.summary_out8, description=metadata.summary_out8, response_description=metadata.response_description3)
+async def read_outgoing_document(
+        request: Request,
+        response: Response,
+        doc_id: int = Path(..., description=metadata.query_description3),
+        fields: Optional[str] = Query(None, description=metadata.query_description31),
+        db = Depends(get_read_db)):
+    if fields is not None:
+        selection = serialization.select_fields(models.OutgoingDocument, schemas.OutgoingDocument, fields)
+        return await database.run(db, crud.get_fields, models.OutgoingDocument, schemas.OutgoingDocument, doc_id, selection, response)
+    item = await database.run(db, crud.get_or_404, models.OutgoingDocument, doc_id)
+    return httpcache.conditional_item(request, response, item)
 
 @app.put("/outgoing/{doc_id}", response_model=schemas.OutgoingDocument, tags=["Исходящие документы"], summary = metadata.summary_out3, description=metadata.summary_out3, response_description=metadata.response_description3)
-def update_outgoing(
+async def update_outgoing(
         data: schemas.OutgoingDocumentUpdate,
         doc_id: int = Path(..., description=metadata.query_description3),
-        db: Session = Depends(get_db)):
-    doc = get_or_404(db, models.OutgoingDocument, doc_id)
-    if data.delivery_method and data.delivery_method not in ["email", "mail"]:
-        raise HTTPException(status_code=400, detail="delivery_method: 'email' или 'mail'")
-    for key, value in data.model_dump().items():
-        setattr(doc, key, value)
-    db.commit()
-    db.refresh(doc)
-    return doc
+        db = Depends(get_db)):
+    return await write(db, models.OutgoingDocument, crud.update_item, doc_id, crud.prepare(models.OutgoingDocument, data.model_dump()))
 
 @app.patch("/outgoing/{doc_id}", response_model=schemas.OutgoingDocument, tags=["Исходящие документы"], summary = metadata.summary_out4, description=metadata.summary_out4, response_description=metadata.response_description3)
-def partial_update_outgoing(
+async def partial_update_outgoing(
         data: schemas.OutgoingDocumentUpdate,
         doc_id: int = Path(..., description=metadata.query_description3),
-        db: Session = Depends(get_db)):
-    doc = get_or_404(db, models.OutgoingDocument, doc_id)
-    update_data = data.model_dump(exclude_unset=True)
-    if "delivery_method" in update_data and update_data["delivery_method"] not in ["email", "mail"]:
-        raise HTTPException(status_code=400, detail="delivery_method: 'email' или 'mail'")
-    for key, value in update_data.items():
-        setattr(doc, key, value)
-    db.commit()
-    db.refresh(doc)
-    return doc
+        db = Depends(get_db)):
+    update_data = crud.prepare(models.OutgoingDocument, data.model_dump(exclude_unset=True), partial=True)
+    return await write(db, models.OutgoingDocument, crud.update_item, doc_id, update_data)
 
 @app.delete("/outgoing/{doc_id}", tags=["Исходящие документы"], summary = metadata.summary_out5, description=metadata.summary_out5)
-def delete_outgoing(
+async def delete_outgoing(
         doc_id: int = Path(..., description=metadata.query_description3),
-        db: Session = Depends(get_db)):
-    doc = get_or_404(db, models.OutgoingDocument, doc_id)
-    db.delete(doc)
-    db.commit()
+        db = Depends(get_db)):
+    await write(db, models.OutgoingDocument, crud.delete_item, doc_id)
     return {"detail": f"Исходящий документ с id={doc_id} удалён"}
 
 # Запросы для служебных записок
 @app.post("/memos/", response_model=schemas.Memo, tags=["Служебные записки"], summary = metadata.summary_memo1, description=metadata.summary_memo1, response_description=metadata.response_description4)
-def create_memo(memo: schemas.MemoCreate, db: Session = Depends(get_db)):
-    db_memo = models.Memo(**memo.model_dump())
-    db.add(db_memo)
-    db.commit()
-    db.refresh(db_memo)
-    return db_memo
-
-@app.get("/memos/", response_model=List[schemas.Memo], tags=["Служебные записки"], summary = metadata.summary_memo2, description=metadata.summary_memo2, response_description=metadata.response_description4)
-def read_memos(
+async def create_memo(memo: schemas.MemoCreate, db = Depends(get_db)):
+    return await write(db, models.Memo, crud.create_item, memo.model_dump())
+
+@app.post("/memos/bulk", response_model=schemas.BulkCreateResult, tags=["Служебные записки"], summary = metadata.summary_memo6, description=metadata.summary_memo6, response_description=metadata.response_description7)
+async def create_memos_bulk(
+        memos: List[schemas.MemoCreate] = Body(..., max_length=config.BULK_MAX_BATCH_SIZE, description=metadata.body_description1),
+        db = Depends(get_db)):
+    return await write(db, models.Memo, bulk.bulk_create, memos, bulk.check_employee_refs("author_id"))
+
+@app.get("/memos/", response_model=List[Union[schemas.Memo, schemas.MemoShort]], tags=["Служебные записки"], summary = metadata.summary_memo2, description=metadata.summary_memo2, response_description=metadata.response_description4)
+async def read_memos(
+        response: Response,
         skip: int = Query(0, description=metadata.query_description1),
         limit: int = Query(100, description=metadata.query_description2),
-        db: Session = Depends(get_db)):
-    return db.query(models.Memo).offset(skip).limit(limit).all()
+        after: Optional[str] = Query(None, description=metadata.query_description4),
+        nested: bool = Query(True, description=metadata.query_description5),
+        order_by: str = Query("id", pattern=pagination.SORT_PATTERN, description=metadata.query_description12),
+        author_id: Optional[int] = Query(None, description=metadata.query_description18),
+        fields: Optional[str] = Query(None, description=metadata.query_description31),
+        view: str = Query("full", pattern="^(full|summary)$", description=metadata.query_description32),
+        filters: dict = Depends(period_filters),
+        db = Depends(get_read_db)):
+    schema = schemas.Memo if nested else schemas.MemoShort
+    filters = dict(filters, author_id=author_id)
+    selection = serialization.select_fields(models.Memo, schema, fields, view)
+    return await database.run(db, crud.list_items, models.Memo, response, skip, limit, after, schema, filters, order_by, selection)
+
+@app.get("/memos/export", tags=["Служебные записки"], summary = metadata.summary_memo7, description=metadata.summary_memo7)
+def export_memos(
+        fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$", description=metadata.query_description6),
+        created_from: Optional[datetime] = Query(None, description=metadata.query_description7),
+        created_to: Optional[datetime] = Query(None, description=metadata.query_description8)):
+    return export.export_response(models.Memo, "memos", fmt, created_from, created_to)
+
+@app.get("/memos/sync", response_model=schemas.SyncResult[schemas.MemoShort], tags=["Служебные записки"], summary = metadata.summary_memo9, description=metadata.summary_memo9, response_description=metadata.response_description12)
+async def sync_memos(
+        response: Response,
+        updated_since: Optional[str] = Query(None, description=metadata.query_description29),
+        limit: int = Query(500, ge=1, le=5000, description=metadata.query_description30),
+        db = Depends(get_read_db)):
+    return await database.run(db, sync.sync_items, models.Memo, schemas.MemoShort, response, updated_since, limit)
+
+@app.get("/memos/{memo_id}", response_model=schemas.Memo, tags=["Служебные записки"], summary = metadata.summary_memo8, description=metadata.summary_memo8, response_description=metadata.response_description4)
+async def read_memo(
+        request: Request,
+        response: Response,
+        memo_id: int = Path(..., description=metadata.query_description3),
+        fields: Optional[str] = Query(None, description=metadata.query_description31),
+        db = Depends(get_read_db)):
+    if fields is not None:
+        selection = serialization.select_fields(models.Memo, schemas.Memo, fields)
+        return await database.run(db, crud.get_fields, models.Memo, schemas.Memo, memo_id, selection, response)
+    item = await database.run(db, crud.get_or_404, models.Memo, memo_id)
+    return httpcache.conditional_item(request, response, item)
 
 @app.put("/memos/{memo_id}", response_model=schemas.Memo, tags=["Служебные записки"], summary = metadata.summary_memo3, description=metadata.summary_memo3, response_description=metadata.response_description4)
-def update_memo(
+async def update_memo(
         data: schemas.MemoUpdate,
         memo_id: int = Path(..., description=metadata.query_description3),
-        db: Session = Depends(get_db)):
-    memo = get_or_404(db, models.Memo, memo_id)
-    for key, value in data.model_dump().items():
-        setattr(memo, key, value)
-    db.commit()
-    db.refresh(memo)
-    return memo
+        db = Depends(get_db)):
+    return await write(db, models.Memo, crud.update_item, memo_id, data.model_dump())
 
 @app.patch("/memos/{memo_id}", response_model=schemas.Memo, tags=["Служебные записки"], summary = metadata.summary_memo4, description=metadata.summary_memo4, response_description=metadata.response_description4)
-def partial_update_memo(
+async def partial_update_memo(
         data: schemas.MemoUpdate,
         memo_id: int = Path(..., description=metadata.query_description3),
-        db: Session = Depends(get_db)):
-    memo = get_or_404(db, models.Memo, memo_id)
-    for key, value in data.model_dump(exclude_unset=True).items():
-        setattr(memo, key, value)
-    db.commit()
-    db.refresh(memo)
-    return memo
+        db = Depends(get_db)):
+    return await write(db, models.Memo, crud.update_item, memo_id, data.model_dump(exclude_unset=True))
 
 @app.delete("/memos/{memo_id}", tags=["Служебные записки"], summary = metadata.summary_memo5, description=metadata.summary_memo5)
-def delete_memo(
+async def delete_memo(
         memo_id: int = Path(..., description=metadata.query_description3),
-        db: Session = Depends(get_db)):
-    memo = get_or_404(db, models.Memo, memo_id)
-    db.delete(memo)
-    db.commit()
+        db = Depends(get_db)):
+    await write(db, models.Memo, crud.delete_item, memo_id)
     return {"detail": f"Служебная записка с id={memo_id} удалена"}
 
 # Запросы для Отчетов
 @app.post("/reports/", response_model=schemas.Report, tags=["Отчеты сотрудников"], summary = metadata.summary_rep1, description=metadata.summary_rep1, response_description=metadata.response_description5)
-def create_report(report: schemas.ReportCreate, db: Session = Depends(get_db)):
-    db_report = models.Report(**report.model_dump())
-    db.add(db_report)
-    db.commit()
-    db.refresh(db_report)
-    return db_report
-
-@app.get("/reports/", response_model=List[schemas.Report], tags=["Отчеты сотрудников"], summary = metadata.summary_rep2, description=metadata.summary_rep2, response_description=metadata.response_description5)
-def read_reports(
+async def create_report(report: schemas.ReportCreate, db = Depends(get_db)):
+    return await write(db, models.Report, crud.create_item, report.model_dump())
+
+@app.post("/reports/bulk", response_model=schemas.BulkCreateResult, tags=["Отчеты сотрудников"], summary = metadata.summary_rep6, description=metadata.summary_rep6, response_description=metadata.response_description7)
+async def create_reports_bulk(
+        reports: List[schemas.ReportCreate] = Body(..., max_length=config.BULK_MAX_BATCH_SIZE, description=metadata.body_description1),
+        db = Depends(get_db)):
+    return await write(db, models.Report, bulk.bulk_create, reports, bulk.check_employee_refs("author_id"))
+
+@app.get("/reports/", response_model=List[Union[schemas.Report, schemas.ReportShort]], tags=["Отчеты сотрудников"], summary = metadata.summary_rep2, description=metadata.summary_rep2, response_description=metadata.response_description5)
+async def read_reports(
+        response: Response,
         skip: int = Query(0, description=metadata.query_description1),
         limit: int = Query(100, description=metadata.query_description2),
-        db: Session = Depends(get_db)):
-    return db.query(models.Report).offset(skip).limit(limit).all()
+        after: Optional[str] = Query(None, description=metadata.query_description4),
+        nested: bool = Query(True, description=metadata.query_description5),
+        order_by: str = Query("id", pattern=pagination.SORT_PATTERN, description=metadata.query_description12),
+        author_id: Optional[int] = Query(None, description=metadata.query_description18),
+        fields: Optional[str] = Query(None, description=metadata.query_description31),
+        view: str = Query("full", pattern="^(full|summary)$", description=metadata.query_description32),
+        filters: dict = Depends(period_filters),
+        db = Depends(get_read_db)):
+    schema = schemas.Report if nested else schemas.ReportShort
+    filters = dict(filters, author_id=author_id)
+    selection = serialization.select_fields(models.Report, schema, fields, view)
+    return await database.run(db, crud.list_items, models.Report, response, skip, limit, after, schema, filters, order_by, selection)
+
+@app.get("/reports/export", tags=["Отчеты сотрудников"], summary = metadata.summary_rep7, description=metadata.summary_rep7)
+def export_reports(
+        fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$", description=metadata.query_description6),
+        created_from: Optional[datetime] = Query(None, description=metadata.query_description7),
+        created_to: Optional[datetime] = Query(None, description=metadata.query_description8)):
+    return export.export_response(models.Report, "reports", fmt, created_from, created_to)
+
+@app.get("/reports/sync", response_model=schemas.SyncResult[schemas.ReportShort], tags=["Отчеты сотрудников"], summary = metadata.summary_rep9, description=metadata.summary_rep9, response_description=metadata.response_description12)
+async def sync_reports(
+        response: Response,
+        updated_since: Optional[str] = Query(None, description=metadata.query_description29),
+        limit: int = Query(500, ge=1, le=5000, description=metadata.query_description30),
+        db = Depends(get_read_db)):
+    return await database.run(db, sync.sync_items, models.Report, schemas.ReportShort, response, updated_since, limit)
+
+@app.get("/reports/{report_id}", response_model=schemas.Report, tags=["Отчеты сотрудников"], summary = metadata.summary_rep8, description=metadata.summary_rep8, response_description=metadata.response_description5)
+async def read_report(
+        request: Request,
+        response: Response,
+        report_id: int = Path(..., description=metadata.query_description3),
+        fields: Optional[str] = Query(None, description=metadata.query_description31),
+        db = Depends(get_read_db)):
+    if fields is not None:
+        selection = serialization.select_fields(models.Report, schemas.Report, fields)
+        return await database.run(db, crud.get_fields, models.Report, schemas.Report, report_id, selection, response)
+    item = await database.run(db, crud.get_or_404, models.Report, report_id)
+    return httpcache.conditional_item(request, response, item)
 
 @app.put("/reports/{report_id}", response_model=schemas.Report, tags=["Отчеты сотрудников"], summary = metadata.summary_rep3, description=metadata.summary_rep3, response_description=metadata.response_description5)
-def update_report(
+async def update_report(
         data: schemas.ReportUpdate,
         report_id: int = Path(..., description=metadata.query_description3),
-        db: Session = Depends(get_db)):
-    report = get_or_404(db, models.Report, report_id)
-    for key, value in data.model_dump().items():
-        setattr(report, key, value)
-    db.commit()
-    db.refresh(report)
-    return report
+        db = Depends(get_db)):
+    return await write(db, models.Report, crud.update_item, report_id, data.model_dump())
 
 @app.patch("/reports/{report_id}", response_model=schemas.Report, tags=["Отчеты сотрудников"], summary = metadata.summary_rep4, description=metadata.summary_rep4, response_description=metadata.response_description5)
-def partial_update_report(
+async def partial_update_report(
         data: schemas.ReportUpdate,
         report_id: int = Path(..., description=metadata.query_description3),
-        db: Session = Depends(get_db)):
-    report = get_or_404(db, models.Report, report_id)
-    for key, value in data.model_dump(exclude_unset=True).items():
-        setattr(report, key, value)
-    db.commit()
-    db.refresh(report)
-    return report
+        db = Depends(get_db)):
+    return await write(db, models.Report, crud.update_item, report_id, data.model_dump(exclude_unset=True))
 
 @app.delete("/reports/{report_id}", tags=["Отчеты сотрудников"], summary = metadata.summary_rep5, description=metadata.summary_rep5)
-def delete_report(
+async def delete_report(
         report_id: int = Path(..., description=metadata.query_description3),
-        db: Session = Depends(get_db)):
-    report = get_or_404(db, models.Report, report_id)
-    db.delete(report)
-    db.commit()
+        db = Depends(get_db)):
+    await write(db, models.Report, crud.delete_item, report_id)
     return {"detail": f"Отчёт с id={report_id} удалён"}
 
 # Запросы для приказов
 @app.post("/orders/", response_model=schemas.Order, tags=["Приказы"], summary = metadata.summary_ord1, description=metadata.summary_ord1, response_description=metadata.response_description6)
-def create_order(order: schemas.OrderCreate, db: Session = Depends(get_db)):
-    db_order = models.Order(**order.model_dump())
-    db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
-    return db_order
-
-@app.get("/orders/", response_model=List[schemas.Order], tags=["Приказы"], summary = metadata.summary_ord2, description=metadata.summary_ord2, response_description=metadata.response_description6)
-def read_orders(
+async def create_order(order: schemas.OrderCreate, db = Depends(get_db)):
+    return await write(db, models.Order, crud.create_item, order.model_dump())
+
+@app.post("/orders/bulk", response_model=schemas.BulkCreateResult, tags=["Приказы"], summary = metadata.summary_ord6, description=metadata.summary_ord6, response_description=metadata.response_description7)
+async def create_orders_bulk(
+        orders: List[schemas.OrderCreate] = Body(..., max_length=config.BULK_MAX_BATCH_SIZE, description=metadata.body_description1),
+        db = Depends(get_db)):
+    return await write(db, models.Order, bulk.bulk_create, orders, bulk.check_employee_refs("signer_id"))
+
+@app.get("/orders/", response_model=List[Union[schemas.Order, schemas.OrderShort]], tags=["Приказы"], summary = metadata.summary_ord2, description=metadata.summary_ord2, response_description=metadata.response_description6)
+async def read_orders(
+        response: Response,
         skip: int = Query(0, description=metadata.query_description1),
         limit: int = Query(100, description=metadata.query_description2),
-        db: Session = Depends(get_db)):
-    return db.query(models.Order).offset(skip).limit(limit).all()
+        after: Optional[str] = Query(None, description=metadata.query_description4),
+        nested: bool = Query(True, description=metadata.query_description5),
+        order_by: str = Query("id", pattern=pagination.SORT_PATTERN, description=metadata.query_description12),
+        signer_id: Optional[int] = Query(None, description=metadata.query_description19),
+        fields: Optional[str] = Query(None, description=metadata.query_description31),
+        view: str = Query("full", pattern="^(full|summary)$", description=metadata.query_description32),
+        filters: dict = Depends(period_filters),
+        db = Depends(get_read_db)):
+    schema = schemas.Order if nested else schemas.OrderShort
+    filters = dict(filters, signer_id=signer_id)
+    selection = serialization.select_fields(models.Order, schema, fields, view)
+    return await database.run(db, crud.list_items, models.Order, response, skip, limit, after, schema, filters, order_by, selection)
+
+@app.get("/orders/export", tags=["Приказы"], summary = metadata.summary_ord7, description=metadata.summary_ord7)
+def export_orders(
+        fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$", description=metadata.query_description6),
+        created_from: Optional[datetime] = Query(None, description=metadata.query_description7),
+        created_to: Optional[datetime] = Query(None, description=metadata.query_description8)):
+    return export.export_response(models.Order, "orders", fmt, created_from, created_to)
+
+@app.get("/orders/sync", response_model=schemas.SyncResult[schemas.OrderShort], tags=["Приказы"], summary = metadata.summary_ord9, description=metadata.summary_ord9, response_description=metadata.response_description12)
+async def sync_orders(
+        response: Response,
+        updated_since: Optional[str] = Query(None, description=metadata.query_description29),
+        limit: int = Query(500, ge=1, le=5000, description=metadata.query_description30),
+        db = Depends(get_read_db)):
+    return await database.run(db, sync.sync_items, models.Order, schemas.OrderShort, response, updated_since, limit)
+
+@app.get("/orders/{order_id}", response_model=schemas.Order, tags=["Приказы"], summary = metadata.summary_ord8, description=metadata.summary_ord8, response_description=metadata.response_description6)
+async def read_order(
+        request: Request,
+        response: Response,
+        order_id: int = Path(..., description=metadata.query_description3),
+        fields: Optional[str] = Query(None, description=metadata.query_description31),
+        db = Depends(get_read_db)):
+    if fields is not None:
+        selection = serialization.select_fields(models.Order, schemas.Order, fields)
+        return await database.run(db, crud.get_fields, models.Order, schemas.Order, order_id, selection, response)
+    item = await database.run(db, crud.get_or_404, models.Order, order_id)
+    return httpcache.conditional_item(request, response, item)
 
 @app.put("/orders/{order_id}", response_model=schemas.Order, tags=["Приказы"], summary = metadata.summary_ord3, description=metadata.summary_ord3, response_description=metadata.response_description6)
-def update_order(
+async def update_order(
         data: schemas.OrderUpdate,
         order_id: int = Path(..., description=metadata.query_description3),
-        db: Session = Depends(get_db)):
-    order = get_or_404(db, models.Order, order_id)
-    for key, value in data.model_dump().items():
-        setattr(order, key, value)
-    db.commit()
-    db.refresh(order)
-    return order
+        db = Depends(get_db)):
+    return await write(db, models.Order, crud.update_item, order_id, data.model_dump())
 
 @app.patch("/orders/{order_id}", response_model=schemas.Order, tags=["Приказы"], summary = metadata.summary_ord4, description=metadata.summary_ord4, response_description=metadata.response_description6)
-def partial_update_order(
+async def partial_update_order(
         data: schemas.OrderUpdate,
         order_id: int = Path(..., description=metadata.query_description3),
-        db: Session = Depends(get_db)):
-    order = get_or_404(db, models.Order, order_id)
-    for key, value in data.model_dump(exclude_unset=True).items():
-        setattr(order, key, value)
-    db.commit()
-    db.refresh(order)
-    return order
+        db = Depends(get_db)):
+    return await write(db, models.Order, crud.update_item, order_id, data.model_dump(exclude_unset=True))
 
 @app.delete("/orders/{order_id}", tags=["Приказы"], summary = metadata.summary_ord5, description=metadata.summary_ord5)
-def delete_order(
+async def delete_order(
         order_id: int = Path(..., description=metadata.query_description3),
-        db: Session = Depends(get_db)):
-    order = get_or_404(db, models.Order, order_id)
-    db.delete(order)
-    db.commit()
-    return {"detail": f"Приказ с id={order_id} удалён"}
\ No newline at end of file
+        db = Depends(get_db)):
+    await write(db, models.Order, crud.delete_item, order_id)
+    return {"detail": f"Приказ с id={order_id} удалён"}
+
+# Пакет операций
+@app.post("/batch", response_model=schemas.BatchResult, tags=["Пакет операций"], summary = metadata.summary_batch1, description=metadata.summary_batch1, response_description=metadata.response_description14)
+async def run_batch(
+        operations: List[schemas.BatchOperation] = Body(..., max_length=config.BULK_MAX_BATCH_SIZE, description=metadata.body_description2),
+        atomic: bool = Query(True, description=metadata.query_description36),
+        db = Depends(get_db)):
+    # Как write(), но пакет затрагивает несколько таблиц
+    result = await writer.write(db, batch.run_batch, operations, atomic)
+    for table in batch.tables(operations):
+        httpcache.invalidate(table)
+        entitycache.invalidate(table)
+    changefeed.notify()
+    return result
+
+# Полнотекстовый поиск
+@app.get("/search/", response_model=List[schemas.SearchHit], tags=["Поиск"], summary = metadata.summary_search1, description=metadata.summary_search1, response_description=metadata.response_description8)
+async def search_documents(
+        response: Response,
+        q: str = Query(..., min_length=1, description=metadata.query_description9),
+        types: Optional[List[str]] = Query(None, description=metadata.query_description10),
+        limit: int = Query(20, ge=1, le=1000, description=metadata.query_description11),
+        after: Optional[str] = Query(None, description=metadata.query_description4),
+        db = Depends(get_read_db)):
+    return await database.run(db, search.search, response, q, types, limit, after)
+
+# Статистика
+@app.get("/stats/employees/", response_model=List[schemas.EmployeeStats], tags=["Статистика"], summary = metadata.summary_stats1, description=metadata.summary_stats1, response_description=metadata.response_description9)
+async def employee_stats(
+        response: Response,
+        employee_id: Optional[int] = Query(None, description=metadata.query_description20),
+        limit: int = Query(100, ge=1, le=1000, description=metadata.query_description21),
+        after: Optional[str] = Query(None, description=metadata.query_description4),
+        db = Depends(get_read_db)):
+    return await database.run(db, stats.employee_stats, response, employee_id, limit, after)
+
+@app.get("/stats/periods/", response_model=List[schemas.PeriodStats], tags=["Статистика"], summary = metadata.summary_stats2, description=metadata.summary_stats2, response_description=metadata.response_description10)
+async def period_stats(
+        granularity: str = Query("day", pattern="^(day|month)$", description=metadata.query_description22),
+        date_from: Optional[date] = Query(None, description=metadata.query_description23),
+        date_to: Optional[date] = Query(None, description=metadata.query_description24),
+        types: Optional[List[str]] = Query(None, description=metadata.query_description25),
+        db = Depends(get_read_db)):
+    return await database.run(db, stats.period_stats, granularity, date_from, date_to, types)
+
+# Лента изменений
+@app.get("/changes/", response_model=List[schemas.Change], tags=["Лента изменений"], summary = metadata.summary_changes1, description=metadata.summary_changes1, response_description=metadata.response_description11)
+async def read_changes(
+        after: int = Query(0, ge=0, description=metadata.query_description26),
+        types: Optional[List[str]] = Query(None, description=metadata.query_description27),
+        limit: int = Query(100, ge=1, le=1000, description=metadata.query_description28),
+        db = Depends(get_read_db)):
+    return await database.run(db, changefeed.read_changes, after, types, limit)
+
+@app.get("/changes/stream", tags=["Лента изменений"], summary = metadata.summary_changes2, description=metadata.summary_changes2, response_description=metadata.response_description11)
+async def stream_changes(
+        request: Request,
+        after: Optional[int] = Query(None, ge=0, description=metadata.query_description26),
+        types: Optional[List[str]] = Query(None, description=metadata.query_description27)):
+    return changefeed.sse_response(request, after, types)
+
+@app.websocket("/changes/ws")
+async def changes_websocket(
+        websocket: WebSocket,
+        after: Optional[int] = Query(None, ge=0),
+        types: Optional[List[str]] = Query(None)):
+    await changefeed.websocket_feed(websocket, after, types)
+
+# Импорт CSV
+@app.post("/{doc_type}/import", response_model=schemas.ImportJob, status_code=202, tags=["Импорт"], summary = metadata.summary_import1, description=metadata.summary_import1, response_description=metadata.response_description15)
+async def import_csv(
+        request: Request,
+        doc_type: str = Path(..., pattern=importer.IMPORT_TYPE_PATTERN, description=metadata.query_description37),
+        db = Depends(get_db)):
+    return await importer.start(request, db, doc_type)
+
+@app.get("/imports/{job_id}", response_model=schemas.ImportJob, tags=["Импорт"], summary = metadata.summary_import2, description=metadata.summary_import2, response_description=metadata.response_description15)
+async def read_import_job(
+        job_id: int = Path(..., description=metadata.query_description38),
+        db = Depends(get_read_db)):
+    return await database.run(db, importer.get_job, job_id)
+
+@app.get("/imports/{job_id}/rejects", response_model=List[schemas.ImportReject], tags=["Импорт"], summary = metadata.summary_import3, description=metadata.summary_import3, response_description=metadata.response_description16)
+async def read_import_rejects(
+        job_id: int = Path(..., description=metadata.query_description38),
+        after: int = Query(0, ge=0, description=metadata.query_description39),
+        limit: int = Query(100, ge=1, le=1000, description=metadata.query_description40),
+        db = Depends(get_read_db)):
+    return await database.run(db, importer.get_rejects, job_id, after, limit)
+
+# Вложения
+@app.post("/{doc_type}/{doc_id}/attachments", response_model=schemas.Attachment, tags=["Вложения"], summary = metadata.summary_att1, description=metadata.summary_att1, response_description=metadata.response_description13)
+async def upload_attachment(
+        request: Request,
+        doc_type: str = Path(..., pattern=attachments.DOC_TYPE_PATTERN, description=metadata.query_description33),
+        doc_id: int = Path(..., description=metadata.query_description3),
+        filename: str = Query(..., min_length=1, max_length=255, description=metadata.query_description35),
+        db = Depends(get_db)):
+    # Документ проверяется до чтения файла; соединение записи занимается только после его сохранения
+    await database.run_session(attachments.check_document, doc_type, doc_id)
+    digest, size = await attachments.store(request)
+    content_type = request.headers.get("content-type", "application/octet-stream")[:100]
+    return await write(db, models.Attachment, attachments.create_attachment, doc_type, doc_id, filename, content_type, digest, size)
+
+@app.get("/{doc_type}/{doc_id}/attachments", response_model=List[schemas.Attachment], tags=["Вложения"], summary = metadata.summary_att2, description=metadata.summary_att2, response_description=metadata.response_description13)
+async def read_attachments(
+        doc_type: str = Path(..., pattern=attachments.DOC_TYPE_PATTERN, description=metadata.query_description33),
+        doc_id: int = Path(..., description=metadata.query_description3),
+        db = Depends(get_read_db)):
+    return await database.run(db, attachments.list_attachments, doc_type, doc_id)
+
+@app.get("/{doc_type}/{doc_id}/attachments/{attachment_id}", tags=["Вложения"], summary = metadata.summary_att3, description=metadata.summary_att3)
+async def download_attachment(
+        doc_type: str = Path(..., pattern=attachments.DOC_TYPE_PATTERN, description=metadata.query_description33),
+        doc_id: int = Path(..., description=metadata.query_description3),
+        attachment_id: int = Path(..., description=metadata.query_description34),
+        db = Depends(get_read_db)):
+    item = await database.run(db, attachments.get_attachment, doc_type, doc_id, attachment_id)
+    return attachments.file_response(item)
+
+@app.delete("/{doc_type}/{doc_id}/attachments/{attachment_id}", tags=["Вложения"], summary = metadata.summary_att4, description=metadata.summary_att4)
+async def delete_attachment(
+        doc_type: str = Path(..., pattern=attachments.DOC_TYPE_PATTERN, description=metadata.query_description33),
+        doc_id: int = Path(..., description=metadata.query_description3),
+        attachment_id: int = Path(..., description=metadata.query_description34),
+        db = Depends(get_db)):
+    await write(db, models.Attachment, attachments.delete_attachment, doc_type, doc_id, attachment_id)
+    return {"detail": f"Вложение с id={attachment_id} удалено"}
+
+# Метрики
+if config.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def read_metrics():
+        return metrics.metrics_response()
+
+# Профилирование
+if config.PROFILING_ENABLED:
+    @app.get("/admin/profiles", response_model=List[schemas.ProfileSummary], tags=["Профилирование"], summary = metadata.summary_prof1, description=metadata.summary_prof1, response_description=metadata.response_description17)
+    async def read_profiles(x_profile: Optional[str] = Header(None, description=metadata.query_description42)):
+        profiling.check_token(x_profile)
+        return await run_in_threadpool(profiling.list_profiles)
+
+    @app.get("/admin/profiles/{profile_id}", response_model=schemas.Profile, tags=["Профилирование"], summary = metadata.summary_prof2, description=metadata.summary_prof2, response_description=metadata.response_description18)
+    async def read_profile(
+            profile_id: str = Path(..., pattern=profiling.PROFILE_ID_PATTERN, description=metadata.query_description41),
+            x_profile: Optional[str] = Header(None, description=metadata.query_description42)):
+        profiling.check_token(x_profile)
+        return await run_in_threadpool(profiling.get_profile, profile_id)
+
+    @app.get("/admin/profiles/{profile_id}/download", tags=["Профилирование"], summary = metadata.summary_prof3, description=metadata.summary_prof3)
+    async def download_profile(
+            profile_id: str = Path(..., pattern=profiling.PROFILE_ID_PATTERN, description=metadata.query_description41),
+            x_profile: Optional[str] = Header(None, description=metadata.query_description42)):
+        profiling.check_token(x_profile)
+        return profiling.profile_file(profile_id)
\ No newline at end of file
@@ -47,6 +47,62 @@ tags_metadata = [
             "url": "https://github.com/KinLab666",
         },
     },
+    {
+        "name": "Поиск",
+        "description": "Полнотекстовый поиск по документам",
+        "externalDocs": {
+            "description": "Информация по запросам",
+            "url": "https://github.com/KinLab666",
+        },
+    },
+    {
+        "name": "Статистика",
+        "description": "Количество документов по сотрудникам и периодам",
+        "externalDocs": {
+            "description": "Информация по запросам",
+            "url": "https://github.com/KinLab666",
+        },
+    },
+    {
+        "name": "Лента изменений",
+        "description": "Журнал изменений и подписка на них (SSE, WebSocket /changes/ws)",
+        "externalDocs": {
+            "description": "Информация по запросам",
+            "url": "https://github.com/KinLab666",
+        },
+    },
+    {
+        "name": "Пакет операций",
+        "description": "Несколько операций над объектами разных видов одним запросом и одной транзакцией",
+        "externalDocs": {
+            "description": "Информация по запросам",
+            "url": "https://github.com/KinLab666",
+        },
+    },
+    {
+        "name": "Импорт",
+        "description": "Загрузка CSV-файлов фоновыми заданиями",
+        "externalDocs": {
+            "description": "Информация по запросам",
+            "url": "https://github.com/KinLab666",
+        },
+    },
+    {
+        "name": "Профилирование",
+        "description": "Профили отдельных запросов: самые долгие функции и SQL-запросы (при PROFILING_ENABLED)",
+        "externalDocs": {
+            "description": "Информация по запросам",
+            "url": "https://github.com/KinLab666",
+        },
+    },
+    {
+        "name": "Вложения",
+        "description": "Файлы, приложенные к документам: загрузка и выдача потоком, с поддержкой Range",
+        "externalDocs": {
+            "description": "Информация по запросам",
+            "url": "https://github.com/KinLab666",
+        },
+    },
 
 ]
 
@@ -58,12 +114,88 @@ query_description2 = """Количество всех элементов, кот
 \nЗначение по умолчанию — 100.
 """
 query_description3 = "Числовой ID необходимый для поиска объекта запроса"
+body_description1 = "Список создаваемых объектов. Максимальный размер пакета задаётся настройкой BULK_MAX_BATCH_SIZE"
+query_description6 = """Формат выгрузки: ndjson (по одному JSON-объекту на строку) или csv.
+\nЗначение по умолчанию — ndjson.
+"""
+query_description7 = "Только записи, созданные не раньше указанной даты и времени"
+query_description8 = "Только записи, созданные раньше указанной даты и времени"
+query_description9 = """Поисковый запрос. Все слова должны встречаться в документе.
+\nСлово со звёздочкой в конце ищется по префиксу, например «рыб*».
+"""
+query_description10 = "Виды документов для поиска: incoming, outgoing, memos, reports, orders. По умолчанию — все"
+query_description11 = """Количество результатов поиска за один запрос.
+\nЗначение по умолчанию — 20.
+"""
+query_description12 = """Сортировка: id, created_at или updated_at, с «-» перед именем — по убыванию (например, -created_at).
+\nЗначение по умолчанию — id.
+"""
+query_description13 = "Только записи, изменённые не раньше указанной даты и времени"
+query_description14 = "Только записи, изменённые раньше указанной даты и времени"
+query_description15 = "Только документы от указанного отправителя"
+query_description16 = "Только документы указанному получателю"
+query_description17 = "Только документы с указанной формой отправки: email или mail"
+query_description18 = "Только документы указанного сотрудника-автора"
+query_description19 = "Только приказы, подписанные указанным сотрудником"
+query_description20 = "Только указанный сотрудник"
+query_description21 = """Количество сотрудников за один запрос.
+\nЗначение по умолчанию — 100.
+"""
+query_description22 = "Период группировки: day (по дням) или month (по месяцам)"
+query_description23 = "Начальная дата периода (включительно)"
+query_description24 = "Конечная дата периода (включительно)"
+query_description25 = "Виды документов: incoming, outgoing, memos, reports, orders. По умолчанию — все"
+query_description26 = """Номер (seq) последнего полученного изменения: выдаются только более поздние.
+\nДля потока SSE заголовок Last-Event-ID важнее этого параметра.
+"""
+query_description27 = "Виды объектов: employees, incoming, outgoing, memos, reports, orders. По умолчанию — все"
+query_description28 = """Количество изменений за один запрос.
+\nЗначение по умолчанию — 100.
+"""
+query_description29 = """Токен из ответа предыдущей синхронизации или дата и время: выдаются только строки, созданные или изменённые позже.
+\nБез параметра выдаётся вся таблица (по частям, пока has_more = true).
+"""
+query_description30 = """Количество изменений за один запрос.
+\nЗначение по умолчанию — 500.
+"""
+query_description31 = """Поля ответа через запятую, например id,subject,created_at. Поле вложенного сотрудника — через точку: author.full_name.
+\nИз базы читаются только выбранные колонки. По умолчанию — все поля.
+"""
+query_description32 = """Представление списка: full — все поля, summary — без больших текстовых полей (содержание, резолюция, примечания).
+\nПараметр fields, если указан, важнее.
+"""
+query_description33 = "Вид документа: incoming, outgoing, memos, reports или orders"
+query_description34 = "Числовой ID вложения"
+query_description35 = """Имя файла, под которым вложение будет выдаваться при скачивании.
+\nТело запроса — содержимое файла, тип берётся из заголовка Content-Type"""
+query_description36 = """true — все операции или ни одной: первая ошибка отменяет пакет.
+\nfalse — каждая операция сама по себе: ошибочные пропускаются, остальные сохраняются"""
+body_description2 = """Операции по порядку выполнения: op — create, update, patch или delete; type — вид объекта
+(employees, incoming, outgoing, memos, reports, orders); id — номер объекта (кроме create); data — поля, как в обычном запросе.
+Максимальный размер пакета задаётся настройкой BULK_MAX_BATCH_SIZE"""
+query_description37 = "Вид объектов: employees, incoming, outgoing, memos, reports или orders"
+query_description38 = "Числовой ID задания импорта"
+query_description39 = "Номер строки файла: выдаются только отклонённые строки после неё"
+query_description40 = """Количество строк за один запрос.
+\nЗначение по умолчанию — 100, максимальное — 1000."""
+query_description41 = "Номер профиля (заголовок X-Profile-Id профилированного ответа)"
+query_description42 = "Токен профилирования (PROFILING_TOKEN)"
+query_description4 = """Курсор для постраничной выдачи без OFFSET: значение заголовка X-Next-Cursor из предыдущего ответа.
+\nЕсли указан, параметр skip не используется.
+"""
+query_description5 = """Включать в ответ вложенные данные сотрудника (автора или подписанта).
+\nПри значении false возвращается только его номер, без дополнительного запроса к таблице сотрудников.
+"""
 
 summary_emp1 = "Создание сотрудника"
 summary_emp2 = "Просмотр списка сотрудников"
 summary_emp3 = "Редактирование сотрудника"
 summary_emp4 = "Частичное редактирование сотрудника"
 summary_emp5 = "Удаление сотрудника"
+summary_emp6 = "Пакетное создание сотрудников"
+summary_emp7 = "Выгрузка всех сотрудников"
+summary_emp8 = "Просмотр сотрудника"
+summary_emp9 = "Синхронизация сотрудников"
 response_description1="""id: Номер (автоматически)
 \nfull_name: ФИО"
 \nposition: Должность
@@ -74,12 +206,17 @@ response_description1="""id: Номер (автоматически)
 \nupdated_at: Дата и время изменения (автоматически)"""
 
 #description_employees_1="Создание сотрудника"
+response_description7 = "ids: Номера созданных объектов в порядке передачи"
 
 summary_inc1 = "Создание входящего документа"
 summary_inc2 = "Просмотр входящих документов"
 summary_inc3 = "Редактирование входящего документа"
 summary_inc4 = "Частичное редактирование входящего документа"
 summary_inc5 = "Удаление входящего документа"
+summary_inc6 = "Пакетное создание входящих документов"
+summary_inc7 = "Выгрузка входящих документов"
+summary_inc8 = "Просмотр входящего документа"
+summary_inc9 = "Синхронизация входящих документов"
 response_description2="""id: Номер (автоматически)
 \nsender_id: От кого пришло"
 \nposition: Должность
@@ -94,6 +231,10 @@ summary_out2 = "Просмотр исходящих документов"
 summary_out3 = "Редактирование исходящего документа"
 summary_out4 = "Частичное редактирование исходящего документа"
 summary_out5 = "Удаление исходящего документа"
+summary_out6 = "Пакетное создание исходящих документов"
+summary_out7 = "Выгрузка исходящих документов"
+summary_out8 = "Просмотр исходящего документа"
+summary_out9 = "Синхронизация исходящих документов"
 response_description3="""id: Номер (автоматически)
 \nsender_id: Кому отправлено"
 \nsubject: Предмет письма
@@ -107,6 +248,10 @@ summary_memo2 = "Просмотр списка служебных записок
 summary_memo3 = "Редактирование служебной записки"
 summary_memo4 = "Частичное редактирование служебной записки"
 summary_memo5 = "Удаление служебной записки"
+summary_memo6 = "Пакетное создание служебных записок"
+summary_memo7 = "Выгрузка служебных записок"
+summary_memo8 = "Просмотр служебной записки"
+summary_memo9 = "Синхронизация служебных записок"
 response_description4="""id: Номер (автоматически)
 \nauthor_id: номер сотрудника отправителя
 \ncontent: содежание
@@ -119,6 +264,10 @@ summary_rep2 = "Просмотр списка отчетов сотрудник
 summary_rep3 = "Редактирование отчета сотрудника"
 summary_rep4 = "Частичное редактирование отчета сотрудника"
 summary_rep5 = "Удаление отчета сотрудника"
+summary_rep6 = "Пакетное создание отчетов сотрудников"
+summary_rep7 = "Выгрузка отчетов сотрудников"
+summary_rep8 = "Просмотр отчета сотрудника"
+summary_rep9 = "Синхронизация отчетов сотрудников"
 response_description5="""id: Номер (автоматически)
 \nauthor_id: номер сотрудника отправителя
 \nnote: Примечание
@@ -130,9 +279,85 @@ summary_ord2 = "Просмотр списка приказов"
 summary_ord3 = "Редактирование приказа"
 summary_ord4 = "Частичное редактирование приказа"
 summary_ord5 = "Удаление приказа"
+summary_ord6 = "Пакетное создание приказов"
+summary_ord7 = "Выгрузка приказов"
+summary_ord8 = "Просмотр приказа"
+summary_ord9 = "Синхронизация приказов"
 response_description6="""id: Номер (автоматически)
 \ncontent: содежание
 \nauthor_id: номер сотрудника отправителя
 \nnote: Примечание
 \ncreated_at: Дата и время (автоматически)
-\nupdated_at: Дата и время изменения (автоматически)"""
\ No newline at end of file
+\nupdated_at: Дата и время изменения (автоматически)"""
+
+summary_search1 = "Полнотекстовый поиск по документам"
+response_description8="""type: Вид документа
+\nid: Номер документа
+\nrank: Релевантность (чем меньше, тем выше)
+\nsnippet: Фрагмент текста с выделенными совпадениями"""
+
+summary_stats1 = "Количество документов по сотрудникам"
+summary_stats2 = "Количество документов по периодам"
+response_description9="""employee_id: Номер сотрудника
+\nmemos: Служебные записки
+\nreports: Отчеты
+\norders: Подписанные приказы"""
+response_description10="""period: День (ГГГГ-ММ-ДД) или месяц (ГГГГ-ММ)
+\ntype: Вид документа
+\ncount: Количество созданных документов"""
+
+summary_changes1 = "Журнал изменений"
+summary_changes2 = "Поток изменений (Server-Sent Events)"
+response_description11="""seq: Номер изменения (возрастает)
+\ntype: Вид объекта
+\nid: Номер объекта
+\nop: create, update или delete
+\nchanged_at: Время изменения (UTC)"""
+response_description12="""items: Созданные и изменённые строки
+\ndeleted: Номера удалённых строк
+\ntoken: Токен для следующего запроса (параметр updated_since)
+\nhas_more: Есть ли ещё изменения — тогда следующий запрос нужно сделать сразу"""
+
+summary_att1 = "Загрузка вложения"
+summary_att2 = "Вложения документа"
+summary_att3 = "Скачивание вложения"
+summary_att4 = "Удаление вложения"
+response_description13="""id: Номер вложения (автоматически)
+\ndoc_type: Вид документа
+\ndoc_id: Номер документа
+\nfilename: Имя файла
+\ncontent_type: Тип содержимого
+\nsize: Размер в байтах
+\nsha256: Хэш содержимого
+\ncreated_at: Дата и время загрузки (автоматически)"""
+
+summary_batch1 = "Пакет операций"
+response_description14="""committed: Сохранены ли изменения
+\nresults: Результаты операций в порядке запроса: status (код как у обычного запроса, 424 — операция отменена вместе с пакетом), id, item (объект после операции) или detail (ошибка)"""
+
+summary_import1 = "Импорт из CSV"
+summary_import2 = "Состояние задания импорта"
+summary_import3 = "Отклонённые строки импорта"
+response_description15="""id: Номер задания
+\ntype: Вид объектов
+\nstatus: queued (в очереди), running (выполняется), done (завершено) или failed (ошибка)
+\nrows_processed: Обработано строк
+\nrows_imported: Сохранено строк
+\nrows_rejected: Отклонено строк
+\nrows_per_second: Скорость обработки, строк в секунду
+\nerror: Причина ошибки задания"""
+response_description16="""line: Номер строки файла
+\nreason: Причина отклонения"""
+
+summary_prof1 = "Список профилей запросов"
+summary_prof2 = "Профиль запроса"
+summary_prof3 = "Скачивание профиля (pstats)"
+response_description17="""id: Номер профиля
+\ncreated_at: Время сохранения
+\nmethod, path, query, status: Запрос и код ответа
+\nduration_ms: Длительность запроса
+\nsql_count, sql_ms: Число SQL-запросов и их суммарное время
+\nsql_dropped: SQL-запросы сверх PROFILING_MAX_SQL, не попавшие в список"""
+response_description18="""То же, что в списке, а также
+\ntop_functions: Функции с наибольшим суммарным временем (cumulative_ms) и собственным временем (total_ms)
+\nsql: SQL-запросы по порядку: движок, длительность, текст"""
\ No newline at end of file
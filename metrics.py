@@ -0,0 +1,205 @@
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+from starlette.routing import Match
+import anyio.to_thread
+import admission, config, entitycache, writer
+
+# Метрики в текстовом формате Prometheus. Middleware измеряет длительность каждого запроса
+# и число SQL-запросов, выполненных при его обработке: счётчик запроса лежит в contextvar,
+# а события движка (before/after_cursor_execute) увеличивают его из любого потока пула.
+# Значения хранятся в памяти процесса; состояние пулов читается в момент запроса /metrics.
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels: tuple, amount: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self.lock:
+            items = sorted(self.values.items())
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.labels, labels)} {value}"
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple, buckets: tuple):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # метки -> [число наблюдений по корзинам..., сумма, количество]
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.values.get(labels)
+            if series is None:
+                series = self.values[labels] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self.lock:
+            items = sorted((labels, list(series)) for labels, series in self.values.items())
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(self.labels + ('le',), labels + (_number(bound),))} {cumulative}"
+            yield f"{self.name}_bucket{_labels(self.labels + ('le',), labels + ('+Inf',))} {series[-1]}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {series[-2]}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {series[-1]}"
+
+def _number(value: float) -> str:
+    return repr(float(value))
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+http_requests = Counter("http_requests_total", "Количество HTTP-запросов", ("method", "route", "status"))
+http_duration = Histogram("http_request_duration_seconds", "Длительность обработки HTTP-запроса",
+                          ("method", "route"), LATENCY_BUCKETS)
+http_sql_statements = Histogram("http_request_sql_statements", "Число SQL-запросов на один HTTP-запрос",
+                                ("method", "route"), SQL_COUNT_BUCKETS)
+http_sql_seconds = Counter("http_request_sql_seconds_total", "Суммарное время SQL-запросов в HTTP-запросах",
+                           ("method", "route"))
+sql_duration = Histogram("sql_statement_duration_seconds", "Длительность SQL-запросов", ("engine",), LATENCY_BUCKETS)
+sql_slow = Counter("sql_slow_statements_total", "SQL-запросы дольше SLOW_QUERY_MS", ("engine",))
+in_progress = [0]
+
+# Счётчик текущего HTTP-запроса: [число SQL-запросов, их суммарное время]
+request_sql = contextvars.ContextVar("request_sql", default=None)
+instrumented_engines = {}
+
+def instrument_engine(engine, name: str):
+    instrumented_engines[name] = engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        sql_duration.observe((name,), elapsed)
+        stats = request_sql.get()
+        if stats is not None:
+            stats[0] += 1
+            stats[1] += elapsed
+        if elapsed * 1000 >= config.SLOW_QUERY_MS:
+            sql_slow.inc((name,))
+            logger.warning("Медленный SQL-запрос (%s, %.1f мс): %s", name, elapsed * 1000, " ".join(statement.split())[:1000])
+
+def route_template(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Ответ выдан до маршрутизации (например, из кэша ответов)
+    for candidate in scope["app"].router.routes:
+        if candidate.matches(scope)[0] == Match.FULL:
+            return candidate.path
+    return "unmatched"
+
+class MetricsMiddleware:
+    # ASGI-middleware без промежуточных задач и потоков ответа, как у @app.middleware("http"):
+    # длительность, код ответа и SQL-запросы по шаблону маршрута (/memos/{memo_id})
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = [0, 0.0]
+        token = request_sql.set(stats)
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        in_progress[0] += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_progress[0] -= 1
+            request_sql.reset(token)
+            labels = (scope["method"], route_template(scope))
+            http_requests.inc(labels + (str(status[0]),))
+            http_duration.observe(labels, elapsed)
+            http_sql_statements.observe(labels, stats[0])
+            http_sql_seconds.inc(labels, stats[1])
+
+def _gauge(name: str, help: str, values: dict, label: str = None):
+    yield f"# HELP {name} {help}"
+    yield f"# TYPE {name} gauge"
+    for key, value in values.items():
+        yield f"{name}{_labels((label,), (key,)) if label else ''} {value}"
+
+def resource_gauges():
+    pools = {name: engine.pool for name, engine in instrumented_engines.items() if hasattr(engine.pool, "checkedout")}
+    yield from _gauge("db_pool_size", "Размер пула соединений", {name: pool.size() for name, pool in pools.items()}, "engine")
+    yield from _gauge("db_pool_checked_out", "Выданные соединения пула",
+                      {name: pool.checkedout() for name, pool in pools.items()}, "engine")
+    yield from _gauge("db_pool_overflow", "Соединения сверх размера пула",
+                      {name: max(pool.overflow(), 0) for name, pool in pools.items()}, "engine")
+    # Пул потоков, в котором выполняются синхронные операции с базой (run_in_threadpool)
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    yield from _gauge("threadpool_threads_limit", "Максимум потоков пула", {None: limiter.total_tokens})
+    yield from _gauge("threadpool_threads_busy", "Занятые потоки пула", {None: limiter.borrowed_tokens})
+    yield from _gauge("group_commit_queue_depth", "Операции в очереди группового писателя", {None: writer.group_writer.jobs.qsize()})
+    yield from _gauge("http_requests_in_progress", "Запросы в обработке", {None: in_progress[0]})
+    yield from _gauge("admission_active", "Запросы, выполняемые по классам контроля допуска",
+                      {name: sum(limiter.active) for name, limiter in admission.limiters.items()}, "class")
+    yield from _gauge("admission_queued", "Запросы в очереди контроля допуска",
+                      {name: limiter.queued() for name, limiter in admission.limiters.items()}, "class")
+    counts, entries = entitycache.stats()
+    yield from _gauge("entity_cache_entries", "Записи в кэше объектов", {None: entries})
+    for name, index, help in (("hits", 0, "Попадания"), ("misses", 1, "Промахи")):
+        yield f"# HELP entity_cache_{name}_total {help} кэша объектов"
+        yield f"# TYPE entity_cache_{name}_total counter"
+        for table, values in sorted(counts.items()):
+            yield f"entity_cache_{name}_total{_labels(('table',), (table,))} {values[index]}"
+    yield "# HELP admission_rejected_total Запросы, отклонённые контролем допуска (503)"
+    yield "# TYPE admission_rejected_total counter"
+    for name, limiter in admission.limiters.items():
+        yield f"admission_rejected_total{_labels(('class',), (name,))} {limiter.rejected}"
+
+def render() -> str:
+    lines = []
+    for metric in (http_requests, http_duration, http_sql_statements, http_sql_seconds, sql_duration, sql_slow):
+        lines.extend(metric.render())
+    lines.extend(resource_gauges())
+    return "\n".join(lines) + "\n"
+
+def metrics_response() -> PlainTextResponse:
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
 
+# Номер удалённого сотрудника может остаться в приказах архива (archive.py), поэтому он
+# не выдаётся повторно
 class Employee(Base):
     __tablename__ = "employees"
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     full_name = Column(String(100), nullable=False)
@@ -17,67 +20,91 @@ class Employee(Base):
     reports = relationship("Report", back_populates="author")
     orders = relationship("Order", back_populates="signer")
 
-    created_at = Column(DateTime, default=datetime.now)
-    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    created_at = Column(DateTime, default=datetime.now, index=True)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, index=True)
 
+# Документы, переносимые в архив (archive.py), — с AUTOINCREMENT: иначе номер перенесённой
+# строки с наибольшим id достался бы новой строке
 class IncomingDocument(Base):
     __tablename__ = "incoming_documents"
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
-    sender_id = Column(String(200), nullable=False)
+    sender_id = Column(String(200), nullable=False, index=True)
     subject = Column(String(200), nullable=False)
     resolution = Column(Text, nullable=True)
     note = Column(Text, nullable=True)
 
-    created_at = Column(DateTime, default=datetime.now)
-    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    created_at = Column(DateTime, default=datetime.now, index=True)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, index=True)
 
 class OutgoingDocument(Base):
     __tablename__ = "outgoing_documents"
+    __table_args__ = (Index("ix_outgoing_documents_delivery_method_created_at", "delivery_method", "created_at"),
+                      {"sqlite_autoincrement": True})
 
     id = Column(Integer, primary_key=True, index=True)
-    recipient_id = Column(String(200), nullable=False)
+    recipient_id = Column(String(200), nullable=False, index=True)
     subject = Column(String(200), nullable=False)
     delivery_method = Column(Enum("email", "mail", name="delivery_method"), nullable=False)
     note = Column(Text, nullable=True)
 
-    created_at = Column(DateTime, default=datetime.now)
-    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    created_at = Column(DateTime, default=datetime.now, index=True)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, index=True)
 
 class Memo(Base):
     __tablename__ = "memos"
+    __table_args__ = (Index("ix_memos_author_id_created_at", "author_id", "created_at"),)
 
     id = Column(Integer, primary_key=True, index=True)
     author_id = Column(Integer, ForeignKey("employees.id"), nullable=False)
     content = Column(Text, nullable=False)
     note = Column(Text, nullable=True)
 
-    author = relationship("Employee", back_populates="memos")
+    author = relationship("Employee", back_populates="memos", lazy="joined")
 
-    created_at = Column(DateTime, default=datetime.now)
-    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    created_at = Column(DateTime, default=datetime.now, index=True)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, index=True)
 
 class Report(Base):
     __tablename__ = "reports"
+    __table_args__ = (Index("ix_reports_author_id_created_at", "author_id", "created_at"),)
 
     id = Column(Integer, primary_key=True, index=True)
     author_id = Column(Integer, ForeignKey("employees.id"), nullable=False)
     note = Column(Text, nullable=False)
 
-    author = relationship("Employee", back_populates="reports")
+    author = relationship("Employee", back_populates="reports", lazy="joined")
 
-    created_at = Column(DateTime, default=datetime.now)
-    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    created_at = Column(DateTime, default=datetime.now, index=True)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, index=True)
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (Index("ix_orders_signer_id_created_at", "signer_id", "created_at"),
+                      {"sqlite_autoincrement": True})
 
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text, nullable=False)
     signer_id = Column(Integer, ForeignKey("employees.id"), nullable=False)
     note = Column(Text, nullable=True)
 
-    signer = relationship("Employee", back_populates="orders")
+    signer = relationship("Employee", back_populates="orders", lazy="joined")
 
-    created_at = Column(DateTime, default=datetime.now)
-    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.now, index=True)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, index=True)
+
+class Attachment(Base):
+    __tablename__ = "attachments"
+    __table_args__ = (Index("ix_attachments_doc_type_doc_id", "doc_type", "doc_id"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    doc_type = Column(String(20), nullable=False)
+    doc_id = Column(Integer, nullable=False)
+    filename = Column(String(255), nullable=False)
+    content_type = Column(String(100), nullable=False)
+    size = Column(Integer, nullable=False)
+    sha256 = Column(String(64), nullable=False, index=True)
+
+    created_at = Column(DateTime, default=datetime.now, index=True)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, index=True)
\ No newline at end of file
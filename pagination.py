@@ -0,0 +1,58 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+# Заголовок ответа, в котором возвращается курсор следующей страницы
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(*values):
+    raw = json.dumps(values, separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        values = None
+    if not isinstance(values, list) or not values:
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+    return values
+
+# Поля сортировки списков; "-" перед именем — по убыванию
+SORT_FIELDS = ("id", "created_at", "updated_at")
+SORT_PATTERN = "^-?(" + "|".join(SORT_FIELDS) + ")$"
+
+def _cursor_values(after: str, size: int, by_date: bool):
+    values = decode_cursor(after)
+    if len(values) != size or not isinstance(values[-1], int):
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+    if by_date:
+        try:
+            values[0] = datetime.fromisoformat(values[0])
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Некорректный курсор")
+    return values
+
+def paginate(query, model, response, skip: int = 0, limit: int = 100, after: str = None, order_by: str = "id"):
+    # Курсорный режим: страница начинается сразу после ключа сортировки последней записи, без OFFSET.
+    # Ключ — (поле сортировки, id), так что его покрывают индексы по created_at/updated_at
+    descending = order_by.startswith("-")
+    field = order_by.lstrip("-")
+    keys = [model.id] if field == "id" else [getattr(model, field), model.id]
+    query = query.order_by(*[key.desc() if descending else key for key in keys])
+    if after is not None:
+        values = _cursor_values(after, len(keys), field != "id")
+        if len(keys) == 1:
+            query = query.filter(model.id < values[0] if descending else model.id > values[0])
+        else:
+            position = tuple_(*keys)
+            query = query.filter(position < tuple_(*values) if descending else position > tuple_(*values))
+    else:
+        query = query.offset(skip)
+    items = query.limit(limit).all()
+    if limit > 0 and len(items) == limit:
+        last = items[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*[getattr(last, key.key) for key in keys])
+    return items
\ No newline at end of file
@@ -0,0 +1,219 @@
+import cProfile
+import contextvars
+import hmac
+import json
+import logging
+import pstats
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from fastapi import HTTPException
+from fastapi.responses import FileResponse
+from sqlalchemy import event
+from starlette.concurrency import run_in_threadpool
+import config
+
+# Профилирование отдельных запросов по требованию. Включается настройкой PROFILING_ENABLED;
+# профилируется запрос с заголовком X-Profile (значение — PROFILING_TOKEN) или случайная доля
+# запросов PROFILING_SAMPLE_RATE. Профили содержат текст SQL, поэтому без PROFILING_TOKEN заголовок
+# не действует, а /admin/profiles отвечает 403; выборка по доле запросов работает и без него. Для такого запроса cProfile работает
+# в потоке цикла событий и отдельно в каждом вызове пула потоков (database.run), а SQL-запросы
+# с их длительностью собираются событиями движков. Профиль сохраняется в PROFILING_DIR:
+# <id>.prof (формат pstats, открывается snakeviz и т.п.) и <id>.json (запрос, самые долгие
+# функции и список SQL); хранятся последние PROFILING_MAX_FILES профилей. Номер профиля
+# возвращается в заголовке ответа X-Profile-Id.
+#
+# Остальные запросы платят только за проверку заголовка и одно чтение contextvar на SQL-запрос.
+# В потоке цикла событий профиль один на процесс, поэтому одновременно профилируется
+# один запрос, и в его профиль попадают шаги других запросов, выполнявшиеся в это время.
+# Значения параметров SQL не сохраняются: в них бывают персональные данные.
+#
+# С Python 3.12 cProfile работает через sys.monitoring: профилировщик один на интерпретатор
+# и видит все потоки. Тогда профиль потока пула не создаётся — его вызовы уже попадают
+# в профиль запроса (вместе с работой других потоков в это время).
+
+logger = logging.getLogger(__name__)
+
+HEADER = b"x-profile"
+ADMIN_PATH = "/admin/profiles"
+PROFILE_ID_PATTERN = r"^\d{8}T\d{12}-[0-9a-f]{6}$"
+TOP_FUNCTIONS = 40
+MAX_STATEMENT_LENGTH = 2000
+
+class Session:
+    # Данные одного профилируемого запроса; потоки пула дописывают сюда свои профили и SQL
+    def __init__(self):
+        self.profiles = []
+        self.statements = []
+        self.statements_dropped = 0
+        self.lock = threading.Lock()
+
+current = contextvars.ContextVar("profiling_session", default=None)
+busy = [False]
+
+def wrap(fn):
+    # Функция для пула потоков: в профилируемом запросе выполняется под своим cProfile
+    session = current.get()
+    if session is None:
+        return fn
+
+    def profiled(*args):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+: уже работает профилировщик запроса, и он видит этот поток
+            return fn(*args)
+        try:
+            return fn(*args)
+        finally:
+            profile.disable()
+            with session.lock:
+                session.profiles.append(profile)
+    return profiled
+
+def warn_without_token():
+    if not config.PROFILING_TOKEN:
+        logger.warning("PROFILING_TOKEN не задан: заголовок X-Profile не действует, /admin/profiles недоступен")
+
+def instrument_engine(engine, name: str):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if current.get() is not None:
+            conn.info.setdefault("profiling_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        session = current.get()
+        if session is None or not conn.info.get("profiling_started"):
+            return
+        elapsed = time.perf_counter() - conn.info["profiling_started"].pop()
+        with session.lock:
+            if len(session.statements) >= config.PROFILING_MAX_SQL:
+                session.statements_dropped += 1
+                return
+            session.statements.append({"engine": name, "duration_ms": round(elapsed * 1000, 3),
+                                       "executemany": executemany,
+                                       "statement": " ".join(statement.split())[:MAX_STATEMENT_LENGTH]})
+
+def authorized(token: str) -> bool:
+    return bool(config.PROFILING_TOKEN) and hmac.compare_digest((token or "").encode(), config.PROFILING_TOKEN.encode())
+
+def check_token(token: str):
+    if not config.PROFILING_TOKEN:
+        raise HTTPException(status_code=403, detail="Не задан PROFILING_TOKEN: просмотр профилей отключён")
+    if not authorized(token):
+        raise HTTPException(status_code=403, detail="Неверный токен профилирования")
+
+def _requested(scope) -> bool:
+    if busy[0] or scope["path"].startswith(ADMIN_PATH):
+        return False
+    for name, value in scope["headers"]:
+        if name == HEADER:
+            return authorized(value.decode("latin-1"))
+    return config.PROFILING_SAMPLE_RATE > 0 and random.random() < config.PROFILING_SAMPLE_RATE
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _requested(scope):
+            return await self.app(scope, receive, send)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Профилировщик уже занят другим инструментом (отладчик, coverage) — запрос выполняется как обычно
+            return await self.app(scope, receive, send)
+        profile_id = f"{datetime.now():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:6]}"
+        session = Session()
+        status = [500]
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        busy[0] = True
+        token = current.set(session)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.disable()
+            elapsed = time.perf_counter() - started
+            current.reset(token)
+            busy[0] = False
+            session.profiles.insert(0, profile)
+            request = {"method": scope["method"], "path": scope["path"],
+                       "query": scope["query_string"].decode("latin-1"), "status": status[0]}
+            try:
+                await run_in_threadpool(save, profile_id, request, elapsed, session)
+            except Exception:
+                logger.exception("Не удалось сохранить профиль %s", profile_id)
+
+def _top_functions(stats: pstats.Stats) -> list:
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]
+    return [{"function": f"{name} ({filename}:{line})", "calls": calls, "total_ms": round(total * 1000, 3),
+             "cumulative_ms": round(cumulative * 1000, 3)}
+            for (filename, line, name), (_, calls, total, cumulative, _) in rows]
+
+def save(profile_id: str, request: dict, elapsed: float, session: Session):
+    directory = Path(config.PROFILING_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    stats = pstats.Stats(*session.profiles)
+    stats.dump_stats(directory / f"{profile_id}.prof")
+    report = {
+        "id": profile_id,
+        "created_at": datetime.now().isoformat(),
+        **request,
+        "duration_ms": round(elapsed * 1000, 3),
+        "sql_count": len(session.statements) + session.statements_dropped,
+        "sql_ms": round(sum(item["duration_ms"] for item in session.statements), 3),
+        "sql_dropped": session.statements_dropped,
+        "top_functions": _top_functions(stats),
+        "sql": session.statements,
+    }
+    # Описание пишется последним и целиком: профиль без него в списке не виден
+    temp = directory / f"{profile_id}.json.tmp"
+    temp.write_text(json.dumps(report, ensure_ascii=False), encoding="utf-8")
+    temp.replace(directory / f"{profile_id}.json")
+    prune(directory)
+
+def prune(directory: Path):
+    reports = sorted(directory.glob("*.json"))
+    for report in reports[:max(0, len(reports) - config.PROFILING_MAX_FILES)]:
+        report.unlink(missing_ok=True)
+        report.with_suffix(".prof").unlink(missing_ok=True)
+
+def _report_path(profile_id: str) -> Path:
+    path = Path(config.PROFILING_DIR) / f"{profile_id}.json"
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail=f"Профиль с id={profile_id} не найден")
+    return path
+
+def list_profiles() -> list:
+    directory = Path(config.PROFILING_DIR)
+    profiles = []
+    for path in sorted(directory.glob("*.json"), reverse=True) if directory.is_dir() else []:
+        try:
+            report = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            # Удалён очисткой между glob и чтением
+            continue
+        report.pop("top_functions")
+        report.pop("sql")
+        profiles.append(report)
+    return profiles
+
+def get_profile(profile_id: str) -> dict:
+    return json.loads(_report_path(profile_id).read_text(encoding="utf-8"))
+
+def profile_file(profile_id: str) -> FileResponse:
+    path = _report_path(profile_id).with_suffix(".prof")
+    return FileResponse(path, media_type="application/octet-stream", filename=path.name)
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import Any, Generic, List, Optional, TypeVar
 
 # Сотрудник
 class EmployeeBase(BaseModel):
@@ -99,6 +99,14 @@ class Memo(MemoBase):
     class Config:
         orm_mode = True
 
+class MemoShort(MemoBase):
+    id: int
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        orm_mode = True
+
 # Отчеты
 class ReportBase(BaseModel):
     author_id: int
@@ -120,6 +128,14 @@ class Report(ReportBase):
     class Config:
         orm_mode = True
 
+class ReportShort(ReportBase):
+    id: int
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        orm_mode = True
+
 # Приказы
 class OrderBase(BaseModel):
     content: str
@@ -141,4 +157,130 @@ class Order(OrderBase):
     updated_at: datetime
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class OrderShort(OrderBase):
+    id: int
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        orm_mode = True
+
+# Синхронизация
+Item = TypeVar("Item")
+
+class SyncResult(BaseModel, Generic[Item]):
+    items: List[Item]
+    deleted: List[int]
+    token: str
+    has_more: bool
+
+# Вложения
+class Attachment(BaseModel):
+    id: int
+    doc_type: str
+    doc_id: int
+    filename: str
+    content_type: str
+    size: int
+    sha256: str
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
+# Импорт CSV
+class ImportJob(BaseModel):
+    id: int
+    type: str
+    status: str  # queued, running, done или failed
+    rows_processed: int
+    rows_imported: int
+    rows_rejected: int
+    rows_per_second: Optional[float] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class ImportReject(BaseModel):
+    line: int
+    reason: str
+
+# Профилирование
+class ProfileSummary(BaseModel):
+    id: str
+    created_at: datetime
+    method: str
+    path: str
+    query: str
+    status: int
+    duration_ms: float
+    sql_count: int
+    sql_ms: float
+    sql_dropped: int
+
+class ProfileFunction(BaseModel):
+    function: str
+    calls: int
+    total_ms: float
+    cumulative_ms: float
+
+class ProfileStatement(BaseModel):
+    engine: str
+    duration_ms: float
+    executemany: bool
+    statement: str
+
+class Profile(ProfileSummary):
+    top_functions: List[ProfileFunction]
+    sql: List[ProfileStatement]
+
+# Массовое создание (/<раздел>/bulk)
+class BulkCreateResult(BaseModel):
+    ids: List[int]
+
+# Пакет операций (/batch)
+class BatchOperation(BaseModel):
+    op: str  # create, update, patch или delete
+    type: str  # employees, incoming, outgoing, memos, reports или orders
+    id: Optional[int] = None
+    data: Optional[dict] = None
+
+class BatchOperationResult(BaseModel):
+    status: int
+    id: Optional[int] = None
+    item: Optional[dict] = None
+    detail: Optional[Any] = None
+
+class BatchResult(BaseModel):
+    committed: bool
+    results: List[BatchOperationResult]
+
+# Поиск
+class SearchHit(BaseModel):
+    type: str
+    id: int
+    rank: float
+    snippet: str
+
+# Статистика
+class EmployeeStats(BaseModel):
+    employee_id: int
+    memos: int
+    reports: int
+    orders: int
+
+class PeriodStats(BaseModel):
+    period: str
+    type: str
+    count: int
+
+# Лента изменений
+class Change(BaseModel):
+    seq: int
+    type: str
+    id: int
+    op: str
+    changed_at: str
\ No newline at end of file
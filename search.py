@@ -0,0 +1,84 @@
+from fastapi import HTTPException
+from sqlalchemy import text
+import models, pagination
+
+# Полнотекстовый индекс SQLite FTS5 по всем видам документов. rowid записи индекса
+# кодирует и вид документа, и его номер: rowid = id * 8 + код вида, поэтому строки индекса
+# обновляются и удаляются по первичному ключу. Синхронизацию выполняют триггеры, то есть
+# индекс меняется в той же транзакции, что и сам документ, при любом способе записи.
+# Перенос в архив (archive.py) удаляет документ и из индекса: поиск, как и чтение по номеру,
+# работает только с основной базой, и найденный документ всегда можно открыть по номеру.
+
+# Вид документа: (код, модель, колонки для subject, content, note)
+DOC_TYPES = {
+    "incoming": (1, models.IncomingDocument, "subject", "resolution", "note"),
+    "outgoing": (2, models.OutgoingDocument, "subject", None, "note"),
+    "memos": (3, models.Memo, None, "content", "note"),
+    "reports": (4, models.Report, None, None, "note"),
+    "orders": (5, models.Order, None, "content", "note"),
+}
+TYPE_BY_CODE = {code: name for name, (code, *_) in DOC_TYPES.items()}
+
+# Вес совпадений в теме, содержании и примечании для bm25
+RANK_FUNCTION = "bm25(10.0, 5.0, 1.0)"
+
+def _values(prefix: str, columns):
+    return ", ".join(f"{prefix}.{column}" if column else "NULL" for column in columns)
+
+def install(engine):
+    with engine.begin() as conn:
+        exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'search_index'")).first()
+        if not exists:
+            conn.execute(text("CREATE VIRTUAL TABLE search_index USING fts5("
+                              "subject, content, note, tokenize = 'unicode61 remove_diacritics 2')"))
+            conn.execute(text(f"INSERT INTO search_index(search_index, rank) VALUES ('rank', '{RANK_FUNCTION}')"))
+        for name, (code, model, *columns) in DOC_TYPES.items():
+            table = model.__tablename__
+            watched = ", ".join(column for column in columns if column)
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS search_{name}_insert AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO search_index(rowid, subject, content, note) VALUES (new.id * 8 + {code}, {_values('new', columns)}); END"))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS search_{name}_update AFTER UPDATE OF {watched} ON {table} BEGIN "
+                f"UPDATE search_index SET (subject, content, note) = ({_values('new', columns)}) WHERE rowid = old.id * 8 + {code}; END"))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS search_{name}_delete AFTER DELETE ON {table} BEGIN "
+                f"DELETE FROM search_index WHERE rowid = old.id * 8 + {code}; END"))
+            if not exists:
+                # Первичное наполнение индекса уже существующими документами
+                conn.execute(text(f"INSERT INTO search_index(rowid, subject, content, note) "
+                                  f"SELECT id * 8 + {code}, {_values(table, columns)} FROM {table}"))
+
+def match_expression(q: str) -> str:
+    # Каждое слово ищется как отдельная фраза (все слова обязательны), '*' в конце — поиск по префиксу
+    terms = []
+    for word in q.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*").replace('"', '""')
+        if word:
+            terms.append(f'"{word}"' + ("*" if prefix else ""))
+    if not terms:
+        raise HTTPException(status_code=400, detail="Пустой поисковый запрос")
+    return " ".join(terms)
+
+def search(db, response, q: str, types, limit: int, after: str = None):
+    params = {"q": match_expression(q), "limit": limit}
+    where = "search_index MATCH :q"
+    if types:
+        unknown = set(types) - set(DOC_TYPES)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Неизвестные виды документов: {', '.join(sorted(unknown))}")
+        where += f" AND rowid % 8 IN ({', '.join(str(DOC_TYPES[name][0]) for name in types)})"
+    if after is not None:
+        values = pagination.decode_cursor(after)
+        if len(values) != 2 or not isinstance(values[0], (int, float)) or not isinstance(values[1], int):
+            raise HTTPException(status_code=400, detail="Некорректный курсор")
+        params["rank"], params["rowid"] = values
+        where += " AND (rank > :rank OR (rank = :rank AND rowid > :rowid))"
+    rows = db.execute(text(
+        f"SELECT rowid, rank, snippet(search_index, -1, '<b>', '</b>', '…', 16) AS snippet "
+        f"FROM search_index WHERE {where} ORDER BY rank, rowid LIMIT :limit"), params).all()
+    if limit > 0 and len(rows) == limit:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = pagination.encode_cursor(rows[-1].rank, rows[-1].rowid)
+    return [{"type": TYPE_BY_CODE[row.rowid % 8], "id": row.rowid // 8, "rank": row.rank, "snippet": row.snippet}
+            for row in rows]
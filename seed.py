@@ -0,0 +1,114 @@
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event, insert
+
+# Наполнение базы тестовыми данными для нагрузочного тестирования. Строки вставляются
+# пачками (executemany) без триггеров; поисковый индекс, счётчики версий и сводки статистики
+# устанавливаются после загрузки и заполняются одним проходом по готовым таблицам.
+#
+#   python seed.py --database bench.db --rows 100000
+
+# Доля строк каждой таблицы от общего числа (сотрудников — 1%)
+SHARES = {
+    "employees": 0.01,
+    "incoming_documents": 0.198,
+    "outgoing_documents": 0.198,
+    "memos": 0.198,
+    "reports": 0.198,
+    "orders": 0.198,
+}
+# Документы распределяются по created_at за последние DAYS дней
+DAYS = 730
+
+WORDS = ("договор", "поставка", "оплата", "отчёт", "проверка", "совещание", "приказ", "отпуск", "командировка",
+         "бюджет", "закупка", "ремонт", "обучение", "аттестация", "инвентаризация", "контроль", "график", "смета")
+
+def sentence(rng: random.Random, size: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(size)).capitalize()
+
+def employee_row(rng: random.Random, number: int, moment: datetime) -> dict:
+    return {"full_name": f"Сотрудник {number}", "position": rng.choice(("Инженер", "Бухгалтер", "Юрист", "Менеджер")),
+            "email": f"employee{number}@example.com", "phone": f"+7900{number:07d}", "note": None,
+            "created_at": moment, "updated_at": moment}
+
+def document_row(table: str, rng: random.Random, employees: int, moment: datetime) -> dict:
+    employee_id = rng.randint(1, employees)
+    row = {"note": sentence(rng, 3), "created_at": moment, "updated_at": moment}
+    if table == "incoming_documents":
+        row.update(sender_id=f"Организация {rng.randint(1, 500)}", subject=sentence(rng, 4), resolution=sentence(rng, 6))
+    elif table == "outgoing_documents":
+        row.update(recipient_id=f"Организация {rng.randint(1, 500)}", subject=sentence(rng, 4),
+                   delivery_method=rng.choice(("email", "mail")))
+    elif table in ("memos", "reports"):
+        row.update(author_id=employee_id)
+        if table == "memos":
+            row.update(content=sentence(rng, 12))
+    else:
+        row.update(signer_id=employee_id, content=sentence(rng, 12))
+    return row
+
+def table_sizes(rows: int) -> dict:
+    sizes = {table: int(rows * share) for table, share in SHARES.items()}
+    sizes["employees"] = max(sizes["employees"], 10)
+    return sizes
+
+def seed(path: str, rows: int, batch_size: int = 10000, random_seed: int = 1) -> dict:
+    if os.path.exists(path):
+        raise SystemExit(f"Файл {path} уже существует")
+    # database.engine создаётся при импорте по настройке DATABASE_PATH
+    os.environ["DATABASE_PATH"] = path
+    import archive, database, models, search, httpcache, stats
+
+    engine = create_engine(f"sqlite:///{path}")
+
+    @event.listens_for(engine, "connect")
+    def _fast_load(dbapi_connection, connection_record):
+        # Новый файл: при сбое загрузка просто повторяется, поэтому журнал и fsync не нужны
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=OFF")
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.close()
+
+    models.Base.metadata.create_all(bind=engine)
+    rng = random.Random(random_seed)
+    sizes = table_sizes(rows)
+    now = datetime.now().replace(microsecond=0)
+    tables = models.Base.metadata.tables
+    for table, size in sizes.items():
+        started = time.perf_counter()
+        # created_at растёт вместе с id, как у документов, созданных через API
+        step = timedelta(days=DAYS) / max(size, 1)
+        start = now - timedelta(days=DAYS)
+        with engine.begin() as conn:
+            for offset in range(0, size, batch_size):
+                batch = []
+                for number in range(offset + 1, min(offset + batch_size, size) + 1):
+                    moment = start + step * number
+                    if table == "employees":
+                        batch.append(employee_row(rng, number, moment))
+                    else:
+                        batch.append(document_row(table, rng, sizes["employees"], moment))
+                conn.execute(insert(tables[table]), batch)
+        print(f"{table}: {size} строк за {time.perf_counter() - started:.1f} с")
+    engine.dispose()
+
+    # Триггеры и вспомогательные таблицы — на обычном движке приложения (WAL)
+    started = time.perf_counter()
+    search.install(database.engine)
+    httpcache.install(database.engine)
+    archive.install(database.engine)
+    stats.install(database.engine)
+    print(f"Индексы поиска и сводки: {time.perf_counter() - started:.1f} с")
+    return sizes
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Наполнение базы тестовыми данными")
+    parser.add_argument("--database", default="bench.db", help="Путь к создаваемому файлу базы")
+    parser.add_argument("--rows", type=int, default=10000, help="Общее число строк во всех таблицах")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Строк в одном executemany")
+    parser.add_argument("--random-seed", type=int, default=1)
+    args = parser.parse_args()
+    seed(args.database, args.rows, args.batch_size, args.random_seed)
@@ -0,0 +1,165 @@
+from fastapi import HTTPException, Response
+from pydantic import BaseModel
+from sqlalchemy import Text, inspect
+from sqlalchemy.orm import aliased
+import orjson
+import config, entitycache
+
+# Быстрая выдача списков: вместо ORM-объектов выбираются только колонки, нужные схеме ответа
+# (вложенный сотрудник — через LEFT JOIN), строки складываются в словари в порядке полей схемы
+# и сразу кодируются orjson. Повторной проверки Pydantic нет: данные только что прочитаны из
+# своей же базы и уже имеют нужные типы. Результат совпадает с обычным ответом FastAPI байт в байт.
+#
+# Выбор полей (fields=, view=summary) сужает и ответ, и сам SELECT: большие текстовые колонки,
+# которые клиент не запросил, из базы не читаются.
+#
+# При включённом кэше объектов (entitycache.py) вложенный сотрудник не присоединяется JOIN:
+# выбирается только номер сотрудника, а его поля берутся из кэша (промахи — одним запросом на страницу).
+
+# Колонки, нужные постраничной выдаче (ключ курсора), выбираются всегда, даже если их нет в ответе
+KEY_COLUMNS = ("id", "created_at", "updated_at")
+
+def _nested(field):
+    annotation = field.annotation
+    return annotation if isinstance(annotation, type) and issubclass(annotation, BaseModel) else None
+
+class RowLayout:
+    # Колонки запроса и раскладка строки по полям схемы элемента списка.
+    # fields — выбранные поля (см. select_fields); None — все поля схемы.
+    # cached — вложенные объекты из кэша объектов по номеру вместо JOIN
+    def __init__(self, model, schema, fields=None, cached=False):
+        # model может быть и псевдонимом (выборка вместе с архивом)
+        mapper = inspect(model).mapper
+        selected = dict(fields) if fields is not None else None
+        self.columns = []
+        self.joins = []
+        # (имя поля, None) — колонка; (имя поля, имена полей) — вложенный объект
+        self.fields = []
+        # Вложенные объекты из кэша: имя поля -> (модель, позиция номера объекта в строке)
+        self.references = {}
+        for name, field in schema.model_fields.items():
+            if selected is not None and name not in selected:
+                continue
+            nested = _nested(field)
+            if nested is not None:
+                relationship = mapper.relationships[name]
+                names = selected[name] if selected is not None else tuple(nested.model_fields)
+                if cached:
+                    column = next(iter(relationship.local_columns))
+                    self.references[name] = (relationship.mapper.class_, len(self.columns))
+                    self.columns.append(getattr(model, column.key).label(f"{name}__ref"))
+                else:
+                    target = aliased(relationship.mapper.class_)
+                    self.columns += [getattr(target, column).label(f"{name}__{column}") for column in names]
+                    self.joins.append(getattr(model, name).of_type(target))
+                self.fields.append((name, names))
+            else:
+                self.columns.append(getattr(model, name))
+                self.fields.append((name, None))
+        # Лишние колонки стоят в конце строки и в ответ не попадают
+        self.columns += [getattr(model, key) for key in KEY_COLUMNS if selected is not None and key not in selected]
+
+    def query(self, db):
+        query = db.query(*self.columns)
+        for join in self.joins:
+            query = query.outerjoin(join)
+        return query
+
+    def related(self, db, rows) -> dict:
+        # Значения вложенных объектов страницы: имя поля -> {id: значения колонок}
+        return {name: entitycache.get_many(db, model, [row[position] for row in rows if row[position] is not None])
+                for name, (model, position) in self.references.items()}
+
+    def dicts(self, rows, related=None) -> list:
+        items = []
+        for row in rows:
+            item = {}
+            position = 0
+            for name, nested in self.fields:
+                if nested is None:
+                    item[name] = row[position]
+                    position += 1
+                elif name in self.references:
+                    values = related[name].get(row[position]) if row[position] is not None else None
+                    item[name] = {column: values[column] for column in nested} if values is not None else None
+                    position += 1
+                else:
+                    values = row[position:position + len(nested)]
+                    item[name] = dict(zip(nested, values)) if any(value is not None for value in values) else None
+                    position += len(nested)
+            items.append(item)
+        return items
+
+    def encode(self, rows, related=None) -> bytes:
+        return orjson.dumps(self.dicts(rows, related))
+
+layouts = {}
+
+def row_layout(model, schema, fields=None) -> RowLayout:
+    # Псевдонимы создаются на каждый запрос к архиву и не кэшируются; архивные строки
+    # присоединяют сотрудника JOIN, как и при выключенном кэше объектов
+    if not isinstance(model, type):
+        return RowLayout(model, schema, fields)
+    layout = layouts.get((model, schema, fields))
+    if layout is None:
+        layout = layouts[(model, schema, fields)] = RowLayout(model, schema, fields, config.ENTITY_CACHE_SIZE > 0)
+    return layout
+
+def _large(mapper, name: str) -> bool:
+    column = mapper.columns.get(name)
+    return column is not None and isinstance(column.type, Text)
+
+def summary_fields(model, schema) -> tuple:
+    # Краткое представление: все поля схемы, кроме колонок Text (и у вложенного сотрудника)
+    mapper = inspect(model)
+    fields = []
+    for name, field in schema.model_fields.items():
+        nested = _nested(field)
+        if nested is not None:
+            related = mapper.relationships[name].mapper
+            fields.append((name, tuple(column for column in nested.model_fields if not _large(related, column))))
+        elif not _large(mapper, name):
+            fields.append((name, None))
+    return tuple(fields)
+
+def select_fields(model, schema, fields: str = None, view: str = "full"):
+    # Выбор полей ответа: кортеж (имя поля, None | имена полей вложенного объекта) в порядке схемы
+    # или None — все поля. Порядок полей в ответе всегда как в схеме
+    if fields is None:
+        return summary_fields(model, schema) if view == "summary" else None
+    requested = {}
+    for item in fields.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, column = item.partition(".")
+        requested.setdefault(name, set())
+        if column:
+            requested[name].add(column)
+    if not requested:
+        raise HTTPException(status_code=400, detail="Не выбрано ни одного поля")
+    unknown = [name for name in requested if name not in schema.model_fields]
+    selected = []
+    for name, field in schema.model_fields.items():
+        if name not in requested:
+            continue
+        nested = _nested(field)
+        columns = requested[name]
+        if nested is None:
+            if columns:
+                unknown += [f"{name}.{column}" for column in sorted(columns)]
+            selected.append((name, None))
+        else:
+            unknown += [f"{name}.{column}" for column in sorted(columns - set(nested.model_fields))]
+            selected.append((name, tuple(column for column in nested.model_fields if not columns or column in columns)))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Неизвестные поля: {', '.join(unknown)}")
+    return tuple(selected)
+
+def dumps(value) -> bytes:
+    return orjson.dumps(value)
+
+def json_response(body: bytes, response: Response) -> Response:
+    # Заголовки, выставленные обработчиком (курсор следующей страницы), переносятся в готовый ответ
+    headers = {name: value for name, value in response.headers.items() if name != "content-length"}
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,151 @@
+from fastapi import HTTPException
+from sqlalchemy import text
+import archive, database, models, pagination
+
+# Статистика документов по сводным таблицам. Сводки ведут триггеры SQLite, то есть счётчики
+# меняются в той же транзакции, что и сам документ, при любом способе записи. Запросы читают
+# только нужные строки сводки по первичному ключу и не просматривают таблицы документов.
+
+# Документы сотрудника: вид документа -> (модель, колонка с номером сотрудника)
+EMPLOYEE_DOC_TYPES = {
+    "memos": (models.Memo, "author_id"),
+    "reports": (models.Report, "author_id"),
+    "orders": (models.Order, "signer_id"),
+}
+# Документы по периодам: вид документа -> модель
+PERIOD_DOC_TYPES = {
+    "incoming": models.IncomingDocument,
+    "outgoing": models.OutgoingDocument,
+    "memos": models.Memo,
+    "reports": models.Report,
+    "orders": models.Order,
+}
+# Период -> длина префикса created_at ('2025-08-07' или '2025-08')
+GRANULARITIES = {"day": 10, "month": 7}
+
+TABLES = {
+    "employee_document_counts": "CREATE TABLE employee_document_counts ("
+                                "employee_id INTEGER NOT NULL, doc_type VARCHAR(20) NOT NULL, count INTEGER NOT NULL, "
+                                "PRIMARY KEY (employee_id, doc_type)) WITHOUT ROWID",
+    "period_document_counts": "CREATE TABLE period_document_counts ("
+                              "granularity VARCHAR(5) NOT NULL, period VARCHAR(10) NOT NULL, doc_type VARCHAR(20) NOT NULL, "
+                              "count INTEGER NOT NULL, PRIMARY KEY (granularity, period, doc_type)) WITHOUT ROWID",
+}
+
+def rollups():
+    # (имя, таблица документов, отслеживаемая колонка, таблица сводки, ключ сводки: колонка -> выражение от {row})
+    for doc_type, (model, column) in EMPLOYEE_DOC_TYPES.items():
+        yield (f"{doc_type}_employee", model.__tablename__, column, "employee_document_counts",
+               {"employee_id": f"{{row}}.{column}", "doc_type": f"'{doc_type}'"})
+    for doc_type, model in PERIOD_DOC_TYPES.items():
+        for granularity, length in GRANULARITIES.items():
+            yield (f"{doc_type}_{granularity}", model.__tablename__, "created_at", "period_document_counts",
+                   {"granularity": f"'{granularity}'", "period": f"substr({{row}}.created_at, 1, {length})", "doc_type": f"'{doc_type}'"})
+
+def _increment(table: str, key: dict, row: str) -> str:
+    columns = ", ".join(key)
+    values = [expression.format(row=row) for expression in key.values()]
+    not_null = " AND ".join(f"{value} IS NOT NULL" for value in values)
+    return (f"INSERT INTO {table} ({columns}, count) SELECT {', '.join(values)}, 1 WHERE {not_null} "
+            f"ON CONFLICT ({columns}) DO UPDATE SET count = count + 1;")
+
+def _decrement(table: str, key: dict, row: str) -> str:
+    where = " AND ".join(f"{column} = {expression.format(row=row)}" for column, expression in key.items())
+    return (f"UPDATE {table} SET count = count - 1 WHERE {where}; "
+            f"DELETE FROM {table} WHERE {where} AND count <= 0;")
+
+def rebuild_rollups(conn, years=()):
+    # years — подключённые архивы: перенесённые в них документы тоже учитываются
+    archived = {model.__tablename__: model.__table__ for model in archive.MODELS}
+    for table in TABLES:
+        conn.execute(text(f"DELETE FROM {table}"))
+    for _, source, column, table, key in rollups():
+        values = [expression.format(row=source) for expression in key.values()]
+        rows = archive.union(archived[source], years) if source in archived and years else None
+        from_clause = f"({rows.element.compile(conn)}) AS {source}" if rows is not None else source
+        conn.execute(text(
+            f"INSERT INTO {table} ({', '.join(key)}, count) SELECT {', '.join(values)}, COUNT(*) FROM {from_clause} "
+            f"WHERE {source}.{column} IS NOT NULL GROUP BY {', '.join(values)}"))
+
+def install(engine):
+    with engine.begin() as conn:
+        created = False
+        for table, ddl in TABLES.items():
+            if not conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": table}).first():
+                conn.execute(text(ddl))
+                created = True
+        for name, source, column, table, key in rollups():
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS stats_{name}_insert AFTER INSERT ON {source} BEGIN "
+                f"{_increment(table, key, 'new')} END"))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS stats_{name}_update AFTER UPDATE OF {column} ON {source} "
+                f"WHEN old.{column} IS NOT new.{column} BEGIN "
+                f"{_decrement(table, key, 'old')} {_increment(table, key, 'new')} END"))
+            # Перенос в архив счётчики не уменьшает. Триггер пересоздаётся, чтобы условие
+            # появилось и в базах, созданных раньше архива
+            conn.execute(text(f"DROP TRIGGER IF EXISTS stats_{name}_delete"))
+            conn.execute(text(
+                f"CREATE TRIGGER stats_{name}_delete AFTER DELETE ON {source} WHEN {archive.NOT_MOVING} BEGIN "
+                f"{_decrement(table, key, 'old')} END"))
+    if created:
+        # Первичное наполнение сводок уже существующими документами
+        rebuild(engine)
+
+def rebuild(engine):
+    # Полный пересчёт сводок по таблицам документов и архивам одной транзакцией
+    years = archive.archive_years()
+    with engine.connect() as conn:
+        with archive.attached(conn, years):
+            rebuild_rollups(conn, years)
+            conn.commit()
+
+def _check_types(types):
+    unknown = set(types) - set(PERIOD_DOC_TYPES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Неизвестные виды документов: {', '.join(sorted(unknown))}")
+
+def employee_stats(db, response, employee_id: int = None, limit: int = 100, after: str = None):
+    params = {"limit": limit}
+    where = "1 = 1"
+    if employee_id is not None:
+        params["employee_id"] = employee_id
+        where += " AND employee_id = :employee_id"
+    if after is not None:
+        values = pagination.decode_cursor(after)
+        if len(values) != 1 or not isinstance(values[0], int):
+            raise HTTPException(status_code=400, detail="Некорректный курсор")
+        params["after"] = values[0]
+        where += " AND employee_id > :after"
+    counts = ", ".join(f"SUM(CASE WHEN doc_type = '{doc_type}' THEN count ELSE 0 END) AS {doc_type}"
+                       for doc_type in EMPLOYEE_DOC_TYPES)
+    rows = db.execute(text(
+        f"SELECT employee_id, {counts} FROM employee_document_counts WHERE {where} "
+        f"GROUP BY employee_id ORDER BY employee_id LIMIT :limit"), params).mappings().all()
+    if limit > 0 and len(rows) == limit:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = pagination.encode_cursor(rows[-1]["employee_id"])
+    return [dict(row) for row in rows]
+
+def period_stats(db, granularity: str, date_from=None, date_to=None, types=None):
+    length = GRANULARITIES[granularity]
+    params = {"granularity": granularity}
+    where = "granularity = :granularity"
+    if date_from is not None:
+        params["date_from"] = date_from.isoformat()[:length]
+        where += " AND period >= :date_from"
+    if date_to is not None:
+        params["date_to"] = date_to.isoformat()[:length]
+        where += " AND period <= :date_to"
+    if types:
+        _check_types(types)
+        where += f" AND doc_type IN ({', '.join(repr(doc_type) for doc_type in types)})"
+    rows = db.execute(text(
+        f"SELECT period, doc_type AS type, count FROM period_document_counts WHERE {where} "
+        f"ORDER BY period, doc_type"), params).mappings().all()
+    return [dict(row) for row in rows]
+
+if __name__ == "__main__":
+    # python stats.py — пересчитать сводки (например, после загрузки данных в обход приложения)
+    install(database.engine)
+    rebuild(database.engine)
+    print("Сводки статистики пересчитаны")
@@ -0,0 +1,97 @@
+from datetime import datetime, timezone
+from fastapi import HTTPException
+from sqlalchemy import select, text, tuple_
+import changefeed, config, pagination, serialization
+
+# Синхронизация для клиентов, хранящих копию таблицы. Токен синхронизации — номер seq журнала
+# изменений (change_log), до которого клиент уже получил данные. Следующий запрос читает только
+# записи журнала этого вида после seq (индекс по doc_type, seq), то есть стоимость пропорциональна
+# числу изменений, а не размеру таблицы. Удалённые строки возвращаются номерами в deleted.
+# Перенос в архив (archive.py) не удаление: строка, которой нет в таблице, попадает в deleted
+# только по записи op = 'delete', а перенесённая в архив у клиента остаётся.
+#
+# Без updated_since (первая синхронизация) или с моментом времени сначала выполняется догоняющий
+# проход по индексу (updated_at, id); запомненный в начале seq затем продолжает синхронизацию по
+# журналу, так что изменения, сделанные во время прохода, не теряются. Клиент применяет сначала
+# deleted, затем items.
+
+DOC_TYPES = {model: doc_type for doc_type, model in changefeed.FEED_TYPES.items()}
+
+def parse_since(updated_since: str):
+    # (значения токена, момент времени); момент — в локальном времени, как updated_at
+    if updated_since is None:
+        return None, None
+    try:
+        moment = datetime.fromisoformat(updated_since)
+    except ValueError:
+        try:
+            values = pagination.decode_cursor(updated_since)
+        except HTTPException:
+            values = []
+        if len(values) not in (1, 3) or not isinstance(values[0], int) or not isinstance(values[-1], int):
+            raise HTTPException(status_code=400, detail="Некорректный токен синхронизации")
+        if len(values) == 3:
+            try:
+                values[1] = datetime.fromisoformat(values[1])
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=400, detail="Некорректный токен синхронизации")
+        return values, None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return None, moment
+
+def tombstones(db, model, doc_type: str, moment: datetime):
+    # Удалённые после момента времени строки, которых сейчас нет в таблице
+    since = moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+    ids = db.execute(text("SELECT DISTINCT item_id FROM change_log WHERE doc_type = :doc_type AND op = 'delete' "
+                          "AND changed_at >= :since"), {"doc_type": doc_type, "since": since}).scalars().all()
+    if not ids:
+        return []
+    present = set(db.scalars(select(model.id).where(model.id.in_(ids))))
+    return sorted(item_id for item_id in ids if item_id not in present)
+
+def delta(db, model, layout, doc_type: str, after: int, limit: int):
+    changes = db.execute(text("SELECT seq, item_id, op FROM change_log WHERE doc_type = :doc_type AND seq > :after "
+                              "ORDER BY seq LIMIT :limit"), {"doc_type": doc_type, "after": after, "limit": limit}).all()
+    ids = list(dict.fromkeys(change.item_id for change in changes))
+    rows = layout.query(db).filter(model.id.in_(ids)).order_by(model.id).all() if ids else []
+    present = {row.id for row in rows}
+    removed = {change.item_id for change in changes if change.op == "delete"}
+    return {
+        "items": layout.dicts(rows, layout.related(db, rows)),
+        "deleted": sorted(item_id for item_id in removed if item_id not in present),
+        "token": pagination.encode_cursor(changes[-1].seq if changes else after),
+        "has_more": len(changes) == limit,
+    }
+
+def catch_up(db, model, layout, doc_type: str, token, moment: datetime, limit: int):
+    deleted = []
+    query = layout.query(db)
+    if token is not None:
+        seq, updated_at, last_id = token
+        query = query.filter(tuple_(model.updated_at, model.id) > tuple_(updated_at, last_id))
+    else:
+        seq = changefeed.last_seq(db)
+        if moment is not None:
+            query = query.filter(model.updated_at >= moment)
+            deleted = tombstones(db, model, doc_type, moment)
+    rows = query.order_by(model.updated_at, model.id).limit(limit).all()
+    has_more = len(rows) == limit
+    return {
+        "items": layout.dicts(rows, layout.related(db, rows)),
+        "deleted": deleted,
+        "token": pagination.encode_cursor(seq, rows[-1].updated_at, rows[-1].id) if has_more else pagination.encode_cursor(seq),
+        "has_more": has_more,
+    }
+
+def sync_items(db, model, schema, response, updated_since: str = None, limit: int = 500):
+    doc_type = DOC_TYPES[model]
+    layout = serialization.row_layout(model, schema)
+    token, moment = parse_since(updated_since)
+    if token is not None and len(token) == 1:
+        result = delta(db, model, layout, doc_type, token[0], limit)
+    else:
+        result = catch_up(db, model, layout, doc_type, token, moment, limit)
+    if config.FAST_SERIALIZATION:
+        return serialization.json_response(serialization.dumps(result), response)
+    return result
@@ -0,0 +1,38 @@
+import os
+import sqlite3
+import tempfile
+import pytest
+
+# Приложение настраивается переменными окружения при импорте config, поэтому временные
+# база и каталоги задаются до импорта main. Одно приложение на весь прогон тестов.
+directory = tempfile.mkdtemp(prefix="edo-tests-")
+os.environ.update({
+    "DATABASE_PATH": os.path.join(directory, "test.db"),
+    "ARCHIVE_DIR": os.path.join(directory, "archive"),
+    "ATTACHMENTS_DIR": os.path.join(directory, "attachments"),
+    "IMPORT_DIR": os.path.join(directory, "imports"),
+    "PROFILING_ENABLED": "true",
+    "PROFILING_TOKEN": "test-token",
+    "PROFILING_DIR": os.path.join(directory, "profiles"),
+})
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    import main
+    return TestClient(main.app)
+
+@pytest.fixture
+def other_process():
+    # Отдельное соединение с файлом базы — как запись из другого процесса
+    conn = sqlite3.connect(os.environ["DATABASE_PATH"], isolation_level=None)
+    yield conn
+    conn.close()
+
+@pytest.fixture
+def employee(client):
+    number = os.urandom(4).hex()
+    response = client.post("/employees/", json={"full_name": "Иванов Иван", "position": "Инженер",
+                                                "email": f"ivanov-{number}@example.com"})
+    assert response.status_code == 200
+    return response.json()
@@ -0,0 +1,119 @@
+import asyncio
+import admission
+from admission import ITEM, LIST, Limiter
+
+async def _settle():
+    # Дать ожидающим задачам дойти до очереди или забрать результат
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def test_item_gets_freed_slot_before_list():
+    async def scenario():
+        limiter = Limiter(1, (1, 1), queue_size=10, timeout=1)
+        assert await limiter.acquire(LIST)
+        waiting_list = asyncio.create_task(limiter.acquire(LIST))
+        await _settle()
+        waiting_item = asyncio.create_task(limiter.acquire(ITEM))
+        await _settle()
+
+        limiter.release(LIST)
+        await _settle()
+        assert waiting_item.done() and waiting_item.result()
+        assert not waiting_list.done()
+
+        limiter.release(ITEM)
+        assert await waiting_list
+        assert limiter.active == [0, 1]
+    asyncio.run(scenario())
+
+def test_lists_are_capped_but_items_are_not():
+    async def scenario():
+        limiter = Limiter(3, (3, 1), queue_size=10, timeout=1)
+        assert await limiter.acquire(LIST)
+        waiting_list = asyncio.create_task(limiter.acquire(LIST))
+        await _settle()
+        assert not waiting_list.done()
+        assert await limiter.acquire(ITEM)
+        assert await limiter.acquire(ITEM)
+        assert limiter.active == [2, 1]
+        waiting_list.cancel()
+    asyncio.run(scenario())
+
+def test_full_queue_rejects():
+    async def scenario():
+        limiter = Limiter(1, (1,), queue_size=1, timeout=1)
+        assert await limiter.acquire()
+        waiting = asyncio.create_task(limiter.acquire())
+        await _settle()
+        assert not await limiter.acquire()
+        assert limiter.rejected == 1
+        limiter.release()
+        assert await waiting
+    asyncio.run(scenario())
+
+def test_item_displaces_newest_list_waiter_when_queue_is_full():
+    async def scenario():
+        limiter = Limiter(1, (1, 1), queue_size=2, timeout=1)
+        assert await limiter.acquire(LIST)
+        first, second = asyncio.create_task(limiter.acquire(LIST)), asyncio.create_task(limiter.acquire(LIST))
+        await _settle()
+        waiting_item = asyncio.create_task(limiter.acquire(ITEM))
+        await _settle()
+
+        assert second.done() and not second.result()
+        assert not first.done() and not waiting_item.done()
+        limiter.release(LIST)
+        assert await waiting_item
+        limiter.release(ITEM)
+        assert await first
+    asyncio.run(scenario())
+
+def test_timed_out_waiter_does_not_leak_slot():
+    async def scenario():
+        limiter = Limiter(1, (1,), queue_size=10, timeout=0.05)
+        assert await limiter.acquire()
+        assert not await limiter.acquire()
+        assert limiter.queued() == 0 and limiter.rejected == 1
+        limiter.release()
+        assert limiter.active == [0]
+        assert await limiter.acquire()
+    asyncio.run(scenario())
+
+def test_cancelled_waiter_does_not_leak_slot():
+    async def scenario():
+        limiter = Limiter(1, (1,), queue_size=10, timeout=1)
+        assert await limiter.acquire()
+        waiting = asyncio.create_task(limiter.acquire())
+        await _settle()
+        waiting.cancel()
+        await _settle()
+        assert limiter.queued() == 0
+        limiter.release()
+        assert limiter.active == [0]
+    asyncio.run(scenario())
+
+def test_waiter_cancelled_after_admission_returns_slot():
+    async def scenario():
+        limiter = Limiter(1, (1,), queue_size=10, timeout=1)
+        assert await limiter.acquire()
+        waiting = asyncio.create_task(limiter.acquire())
+        await _settle()
+        # Место передано ожидающему, но задача отменена раньше, чем забрала результат
+        limiter.release()
+        assert limiter.active == [1]
+        waiting.cancel()
+        await _settle()
+        # До Python 3.12 wait_for отдаёт уже готовый результат вместо отмены: место тогда
+        # у вызывающего, и он освобождает его сам, как AdmissionMiddleware
+        if not waiting.cancelled():
+            assert waiting.result()
+            limiter.release()
+        assert limiter.active == [0] and limiter.queued() == 0
+    asyncio.run(scenario())
+
+def test_overloaded_request_gets_503_with_retry_after(client, monkeypatch):
+    monkeypatch.setitem(admission.limiters, "read", Limiter(0, (0, 0), queue_size=0, timeout=0.01))
+    response = client.get("/employees/")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert client.get("/metrics").status_code == 200
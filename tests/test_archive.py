@@ -0,0 +1,72 @@
+from sqlalchemy import create_engine
+import archive, config, database
+
+def test_new_row_does_not_reuse_archived_id(client, other_process):
+    document = client.post("/incoming/", json={"sender_id": "ООО Ромашка", "subject": "Старое письмо"}).json()
+    other_process.execute("UPDATE incoming_documents SET created_at = '2001-05-01 10:00:00.000000' WHERE id = ?",
+                          (document["id"],))
+    assert archive.archive(database.engine, days=3650)["incoming_documents"] >= 1
+
+    created = client.post("/incoming/", json={"sender_id": "ООО Ромашка", "subject": "Новое письмо"}).json()
+    assert created["id"] > document["id"]
+    assert client.get(f"/incoming/{created['id']}").json()["subject"] == "Новое письмо"
+
+def test_archived_document_leaves_search(client, other_process):
+    document = client.post("/incoming/", json={"sender_id": "ООО Ромашка", "subject": "Письмо о поставке брусники"}).json()
+    assert [hit["id"] for hit in client.get("/search/", params={"q": "брусники"}).json()] == [document["id"]]
+    other_process.execute("UPDATE incoming_documents SET created_at = '2001-04-01 10:00:00.000000' WHERE id = ?",
+                          (document["id"],))
+    archive.archive(database.engine, days=3650)
+
+    assert client.get("/search/", params={"q": "брусники"}).json() == []
+
+def test_employee_with_archived_orders_is_not_deleted(client, employee, other_process):
+    order = client.post("/orders/", json={"content": "Приказ о переводе", "signer_id": employee["id"]}).json()
+    other_process.execute("UPDATE orders SET created_at = '2001-06-01 10:00:00.000000' WHERE id = ?", (order["id"],))
+    assert archive.archive(database.engine, days=3650)["orders"] >= 1
+
+    response = client.delete(f"/employees/{employee['id']}")
+    assert response.status_code == 409
+    assert client.get(f"/employees/{employee['id']}").status_code == 200
+    archived = client.get("/orders/", params={"created_to": "2002-01-01T00:00:00", "signer_id": employee["id"]}).json()
+    assert [(item["id"], item["signer"]["id"]) for item in archived] == [(order["id"], employee["id"])]
+
+def test_deleted_employee_id_is_not_reused(client, employee):
+    assert client.delete(f"/employees/{employee['id']}").status_code == 200
+    created = client.post("/employees/", json={"full_name": "Сидоров Сидор", "position": "Инженер",
+                                               "email": f"sidorov-{employee['id']}@example.com"}).json()
+    assert created["id"] > employee["id"]
+
+def test_migrate_rebuilds_legacy_table(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    archive.create_archive(2001)
+    copy = create_engine(f"sqlite:///{archive.archive_path(2001)}")
+    with copy.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO incoming_documents (id, sender_id, subject) VALUES (500, 'ООО Ромашка', 'В архиве')")
+        # Приказ удалённого сотрудника
+        conn.exec_driver_sql("INSERT INTO orders (id, content, signer_id) VALUES (3, 'Приказ', 800)")
+    copy.dispose()
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        # Таблица в том виде, как её создавали до AUTOINCREMENT
+        conn.exec_driver_sql("CREATE TABLE incoming_documents (id INTEGER NOT NULL, sender_id VARCHAR(200) NOT NULL, "
+                             "subject VARCHAR(200) NOT NULL, resolution TEXT, note TEXT, created_at DATETIME, "
+                             "updated_at DATETIME, PRIMARY KEY (id))")
+        conn.exec_driver_sql("INSERT INTO incoming_documents (id, sender_id, subject) VALUES (7, 'ООО Ромашка', 'Письмо')")
+        conn.exec_driver_sql("CREATE TABLE employees (id INTEGER NOT NULL, full_name VARCHAR(100) NOT NULL, "
+                             "position VARCHAR(100) NOT NULL, email VARCHAR(100) NOT NULL UNIQUE, phone VARCHAR(20), note TEXT, "
+                             "created_at DATETIME, "
+                             "updated_at DATETIME, PRIMARY KEY (id))")
+
+    archive.migrate(engine)
+    archive.migrate(engine)
+
+    with engine.begin() as conn:
+        ddl = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE name = 'incoming_documents'").scalar()
+        assert "AUTOINCREMENT" in ddl
+        assert conn.exec_driver_sql("SELECT id, subject FROM incoming_documents").all() == [(7, "Письмо")]
+        conn.exec_driver_sql("INSERT INTO incoming_documents (sender_id, subject) VALUES ('ООО Ромашка', 'Новое')")
+        assert conn.exec_driver_sql("SELECT max(id) FROM incoming_documents").scalar() == 501
+        conn.exec_driver_sql("INSERT INTO employees (full_name, position, email) VALUES ('Иванов Иван', 'Инженер', 'ivanov@example.com')")
+        assert conn.exec_driver_sql("SELECT id FROM employees").scalar() == 801
+    engine.dispose()
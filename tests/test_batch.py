@@ -0,0 +1,77 @@
+import pytest
+
+def _batch(client, operations, atomic=True):
+    response = client.post("/batch", params={"atomic": atomic}, json=operations)
+    assert response.status_code == 200
+    return response.json()
+
+def _count(other_process, table: str) -> int:
+    return other_process.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+
+def _create(subject: str) -> dict:
+    return {"op": "create", "type": "incoming", "data": {"sender_id": "ООО Ромашка", "subject": subject}}
+
+@pytest.fixture
+def outgoing(client):
+    return client.post("/outgoing/", json={"recipient_id": "ООО Ромашка", "subject": "Ответ",
+                                           "delivery_method": "email"}).json()
+
+def test_patch_employee_skips_null_like_route(client, employee):
+    rest = client.patch(f"/employees/{employee['id']}", json={"full_name": None, "position": "Ведущий инженер"})
+    assert rest.status_code == 200
+
+    result = _batch(client, [{"op": "patch", "type": "employees", "id": employee["id"],
+                              "data": {"full_name": None, "position": "Главный инженер"}}])
+    assert result["committed"]
+    assert result["results"][0]["status"] == 200
+    assert result["results"][0]["item"]["full_name"] == rest.json()["full_name"] == employee["full_name"]
+    assert result["results"][0]["item"]["position"] == "Главный инженер"
+
+@pytest.mark.parametrize("op, method", [("patch", None), ("patch", "fax"), ("update", "fax")])
+def test_outgoing_delivery_method_checked_like_route(client, outgoing, op, method):
+    data = {"delivery_method": method} if op == "patch" else {"subject": "Ответ", "delivery_method": method}
+    rest = getattr(client, "patch" if op == "patch" else "put")(f"/outgoing/{outgoing['id']}", json=data)
+    assert rest.status_code == 400
+
+    result = _batch(client, [{"op": op, "type": "outgoing", "id": outgoing["id"], "data": data}])
+    assert not result["committed"]
+    assert result["results"][0] == {"status": 400, "id": None, "item": None, "detail": rest.json()["detail"]}
+
+def test_atomic_batch_rolls_back_on_error(client, employee, other_process):
+    incoming, employees = _count(other_process, "incoming_documents"), _count(other_process, "employees")
+    result = _batch(client, [
+        _create("Первое"),
+        {"op": "create", "type": "employees", "data": {"full_name": "Петров Пётр", "position": "Инженер",
+                                                      "email": employee["email"]}},
+        _create("Третье"),
+    ])
+
+    assert not result["committed"]
+    assert [item["status"] for item in result["results"]] == [424, 409, 424]
+    assert _count(other_process, "incoming_documents") == incoming
+    assert _count(other_process, "employees") == employees
+
+def test_best_effort_batch_commits_successful_operations(client, other_process):
+    before = _count(other_process, "incoming_documents")
+    result = _batch(client, [
+        _create("Первое"),
+        {"op": "patch", "type": "incoming", "id": 10 ** 9, "data": {"subject": "Нет такого"}},
+        {"op": "archive", "type": "incoming", "id": 1},
+        _create("Четвёртое"),
+    ], atomic=False)
+
+    assert result["committed"]
+    assert [item["status"] for item in result["results"]] == [200, 404, 400, 200]
+    assert _count(other_process, "incoming_documents") == before + 2
+    for item in (result["results"][0], result["results"][3]):
+        assert client.get(f"/incoming/{item['id']}").json()["subject"] == item["item"]["subject"]
+
+def test_atomic_batch_rolls_back_earlier_update(client, employee):
+    result = _batch(client, [
+        {"op": "patch", "type": "employees", "id": employee["id"], "data": {"position": "Главный инженер"}},
+        {"op": "delete", "type": "memos", "id": 10 ** 9},
+    ])
+
+    assert not result["committed"]
+    assert [item["status"] for item in result["results"]] == [424, 404]
+    assert client.get(f"/employees/{employee['id']}").json()["position"] == employee["position"]
@@ -0,0 +1,31 @@
+import time
+import entitycache
+
+def test_list_sees_employee_changed_by_other_process(client, employee, other_process):
+    memo = client.post("/memos/", json={"author_id": employee["id"], "content": "Служебная записка"}).json()
+    url = f"/memos/?author_id={employee['id']}"
+    assert client.get(url).json()[0]["author"]["full_name"] == "Иванов Иван"
+    # Повторный запрос — из кэша ответов, сотрудник — из кэша объектов
+    assert client.get(url).json()[0]["author"]["full_name"] == "Иванов Иван"
+
+    other_process.execute("UPDATE employees SET full_name = 'Петров Пётр' WHERE id = ?", (employee["id"],))
+
+    assert client.get(url).json()[0]["author"]["full_name"] == "Петров Пётр"
+    assert client.get(f"/memos/?limit=5&fields=author.full_name&author_id={employee['id']}").json() == [
+        {"author": {"full_name": "Петров Пётр"}}]
+    assert memo["id"] in [item["id"] for item in client.get(url).json()]
+
+def test_item_sees_change_from_other_process_after_ttl(client, employee, other_process, monkeypatch):
+    monkeypatch.setattr(entitycache.entity_cache, "ttl", 0.2)
+    assert client.get(f"/employees/{employee['id']}").json()["position"] == "Инженер"
+    other_process.execute("UPDATE employees SET position = 'Начальник отдела' WHERE id = ?", (employee["id"],))
+    assert client.get(f"/employees/{employee['id']}").json()["position"] == "Инженер"
+    time.sleep(0.3)
+    assert client.get(f"/employees/{employee['id']}").json()["position"] == "Начальник отдела"
+
+def test_write_invalidates_nested_employee(client, employee):
+    memo = client.post("/memos/", json={"author_id": employee["id"], "content": "Текст"}).json()
+    assert client.get(f"/memos/{memo['id']}").json()["author"]["position"] == "Инженер"
+    assert client.patch(f"/employees/{employee['id']}", json={"position": "Главный инженер"}).status_code == 200
+    assert client.get(f"/memos/{memo['id']}").json()["author"]["position"] == "Главный инженер"
+    assert client.get(f"/memos/?author_id={employee['id']}").json()[0]["author"]["position"] == "Главный инженер"
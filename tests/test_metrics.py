@@ -0,0 +1,15 @@
+import re
+import pytest
+import config
+
+def _sql_statements(client, method: str, route: str) -> float:
+    text = client.get("/metrics").text
+    found = re.search(rf'^http_request_sql_statements_sum\{{method="{method}",route="{re.escape(route)}"\}} (\S+)$', text, re.M)
+    return float(found.group(1)) if found else 0.0
+
+@pytest.mark.parametrize("group_commit", [False, True])
+def test_write_sql_counted_for_request(client, monkeypatch, group_commit):
+    monkeypatch.setattr(config, "GROUP_COMMIT", group_commit)
+    before = _sql_statements(client, "POST", "/incoming/")
+    assert client.post("/incoming/", json={"sender_id": "ООО Ромашка", "subject": "Письмо"}).status_code == 200
+    assert _sql_statements(client, "POST", "/incoming/") - before >= 1
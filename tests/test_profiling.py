@@ -0,0 +1,45 @@
+import pytest
+import config
+
+HEADERS = {"X-Profile": "test-token"}
+
+def test_profile_of_db_backed_request(client, employee):
+    response = client.get(f"/employees/{employee['id']}", headers=HEADERS)
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+
+    profile = client.get(f"/admin/profiles/{profile_id}", headers=HEADERS).json()
+    assert profile["status"] == 200
+    assert any("FROM employees" in item["statement"] for item in profile["sql"])
+    assert any("get_or_404" in item["function"] for item in profile["top_functions"])
+    download = client.get(f"/admin/profiles/{profile_id}/download", headers=HEADERS)
+    assert download.status_code == 200 and download.content
+
+@pytest.mark.parametrize("group_commit", [False, True])
+def test_profiled_write(client, monkeypatch, group_commit):
+    monkeypatch.setattr(config, "GROUP_COMMIT", group_commit)
+    response = client.post("/incoming/", headers=HEADERS,
+                           json={"sender_id": "ООО Ромашка", "subject": "Письмо"})
+    assert response.status_code == 200
+    profile = client.get(f"/admin/profiles/{response.headers['X-Profile-Id']}", headers=HEADERS).json()
+    assert any("INSERT INTO incoming_documents" in item["statement"] for item in profile["sql"])
+
+def test_request_without_header_is_not_profiled(client, employee):
+    assert "X-Profile-Id" not in client.get(f"/employees/{employee['id']}").headers
+
+def test_wrong_token_is_rejected(client, employee):
+    assert "X-Profile-Id" not in client.get(f"/employees/{employee['id']}", headers={"X-Profile": "1"}).headers
+    assert client.get("/admin/profiles", headers={"X-Profile": "1"}).status_code == 403
+    assert client.get("/admin/profiles").status_code == 403
+
+def test_without_token_profiles_are_closed(client, employee, monkeypatch):
+    monkeypatch.setattr(config, "PROFILING_TOKEN", "")
+    assert "X-Profile-Id" not in client.get(f"/employees/{employee['id']}", headers={"X-Profile": ""}).headers
+    assert "X-Profile-Id" not in client.get(f"/employees/{employee['id']}", headers={"X-Profile": "1"}).headers
+    assert client.get("/admin/profiles", headers={"X-Profile": ""}).status_code == 403
+    assert client.get("/admin/profiles").status_code == 403
+
+def test_sampling_works_without_token(client, employee, monkeypatch):
+    monkeypatch.setattr(config, "PROFILING_TOKEN", "")
+    monkeypatch.setattr(config, "PROFILING_SAMPLE_RATE", 1.0)
+    assert "X-Profile-Id" in client.get(f"/employees/{employee['id']}").headers
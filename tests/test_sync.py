@@ -0,0 +1,34 @@
+import archive, database
+
+def _delta(client, token=None):
+    return client.get("/incoming/sync", params={"updated_since": token} if token else {}).json()
+
+def _current_token(client):
+    # Токен после всех уже сделанных изменений
+    page = {"token": None, "has_more": True}
+    while page["has_more"]:
+        page = _delta(client, page["token"])
+    return page["token"]
+
+def test_archived_row_is_not_deleted_in_delta(client, other_process):
+    document = client.post("/incoming/", json={"sender_id": "ООО Ромашка", "subject": "Письмо"}).json()
+    other_process.execute("UPDATE incoming_documents SET created_at = '2001-03-01 10:00:00.000000' WHERE id = ?",
+                          (document["id"],))
+    token = _current_token(client)
+
+    assert client.patch(f"/incoming/{document['id']}", json={"subject": "Письмо (уточнено)"}).status_code == 200
+    assert archive.archive(database.engine, days=3650)["incoming_documents"] >= 1
+    assert client.get(f"/incoming/{document['id']}").status_code == 404
+
+    page = _delta(client, token)
+    assert document["id"] not in page["deleted"]
+    assert document["id"] not in [item["id"] for item in page["items"]]
+
+def test_deleted_row_is_reported_in_delta(client):
+    document = client.post("/incoming/", json={"sender_id": "ООО Ромашка", "subject": "Черновик"}).json()
+    token = _current_token(client)
+
+    assert client.patch(f"/incoming/{document['id']}", json={"subject": "Черновик 2"}).status_code == 200
+    assert client.delete(f"/incoming/{document['id']}").status_code == 200
+
+    assert _delta(client, token)["deleted"] == [document["id"]]
@@ -0,0 +1,100 @@
+import asyncio
+import contextvars
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from sqlalchemy import create_engine, event
+import config, database, profiling
+
+# Групповая фиксация (group commit): все изменения выполняет один поток-писатель. Операции,
+# пришедшие за время окна GROUP_COMMIT_WINDOW_MS, выполняются в одной транзакции SQLite,
+# каждая в своей точке сохранения, и фиксируются одним COMMIT. Ошибка одной операции
+# откатывает только её точку сохранения и возвращается только её вызывающему.
+#
+# Операция выполняется в контексте (contextvars) вызвавшего её запроса: её SQL-запросы, включая
+# точку сохранения, учитывают метрики (metrics.request_sql) и профиль запроса. Общие для пачки
+# BEGIN и COMMIT не относятся ни к одному запросу.
+
+writer_engine = create_engine(database.SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False},
+                              pool_size=1, max_overflow=0)
+event.listen(writer_engine, "connect", database.set_sqlite_pragmas)
+
+@event.listens_for(writer_engine, "connect")
+def _disable_driver_transactions(dbapi_connection, connection_record):
+    # pysqlite сам не открывает транзакцию перед SAVEPOINT, поэтому BEGIN выдаётся явно
+    dbapi_connection.isolation_level = None
+
+@event.listens_for(writer_engine, "begin")
+def _begin_immediate(conn):
+    # Блокировка записи берётся сразу, чтобы пачка не упиралась в SQLITE_BUSY посередине
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+class GroupCommitWriter:
+    def __init__(self, engine, window: float, max_batch: int):
+        self.engine = engine
+        self.window = window
+        self.max_batch = max_batch
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def submit(self, fn, *args) -> Future:
+        future = Future()
+        self.jobs.put((fn, args, future, contextvars.copy_context()))
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+                    self.thread.start()
+        return future
+
+    def _collect(self):
+        batch = [self.jobs.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                batch.append(self.jobs.get(timeout=timeout) if timeout > 0 else self.jobs.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _execute(self, conn, fn, args):
+        # (результат, ошибка) одной операции пачки
+        with database.SessionLocal(bind=conn, join_transaction_mode="create_savepoint") as db:
+            try:
+                return fn(db, *args), None
+            except Exception as e:
+                db.rollback()
+                return None, e
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            results = []
+            try:
+                with self.engine.connect() as conn, conn.begin():
+                    for fn, args, future, context in batch:
+                        if not future.set_running_or_notify_cancel():
+                            continue
+                        results.append((future, *context.run(self._execute, conn, fn, args)))
+            except Exception as e:
+                # COMMIT не прошёл: ни одна операция пачки не сохранена
+                for _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for future, result, error in results:
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+group_writer = GroupCommitWriter(writer_engine, config.GROUP_COMMIT_WINDOW_MS / 1000, config.GROUP_COMMIT_MAX_BATCH)
+
+async def write(db, fn, *args):
+    # Изменяющая операция: через общего писателя при GROUP_COMMIT, иначе в сессии запроса
+    if config.GROUP_COMMIT:
+        return await asyncio.wrap_future(group_writer.submit(profiling.wrap(fn), *args))
+    return await database.run(db, fn, *args)